@@ -0,0 +1,13 @@
+from fastapi import APIRouter, Depends, Response
+
+from dependency.dependencies import get_admin_api_key
+from services import metrics
+
+router = APIRouter()
+
+@router.get("/metrics", include_in_schema=False, dependencies=[Depends(get_admin_api_key)])
+def get_metrics():
+    """
+    Prometheus scrape endpoint (admin-only: send the admin key as `X-API-KEY`).
+    """
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE_LATEST)
@@ -6,7 +6,12 @@ from .endpoints.admin import (
     stats as admin_stats, 
     response_feedback as admin_response_feedback,
     conversation as admin_conversations,
-    backup as admin_backup
+    backup as admin_backup,
+    analytics as admin_analytics,
+    attribution as admin_attribution,
+    export as admin_export,
+    archive as admin_archive,
+    profiler as admin_profiler,
 )
 from dependency.dependencies import get_admin_api_key
 
@@ -29,6 +34,11 @@ admin_router.include_router(admin_stats.router, prefix="/stats", tags=["Admin -
 admin_router.include_router(admin_response_feedback.router, prefix="/response-feedback", tags=["Admin - Feedback"])
 admin_router.include_router(admin_conversations.router, prefix="/conversations", tags=["Admin - Conversations"])
 admin_router.include_router(admin_backup.router, prefix="/backup", tags=["Admin - Backup"])
+admin_router.include_router(admin_analytics.router, prefix="/analytics", tags=["Admin - Analytics"])
+admin_router.include_router(admin_attribution.router, prefix="/attribution", tags=["Admin - Attribution"])
+admin_router.include_router(admin_export.router, prefix="/export", tags=["Admin - Export"])
+admin_router.include_router(admin_archive.router, prefix="/archive", tags=["Admin - Archive"])
+admin_router.include_router(admin_profiler.router, prefix="/profiler", tags=["Admin - Profiler"])
 
 # Include the admin router under a protected path
 router.include_router(admin_router, prefix="/admin")
@@ -1,4 +1,8 @@
 from . import conversation
 from . import stats
 from . import response_feedback
-from . import backup
\ No newline at end of file
+from . import backup
+from . import analytics
+from . import attribution
+from . import export
+from . import archive
\ No newline at end of file
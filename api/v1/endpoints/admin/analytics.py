@@ -0,0 +1,49 @@
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from dependency.dependencies import get_db
+from schema.admin.analytics import AnalyticsBucketSize, LatencyAnalyticsResponse, SlowRequestSample
+from repository.slow_request import slow_request
+
+router = APIRouter()
+
+@router.get("/latency", response_model=LatencyAnalyticsResponse)
+def get_latency_analytics(
+    start: Optional[datetime] = Query(None, description="Start of the range. Defaults to 7 days before `end`."),
+    end: Optional[datetime] = Query(None, description="End of the range (exclusive). Defaults to now."),
+    bucket: AnalyticsBucketSize = Query(AnalyticsBucketSize.DAY, description="Time bucket: 'hour' or 'day'"),
+    ai_provider: Optional[str] = Query(None, description="Only include replies from this provider, e.g. 'GeminiClient'"),
+    ai_model: Optional[str] = Query(None, description="Only include replies from this model"),
+    db: Session = Depends(get_db),
+):
+    """
+    AI reply latency percentiles (p50/p90/p99), throughput, error and feedback
+    rates, bucketed by time, provider and model (admin-only).
+    """
+    end = end or datetime.now(timezone.utc)
+    start = start or end - timedelta(days=7)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="'start' must be before 'end'.")
+
+    # Imported on first use: it pulls in NumPy, which only this admin report needs.
+    from repository.analytics import analytics
+    return analytics.get_latency_analytics(
+        db=db, start=start, end=end, bucket=bucket, ai_provider=ai_provider, ai_model=ai_model
+    )
+
+
+@router.get("/slow-requests", response_model=List[SlowRequestSample])
+def get_slow_requests(
+    hours: int = Query(24, ge=1, le=24 * 90, description="How far back to look."),
+    route: Optional[str] = Query(None, description="Only this route template, e.g. '/api/v1/messages/{conversation_id}'"),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+):
+    """
+    Sampled slow requests with their per-phase timing breakdown, slowest first (admin-only).
+    """
+    since = datetime.now(timezone.utc) - timedelta(hours=hours)
+    return slow_request.get_recent(db=db, since=since, route=route, limit=limit)
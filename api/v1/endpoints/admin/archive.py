@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from config.settings import SETTINGS
+from dependency.dependencies import get_db
+from schema.admin.archive import ArchiveRunResponse
+from services.archive import conversation_archive
+
+router = APIRouter()
+
+@router.post("/run", response_model=ArchiveRunResponse)
+def run_archival(
+    idle_days: int = Query(SETTINGS.ARCHIVE_IDLE_DAYS, ge=1, description="Archive conversations idle for at least this many days"),
+    db: Session = Depends(get_db),
+):
+    """
+    Move idle conversations' messages into compressed archive segments (admin-only).
+    """
+    return ArchiveRunResponse(archived_conversations=conversation_archive.archive_idle(db, idle_days=idle_days))
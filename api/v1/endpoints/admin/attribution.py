@@ -0,0 +1,45 @@
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from dependency.dependencies import get_db
+from schema.admin.attribution import AttributionDimension, AttributionFunnelResponse, AttributionBackfillResponse
+from repository.attribution import attribution
+
+router = APIRouter()
+
+@router.get("/funnel", response_model=AttributionFunnelResponse)
+def get_attribution_funnel(
+    start: Optional[date] = Query(None, description="First day (UTC) to include. Defaults to 30 days before `end`."),
+    end: Optional[date] = Query(None, description="Last day (UTC) to include. Defaults to today."),
+    group_by: List[AttributionDimension] = Query([AttributionDimension.SOURCE], description="UTM dimensions to group by"),
+    utm_source: Optional[str] = Query(None, description="Only include this source ('' for none)"),
+    utm_medium: Optional[str] = Query(None, description="Only include this medium ('' for none)"),
+    utm_campaign: Optional[str] = Query(None, description="Only include this campaign ('' for none)"),
+    db: Session = Depends(get_db),
+):
+    """
+    Sessions -> conversations -> messages -> logins -> feedback funnel per UTM
+    source / medium / campaign, served from the attribution cubes (admin-only).
+    """
+    end = end or datetime.now(timezone.utc).date()
+    start = start or end - timedelta(days=30)
+    if start > end:
+        raise HTTPException(status_code=400, detail="'start' must not be after 'end'.")
+
+    return attribution.get_funnel(
+        db=db, start=start, end=end, group_by=list(dict.fromkeys(group_by)),
+        utm_source=utm_source, utm_medium=utm_medium, utm_campaign=utm_campaign,
+    )
+
+@router.post("/backfill", response_model=AttributionBackfillResponse)
+def backfill_attribution(
+    since: Optional[date] = Query(None, description="Only rebuild days on or after this date"),
+    db: Session = Depends(get_db),
+):
+    """
+    Rebuild the attribution cubes from historical data (admin-only).
+    """
+    return AttributionBackfillResponse(cells_written=attribution.backfill(db=db, since=since))
@@ -1,9 +1,66 @@
-from fastapi import APIRouter
-from fastapi.responses import FileResponse
+from datetime import datetime, timezone
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette import status
+from starlette.concurrency import run_in_threadpool
+
+from schema.admin.backup import SnapshotView, SnapshotListResponse, SnapshotStartResponse
+from services.backup import backup_manager, iter_changes
 
 
 router = APIRouter()
 
+def _snapshot_file_response(name: str) -> FileResponse:
+    path = backup_manager.snapshot_path(name)
+    if not path:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+    # FileResponse streams from disk and honours Range requests for resumable downloads.
+    return FileResponse(path, filename=name, media_type="application/gzip")
+
 @router.get("/download-db")
 async def download_db():
-    return FileResponse("tebnegar_mvp.db", filename="tebnegar_mvp.db")
\ No newline at end of file
+    """
+    Download a consistent snapshot of the database as it is now: the newest
+    one if it is younger than BACKUP_DOWNLOAD_MAX_AGE_SECONDS, otherwise a new one.
+    """
+    snapshot = await run_in_threadpool(backup_manager.recent_snapshot)
+    return _snapshot_file_response(snapshot.name)
+
+@router.post("/snapshots", response_model=SnapshotStartResponse, status_code=status.HTTP_202_ACCEPTED)
+def create_snapshot():
+    """
+    Start a consistent, compressed snapshot in the background (admin-only).
+    """
+    started = backup_manager.start_snapshot()
+    return SnapshotStartResponse(started=started, in_progress=True)
+
+@router.get("/snapshots", response_model=SnapshotListResponse)
+def list_snapshots():
+    """
+    List stored snapshots, newest first (admin-only).
+    """
+    return SnapshotListResponse(
+        in_progress=backup_manager.in_progress,
+        last_error=backup_manager.last_error,
+        snapshots=[SnapshotView(**vars(s)) for s in backup_manager.list_snapshots()],
+    )
+
+@router.get("/snapshots/{name}")
+def download_snapshot(name: str):
+    """
+    Download a stored snapshot; supports HTTP Range requests (admin-only).
+    """
+    return _snapshot_file_response(name)
+
+@router.get("/changes")
+def export_changes(since: datetime = Query(..., description="Export rows created at or after this time")):
+    """
+    Stream rows created since `since` as gzip-compressed NDJSON (admin-only).
+    """
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    return StreamingResponse(
+        iter_changes(since),
+        media_type="application/gzip",
+        headers={"Content-Disposition": f'attachment; filename="tebnegar-changes-{stamp}.ndjson.gz"'},
+    )
@@ -13,21 +13,12 @@ def search_conversations(
     keyword: str = Query(..., min_length=3, description="Search term for message content"),
     skip: int = 0,
     limit: int = 50,
+    include_archived: bool = Query(True, description="Also scan archived conversations (slower)"),
     db: Session = Depends(get_db),
 ):
     """
     Search conversation transcripts by keyword (admin-only).
     """
-    conversations = conversation.search_by_content(
-        db=db, keyword=keyword, skip=skip, limit=limit
-    )
-    # This is a bit inefficient but simple. For production, a better query would be needed.
-    return [
-        ConversationAdminView(
-            id=conv.id, # type: ignore
-            session_id=conv.session_id, # type: ignore
-            title=conv.title, # type: ignore
-            created_at=conv.created_at, # type: ignore
-            message_count=len(conv.messages) 
-        ) for conv in conversations
-    ]
\ No newline at end of file
+    return conversation.search_by_content(
+        db=db, keyword=keyword, skip=skip, limit=limit, include_archived=include_archived
+    )
\ No newline at end of file
@@ -0,0 +1,50 @@
+import importlib.util
+from datetime import datetime, timezone
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from db.session import SessionLocal
+from db.model.response_feedback import FeedbackType
+from repository.export import export
+from services.export import ExportFormat, ENCODERS, MEDIA_TYPES
+
+router = APIRouter()
+
+EXPORT_BATCH_SIZE = 1000
+
+@router.get("/conversations")
+def export_conversations(
+    format: ExportFormat = Query(ExportFormat.NDJSON, description="'ndjson' (one conversation per line), 'csv' or 'parquet' (one message per row)"),
+    start: Optional[datetime] = Query(None, description="Only conversations created at or after this time"),
+    end: Optional[datetime] = Query(None, description="Only conversations created before this time"),
+    feedback_type: Optional[FeedbackType] = Query(None, description="Only conversations with at least one feedback of this type"),
+    ai_provider: Optional[str] = Query(None, description="Only conversations with at least one reply from this provider"),
+):
+    """
+    Stream conversations with their messages, analyses and feedback (admin-only).
+
+    Rows are read through a server-side cursor in fixed-size batches and encoded
+    as they arrive, so memory use does not depend on the size of the export.
+    Archived conversations are included, with their messages read from the archive.
+    """
+    if format == ExportFormat.PARQUET and importlib.util.find_spec("pyarrow") is None:
+        raise HTTPException(status_code=501, detail="Parquet export requires the 'pyarrow' package.")
+
+    stmt = export.build_query(start=start, end=end, feedback_type=feedback_type, ai_provider=ai_provider)
+
+    def body():
+        # The stream outlives the request's dependencies, so it owns its DB session.
+        db = SessionLocal()
+        try:
+            yield from ENCODERS[format](export.iter_batches(db, stmt, batch_size=EXPORT_BATCH_SIZE, ai_provider=ai_provider))
+        finally:
+            db.close()
+
+    timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    return StreamingResponse(
+        body(),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="conversations-{timestamp}.{format.value}"'},
+    )
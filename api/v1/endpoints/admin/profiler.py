@@ -0,0 +1,65 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import FileResponse, JSONResponse
+from starlette import status
+
+from schema.admin.profiler import ProfilerArmRequest, ProfilerStatus, ProfileView, ProfileListResponse
+from services.profiler import profiler, to_speedscope
+
+router = APIRouter()
+
+def _status() -> ProfilerStatus:
+    arm = profiler.current_arm()
+    return ProfilerStatus(armed=arm is not None, arm=arm)
+
+@router.get("/", response_model=ProfilerStatus)
+def get_profiler_status():
+    """
+    Whether the profiler is armed, and for what (admin-only).
+    """
+    # Read now: it may have been armed through another worker since the last poll.
+    profiler.refresh()
+    return _status()
+
+@router.post("/arm", response_model=ProfilerStatus)
+def arm_profiler(arm_in: ProfilerArmRequest):
+    """
+    Profile the next `requests` requests matching `route` and/or everything
+    matching it for `seconds`, on every worker (admin-only).
+    """
+    if arm_in.requests is None and arm_in.seconds is None:
+        raise HTTPException(status_code=400, detail="Give 'requests', 'seconds' or both.")
+    profiler.arm(route=arm_in.route, requests=arm_in.requests, seconds=arm_in.seconds, interval_ms=arm_in.interval_ms)
+    return _status()
+
+@router.delete("/arm", status_code=status.HTTP_204_NO_CONTENT)
+def disarm_profiler():
+    """
+    Stop profiling; profiles captured so far are kept (admin-only).
+    """
+    profiler.disarm()
+
+@router.get("/profiles", response_model=ProfileListResponse)
+def list_profiles():
+    """
+    List stored profiles (one per arm and worker process), newest first (admin-only).
+    """
+    return ProfileListResponse(profiles=[ProfileView(**vars(p)) for p in profiler.list_profiles()])
+
+@router.get("/profiles/{name}")
+def download_profile(
+    name: str,
+    format: str = Query("collapsed", pattern="^(collapsed|speedscope)$", description="'collapsed' stacks or 'speedscope' JSON"),
+):
+    """
+    Download a profile as collapsed stacks (flamegraph.pl, speedscope) or speedscope JSON (admin-only).
+    """
+    path = profiler.profile_path(name)
+    if not path:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "collapsed":
+        return FileResponse(path, filename=name, media_type="text/plain")
+    with open(path) as f:
+        profile = to_speedscope(f.read(), name=name)
+    return JSONResponse(
+        profile, headers={"Content-Disposition": f'attachment; filename="{name.removesuffix(".collapsed")}.speedscope.json"'}
+    )
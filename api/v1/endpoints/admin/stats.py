@@ -1,8 +1,12 @@
-from fastapi import APIRouter, Depends
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 
-from schema.admin.stats import StatsResponse
+from schema.admin.stats import StatsResponse, StatsGranularity, StatsTimeSeriesResponse, OAuthStateMetrics
 from repository import stats
+from services.oauth_state import oauth_states
 from dependency import get_db
 
 router = APIRouter()
@@ -12,4 +16,34 @@ def get_system_stats(db: Session = Depends(get_db)):
     """
     Retrieve high-level system statistics (admin-only).
     """
-    return stats.stats.get_dashboard_stats(db=db)
\ No newline at end of file
+    return stats.stats.get_dashboard_stats(db=db)
+
+@router.get("/timeseries", response_model=StatsTimeSeriesResponse)
+def get_stats_time_series(
+    start: Optional[date] = Query(None, description="First day (UTC) to include. Defaults to 30 days before `end`."),
+    end: Optional[date] = Query(None, description="Last day (UTC) to include. Defaults to today."),
+    granularity: StatsGranularity = Query(StatsGranularity.DAY, description="Bucket size: 'day', 'week' or 'month'"),
+    db: Session = Depends(get_db),
+):
+    """
+    Retrieve activity counts over a time range, served from the daily rollups (admin-only).
+    """
+    end = end or datetime.now(timezone.utc).date()
+    start = start or end - timedelta(days=30)
+    if start > end:
+        raise HTTPException(status_code=400, detail="'start' must not be after 'end'.")
+    return stats.stats.get_time_series(db=db, start=start, end=end, granularity=granularity)
+
+@router.post("/rebuild", response_model=StatsResponse)
+def rebuild_stats(db: Session = Depends(get_db)):
+    """
+    Recompute the materialized counters and rollups from the base tables (admin-only).
+    """
+    return stats.stats.rebuild(db=db)
+
+@router.get("/oauth-states", response_model=OAuthStateMetrics)
+def get_oauth_state_metrics():
+    """
+    Outstanding OAuth login states and this worker's issue/consume counters (admin-only).
+    """
+    return oauth_states.metrics()
@@ -1,57 +1,32 @@
 from __future__ import annotations
 from datetime import datetime, timedelta, timezone
 from typing import Optional
-import secrets
 
 from fastapi import APIRouter, Depends, HTTPException, Body, Query
 from sqlalchemy.orm import Session
 
-from google_auth_oauthlib.flow import Flow
-from google.oauth2 import id_token as google_id_token
-from google.auth.transport.requests import Request as GoogleRequest
-import google.auth.exceptions as google_exceptions
-
-import jwt
-
 from dependency.dependencies import get_db
 from config.settings import SETTINGS
 from repository import user as user_repo
 from repository import session as session_repo
 from schema.user import UserCreate
+from services.oauth_state import oauth_states
+from services import google_auth
 
 router = APIRouter()
 
 # ---- OAuth / OIDC constants ----
-GOOGLE_SCOPES = [
-    "openid",
-    "https://www.googleapis.com/auth/userinfo.email",
-    "https://www.googleapis.com/auth/userinfo.profile",
-]
-
 VALID_ISSUERS = {"accounts.google.com", "https://accounts.google.com"}
 
-# ---- In-memory session store for demo (replace with DB/Redis in prod) ----
-SESSION_STORE: dict[str, str] = {}  # maps state -> session_id/user_id
-
 # ---- Helpers ----
 
 
-def _build_flow(redirect_uri: Optional[str] = None) -> Flow:
-    return Flow.from_client_config(
-        client_config={
-            "web": {
-                "client_id": SETTINGS.GOOGLE_CLIENT_ID,
-                "client_secret": SETTINGS.GOOGLE_CLIENT_SECRET,
-                "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-                "token_uri": "https://oauth2.googleapis.com/token",
-            }
-        },
-        scopes=GOOGLE_SCOPES,
-        redirect_uri=redirect_uri or SETTINGS.GOOGLE_REDIRECT_URI,
-    )
-
+# The Google auth libraries and PyJWT are imported inside the helpers below so
+# they load on the first login instead of at worker start-up.
 
 def _create_jwt_token(*, subject: dict, expires_in_minutes: int | None = None) -> str:
+    import jwt
+
     now = datetime.now(timezone.utc)
     exp = now + \
         timedelta(
@@ -66,12 +41,11 @@ def _create_jwt_token(*, subject: dict, expires_in_minutes: int | None = None) -
 
 
 def _verify_google_id_token(id_token_str: str) -> dict:
+    import google.auth.exceptions as google_exceptions
+
     try:
-        info = google_id_token.verify_oauth2_token(
-            id_token_str,
-            GoogleRequest(),
-            SETTINGS.GOOGLE_CLIENT_ID,
-        )
+        # Verified against cached signing certs; no network call in the common case.
+        info = google_auth.verify_id_token(id_token_str, SETTINGS.GOOGLE_CLIENT_ID)
     except (ValueError, google_exceptions.GoogleAuthError) as e:
         raise HTTPException(
             status_code=400, detail=f"Invalid Google ID token: {e}")
@@ -103,11 +77,11 @@ def get_google_auth_url(session_id: str = Query(..., embed=True)):
     Generate Google OAuth authorization URL with state for CSRF protection.
     session_id: identifier for the user's session (could be cookie/session)
     """
-    flow = _build_flow()
-
-    state = secrets.token_urlsafe(16)
-    # Store state linked to session_id
-    SESSION_STORE[state] = session_id
+    # PKCE: the callback must exchange the code with the same verifier, so it is
+    # stored with the state (linked to session_id); the callback may land on any worker.
+    code_verifier = google_auth.new_code_verifier()
+    state = oauth_states.issue(session_id, code_verifier=code_verifier)
+    flow = google_auth.build_flow(code_verifier=code_verifier)
 
     authorization_url, _ = flow.authorization_url(
         access_type="offline",
@@ -128,13 +102,14 @@ def google_callback(
     Exchange code for tokens, verify state + ID token, upsert user, return JWT.
     """
     # Validate state
-    session_id = SESSION_STORE.pop(state, None)
-    if not session_id:
+    login = oauth_states.consume(state)
+    if not login:
         raise HTTPException(
             status_code=400, detail="Invalid or expired state parameter")
+    session_id = login["session_id"]
 
     try:
-        flow = _build_flow()
+        flow = google_auth.build_flow(code_verifier=login.get("code_verifier"))
         flow.fetch_token(code=code)
         creds = flow.credentials
 
@@ -149,10 +124,6 @@ def google_callback(
         full_name = id_info.get("name")
         picture_url = id_info.get("picture")
 
-        print(email)
-        print(full_name)
-        print(picture_url)
-
         # Upsert user
         user = user_repo.user.get_by_email(db, email=email)
         if not user:
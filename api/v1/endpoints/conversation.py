@@ -4,10 +4,14 @@ from sqlalchemy.orm import Session
 from typing import List
 
 from dependency.dependencies import get_db, get_current_user_optional
-from schema.conversation import ConversationHistory, ConversationInDB, ConversationCreate, ConversationCreateInternal, ConversationUpdate, ConversationTitle
+from schema.conversation import (
+    ConversationHistory, ConversationInDB, ConversationCreate, ConversationCreateInternal, ConversationUpdate, ConversationTitle,
+    ConversationBatchIds, ConversationBatchRename, ConversationBatchDeleteResult,
+)
 from db.model.user import User
+from db.model.conversation import DEFAULT_TITLE
 from repository import conversation as conversation_repo
-from services.ai.ai_manager import ai_manager
+from services.tasks import enqueue_title
 
 router = APIRouter()
 
@@ -28,11 +32,11 @@ def list_conversations(
     """
     if user:
         # Authenticated Flow: The user object from the JWT is the source of truth.
-        return conversation_repo.get_all_by_user_id(db=db, user_id=user.id) # type: ignore
+        return conversation_repo.get_history_by_user_id(db=db, user_id=user.id) # type: ignore
     else:
         # Anonymous Flow: The user is None, so we rely on the session_id.
         if session_id:
-            return conversation_repo.get_all_by_session_id(db=db, session_id=session_id)
+            return conversation_repo.get_history_by_session_id(db=db, session_id=session_id)
         else:
             # This is an invalid request for an anonymous user.
             raise HTTPException(
@@ -40,14 +44,40 @@ def list_conversations(
                 detail="The 'session_id' query parameter is required for anonymous users."
             )
 
+# Batch routes are declared before the `/{conversation_id}` ones so "batch" is never parsed as an id.
+
+@router.post("/batch/get", response_model=List[ConversationInDB])
+def get_conversations_batch(batch: ConversationBatchIds, db: Session = Depends(get_db)):
+    """
+    Get several conversations with all their messages in one request.
+    Returned in the order asked for; unknown ids are left out.
+    """
+    return conversation_repo.get_many_with_messages(db=db, ids=batch.ids)
+
+@router.post("/batch/delete", response_model=ConversationBatchDeleteResult)
+def delete_conversations_batch(batch: ConversationBatchIds, db: Session = Depends(get_db)):
+    """
+    Deletes several conversations and all their messages; returns the ids that existed.
+    """
+    return ConversationBatchDeleteResult(deleted=conversation_repo.remove_many(db=db, ids=batch.ids))
+
+@router.patch("/batch", response_model=List[ConversationHistory])
+def rename_conversations_batch(batch: ConversationBatchRename, db: Session = Depends(get_db)):
+    """
+    Updates the titles of several conversations; returns the renamed ones.
+    """
+    titles = {item.id: item.title for item in batch.items}
+    return conversation_repo.rename_many(db=db, titles=titles)
+
 @router.get("/{conversation_id}/messages", response_model=ConversationInDB)
 def get_conversation_messages(conversation_id: uuid.UUID, db: Session = Depends(get_db)):
     """
     Get a single conversation with all its messages.
     """
-    conv = conversation_repo.get(db=db, id=conversation_id)
+    conv = conversation_repo.get_with_messages(db=db, id=conversation_id)
     if not conv:
         raise HTTPException(status_code=404, detail="Conversation not found")
+    # Archived messages are read back transparently, ahead of the hot ones.
     return conv
 
 @router.post("/", response_model=ConversationInDB, status_code=201)
@@ -92,11 +122,8 @@ def delete_conversation(conversation_id: uuid.UUID, db: Session = Depends(get_db
     """
     Deletes a conversation and all its messages.
     """
-    db_conversation = conversation_repo.get(db=db, id=conversation_id)
-    if not db_conversation:
+    if not conversation_repo.remove_many(db=db, ids=[conversation_id]):
         raise HTTPException(status_code=404, detail="Conversation not found")
-        
-    conversation_repo.remove(db=db, id=conversation_id)
     return None
 
 
@@ -107,24 +134,15 @@ def generate_and_update_conversation_title(
     db: Session = Depends(get_db)
 ):
     """
-    Generates a title for the conversation using the active AI session
-    without polluting the chat history, and updates the database.
+    Returns the conversation's generated title. Titles are generated in the
+    background (queued after the first reply, see services/tasks.py); while
+    the default title is still in place, a job is queued if none is and the
+    response has `pending: true`.
     """
-    # 1. Verify the conversation exists in our database.
-    db_conversation = conversation_repo.get(db=db, id=conversation_id)
-    if not db_conversation:
+    title = conversation_repo.get_title(db, id=conversation_id)
+    if title is None:
         raise HTTPException(status_code=404, detail="Conversation not found")
-
-    # 2. Call the AI manager's new method to get the title.
-    #    The conversation_id is used as the patient_id for the session.
-    new_title = ai_manager.generate_title(patient_id=str(conversation_id))
-
-    # 3. Prepare the update data.
-    update_data = ConversationUpdate(title=new_title)
-
-    # 4. Save the new title to the database.
-    updated_conversation = conversation_repo.update(
-        db=db, db_obj=db_conversation, obj_in=update_data
-    )
-
-    return ConversationTitle(title=new_title)
+    if title != DEFAULT_TITLE:
+        return ConversationTitle(title=title)
+    enqueue_title(conversation_id)
+    return ConversationTitle(title=title, pending=True)
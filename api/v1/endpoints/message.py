@@ -3,13 +3,21 @@ import time
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 from dependency.dependencies import get_db
+from dependency.rate_limit import rate_limit
 from schema.message import MessageCreate, AIResponseMessage
 from repository import message
+from repository import conversation as conversation_repo
+from db.model.conversation import DEFAULT_TITLE
+from config import SETTINGS
 from services.ai.ai_manager import ai_manager
+from services.extraction import extraction_pipeline
+from services.tasks import enqueue_title
+from services.triage import triage, EMERGENCY_REPLY
+from services import metrics, timing, tracing
 
 router = APIRouter()
 
-@router.post("/{conversation_id}", response_model=AIResponseMessage)
+@router.post("/{conversation_id}", response_model=AIResponseMessage, dependencies=[Depends(rate_limit("messages"))])
 def post_user_message(
     conversation_id: uuid.UUID,
     message_in: MessageCreate,
@@ -18,6 +26,8 @@ def post_user_message(
     """
     The main endpoint for a user to send a message and get an AI response.
     """
+    # Body parsing, validation and dependencies ran before we got here.
+    timing.mark("validation")
 
     # 1. Save the user's message
     message.create_user_message(
@@ -26,25 +36,42 @@ def post_user_message(
         obj_in=message_in
     )
 
-    # 2. Call the AI service via AIManager
+    # 2. Local red-flag triage (microseconds, no AI call)
+    with timing.phase("triage"):
+        assessment = triage.assess(message_in.content)
+    for category in assessment.categories:
+        metrics.TRIAGE_RED_FLAGS.labels(category).inc()
+    emergency_reply = assessment.critical and SETTINGS.TRIAGE_EMERGENCY_REPLY
+
+    # 3. Call the AI service via AIManager, unless the emergency guidance answers already
     start_time = time.time()
-    ai_response_text = ai_manager.send_message(
-        patient_id=str(conversation_id),   # patient_id = conversation_id
-        message=message_in.content
-    )
+    if emergency_reply:
+        ai_response_text = EMERGENCY_REPLY
+        # Keeps the chat history in step with the saved messages; no provider call.
+        ai_manager.record_reply(str(conversation_id), message_in.content, EMERGENCY_REPLY)
+    else:
+        ai_response_text = ai_manager.send_message(
+            patient_id=str(conversation_id),   # patient_id = conversation_id
+            message=message_in.content
+        )
     end_time = time.time()
 
-    # 3. Create a structured analysis object
-    #   (token usage, provider name, conditions → to be filled by real model later)
+    # 4. Create a structured analysis object
+    #   (conditions, urgency and specialty are filled in by the extraction pipeline afterwards)
+    # Only a provider reply can be the fallback; the emergency path never sets the provider up.
+    is_error = not emergency_reply and ai_response_text == ai_manager._provider.FALLBACK_REPLY
     analysis_data = {
-        "potential_conditions": [],  # leave empty until NLU/medical model added
-        "criticality_flag": False,
+        "potential_conditions": None,  # pending until extracted
+        "criticality_flag": assessment.critical,
         "processing_time_ms": int((end_time - start_time) * 1000),
-        "ai_provider": type(ai_manager._provider).__name__,  # e.g. GeminiClient
-        "token_usage": {}  # your provider client can fill this in if available
+        "ai_provider": "triage" if emergency_reply else type(ai_manager._provider).__name__,  # e.g. GeminiClient
+        "ai_model": None if emergency_reply else ai_manager._provider.model_name,
+        "is_error": is_error,
+        "token_usage": {},  # your provider client can fill this in if available
+        "trace_id": tracing.current_trace_id(),
     }
 
-    # 4. Save the AI's message and its analysis
+    # 5. Save the AI's message and its analysis
     ai_message = message.create_ai_message_with_analysis(
         db=db,
         conversation_id=conversation_id,
@@ -52,7 +79,18 @@ def post_user_message(
         analysis_data=analysis_data
     )
 
-    response = AIResponseMessage.model_validate(ai_message)
-    response.elapsed_time_ms = analysis_data["processing_time_ms"]
+    # 6. Post-response work, in the background (nothing to extract from or title with fixed replies)
+    if not (emergency_reply or is_error):
+        extraction_pipeline.submit(ai_message.id)
+        with timing.phase("jobs_enqueue"):
+            if conversation_repo.get_title(db, id=conversation_id) == DEFAULT_TITLE:
+                enqueue_title(conversation_id)
 
-    return ai_message
+    # Built once from the saved row; FastAPI serializes it to JSON without re-validating.
+    return AIResponseMessage.model_construct(
+        id=ai_message.id,
+        sender_type=ai_message.sender_type,
+        content=ai_message.content,
+        created_at=ai_message.created_at,
+        elapsed_time_ms=analysis_data["processing_time_ms"],
+    )
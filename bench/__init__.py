@@ -0,0 +1,10 @@
+"""
+Benchmarks that need a running server or the database; each module is a command:
+
+    python -m bench.workers     # throughput as the gunicorn worker count grows
+    python -m bench.login       # Google login latency against a local stand-in
+    python -m bench.responses   # conversation responses: ORM + validation vs row tuples
+
+Benchmarks of a single function live next to it instead, e.g.
+`python -m services.triage bench`.
+"""
@@ -0,0 +1,249 @@
+"""
+Latency of the server side of a Google login (code exchange + ID token
+verification) against a local stand-in for Google's token and cert endpoints.
+
+The stand-in serves HTTPS with a throwaway self-signed certificate, signs
+real RS256 ID tokens and serves the matching cert with `Cache-Control:
+max-age`. To make connection reuse visible on localhost it waits `--rtt-ms`
+before answering each request and twice that when a connection is opened
+(TCP + TLS handshakes).
+
+Two paths are timed:
+
+- before: a new `Flow` from client config and a new `GoogleRequest()` per
+  login, so every login opens fresh connections and re-fetches the certs
+  (`google.oauth2.id_token.verify_token`);
+- after: `services.google_auth` (shared connection pool, cached certs,
+  cached client config).
+
+    python -m bench.login
+    python -m bench.login --logins 500 --rtt-ms 30
+
+Needs the app's settings in the environment (GOOGLE_CLIENT_ID is the audience).
+"""
+
+import argparse
+import datetime
+import json
+import os
+import ssl
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, List
+
+KEY_ID = "bench-key"
+
+
+def _self_signed():
+    """(private key PEM, certificate PEM) for localhost."""
+    import ipaddress
+
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from cryptography.x509.oid import NameOID
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(minutes=5))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .add_extension(x509.SubjectAlternativeName([
+            x509.DNSName("localhost"), x509.IPAddress(ipaddress.ip_address("127.0.0.1")),
+        ]), critical=False)
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .sign(key, hashes.SHA256())
+    )
+    key_pem = key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption(),
+    )
+    return key_pem, cert.public_bytes(serialization.Encoding.PEM)
+
+
+class GoogleStandIn:
+    """Local HTTPS server answering `/token` and `/certs` like Google does."""
+
+    def __init__(self, *, audience: str, scopes: List[str], rtt_seconds: float, max_age_seconds: int = 3600):
+        from google.auth import crypt
+
+        key_pem, cert_pem = _self_signed()
+        self.signer = crypt.RSASigner.from_string(key_pem, key_id=KEY_ID)
+        self.cert_pem = cert_pem.decode()
+        self.audience = audience
+        self.scope = " ".join(scopes)
+        self.rtt = rtt_seconds
+        self.max_age = max_age_seconds
+        self.connections = self.cert_fetches = self.token_requests = 0
+        self._counter_lock = threading.Lock()
+
+        # Also the CA bundle the clients trust (REQUESTS_CA_BUNDLE).
+        fd, self.ca_file = tempfile.mkstemp(suffix=".pem")
+        with os.fdopen(fd, "w") as f:
+            f.write(self.cert_pem)
+        with tempfile.NamedTemporaryFile("wb", suffix=".pem") as f:
+            f.write(key_pem + cert_pem)
+            f.flush()
+            self.tls = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            self.tls.load_cert_chain(f.name)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        self.base_url = f"https://localhost:{self.server.server_address[1]}"
+        self.token_url = self.base_url + "/token"
+        self.certs_url = self.base_url + "/certs"
+
+    def _count(self, name: str) -> None:
+        with self._counter_lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _id_token(self) -> str:
+        from google.auth import jwt
+
+        now = int(time.time())
+        return jwt.encode(self.signer, {
+            "iss": "https://accounts.google.com",
+            "aud": self.audience,
+            "sub": "1234567890",
+            "email": "bench@example.com",
+            "email_verified": True,
+            "name": "Bench User",
+            "iat": now,
+            "exp": now + 3600,
+        }).decode()
+
+    def _handler(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive
+            disable_nagle_algorithm = True  # headers and body go out as separate writes
+
+            def setup(self):
+                stand_in._count("connections")
+                time.sleep(2 * stand_in.rtt)
+                self.request = stand_in.tls.wrap_socket(self.request, server_side=True)
+                super().setup()
+
+            def _reply(self, body: dict, headers: dict = None) -> None:
+                data = json.dumps(body).encode()
+                time.sleep(stand_in.rtt)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                stand_in._count("cert_fetches")
+                self._reply({KEY_ID: stand_in.cert_pem}, {"Cache-Control": f"public, max-age={stand_in.max_age}"})
+
+            def do_POST(self):
+                stand_in._count("token_requests")
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                self._reply({
+                    "access_token": "bench-access-token",
+                    "expires_in": 3599,
+                    "token_type": "Bearer",
+                    "scope": stand_in.scope,
+                    "id_token": stand_in._id_token(),
+                })
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self) -> "GoogleStandIn":
+        threading.Thread(target=self.server.serve_forever, name="google-stand-in", daemon=True).start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+        os.unlink(self.ca_file)
+
+
+def _login_before(stand_in: GoogleStandIn, audience: str) -> None:
+    from google.auth.transport.requests import Request as GoogleRequest
+    from google.oauth2 import id_token as google_id_token
+    from google_auth_oauthlib.flow import Flow
+
+    from config import SETTINGS
+    from services import google_auth
+
+    flow = Flow.from_client_config(
+        client_config={"web": {
+            "client_id": SETTINGS.GOOGLE_CLIENT_ID,
+            "client_secret": SETTINGS.GOOGLE_CLIENT_SECRET,
+            "auth_uri": google_auth.GOOGLE_AUTH_URI,
+            "token_uri": stand_in.token_url,
+        }},
+        scopes=google_auth.GOOGLE_SCOPES,
+        redirect_uri=SETTINGS.GOOGLE_REDIRECT_URI,
+        code_verifier=google_auth.new_code_verifier(),
+    )
+    flow.fetch_token(code="bench-code")
+    google_id_token.verify_token(
+        flow.credentials.id_token, GoogleRequest(), audience, certs_url=stand_in.certs_url,
+    )
+
+
+def _login_after(audience: str) -> None:
+    from services import google_auth
+
+    flow = google_auth.build_flow(code_verifier=google_auth.new_code_verifier())
+    flow.fetch_token(code="bench-code")
+    google_auth.verify_id_token(flow.credentials.id_token, audience)
+
+
+def _run(label: str, login: Callable[[], None], logins: int, stand_in: GoogleStandIn) -> None:
+    before = (stand_in.connections, stand_in.cert_fetches)
+    timings = []
+    for _ in range(logins):
+        start = time.perf_counter()
+        login()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    connections = stand_in.connections - before[0]
+    fetches = stand_in.cert_fetches - before[1]
+    print(f"{label:>7}  {sum(timings) / logins * 1e3:>8.1f}  {timings[logins // 2] * 1e3:>7.1f}  "
+          f"{timings[min(logins - 1, int(logins * 0.99))] * 1e3:>7.1f}  {connections:>11}  {fetches:>11}")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m bench.login")
+    parser.add_argument("--logins", type=int, default=100, help="Logins timed per path")
+    parser.add_argument("--rtt-ms", type=float, default=10.0, help="Simulated round trip to Google")
+    args = parser.parse_args(argv)
+
+    from config import SETTINGS
+    from services import google_auth
+
+    audience = SETTINGS.GOOGLE_CLIENT_ID
+    with GoogleStandIn(audience=audience, scopes=google_auth.GOOGLE_SCOPES, rtt_seconds=args.rtt_ms / 1000) as stand_in:
+        os.environ["REQUESTS_CA_BUNDLE"] = stand_in.ca_file
+        google_auth.GOOGLE_TOKEN_URI = stand_in.token_url
+        google_auth.client_config.cache_clear()
+        google_auth.google_certs = google_auth.GoogleCertCache(stand_in.certs_url)
+        # Imports and the first TLS setup are not part of a typical login.
+        _login_before(stand_in, audience)
+        _login_after(audience)
+
+        print(f"{args.logins} logins per path, {args.rtt_ms:g} ms simulated RTT")
+        print(f"{'path':>7}  {'mean ms':>8}  {'p50 ms':>7}  {'p99 ms':>7}  {'connections':>11}  {'cert fetches':>11}")
+        _run("before", lambda: _login_before(stand_in, audience), args.logins, stand_in)
+        _run("after", lambda: _login_after(audience), args.logins, stand_in)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Cost of building a conversation response (`ConversationInDB` with its
+messages), as the conversation read paths did it and as they do it now:
+
+- validate: the conversation and its messages loaded as ORM objects, then
+  `ConversationInDB.model_validate` (from attributes, every field validated);
+- construct: `repository.conversation.get_with_messages`, which selects the
+  columns and builds the models with `model_construct` from the row tuples.
+
+Each is timed twice: with the queries ("load + build", a fresh session state
+per call) and on already fetched data ("build only"). For every `--messages`
+size a conversation is added to the database in DATABASE_URL and deleted
+again afterwards.
+
+    python -m bench.responses
+    python -m bench.responses --messages 10,100,1000 --repeat 50
+
+Needs the app's settings in the environment.
+"""
+
+import argparse
+import time
+import uuid
+from typing import Callable, List
+
+
+def _seed(db, messages: int) -> uuid.UUID:
+    from db.model.conversation import Conversation
+    from db.model.message import Message, SenderType
+    from db.model.session import Session
+
+    session = Session(id=uuid.uuid4())
+    conversation = Conversation(id=uuid.uuid4(), session_id=session.id)
+    db.add(session)
+    db.flush()
+    db.add(conversation)
+    for i in range(messages):
+        sender = SenderType.USER if i % 2 == 0 else SenderType.AI
+        content = f"benchmark message {i} " + "lorem ipsum dolor sit amet " * 20
+        db.add(Message(conversation=conversation, sender_type=sender, content=content))
+    db.commit()
+    return conversation.id
+
+
+def _best(function: Callable[[], object], repeat: int) -> float:
+    """Fastest of `repeat` calls, in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1e3
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m bench.responses")
+    parser.add_argument("--messages", default="10,100,1000", help="Comma-separated conversation sizes")
+    parser.add_argument("--repeat", type=int, default=20, help="Calls timed per path; the fastest is shown")
+    args = parser.parse_args(argv)
+    sizes: List[int] = [int(n) for n in args.messages.split(",")]
+
+    from sqlalchemy import select
+
+    from db import model  # noqa: F401  (maps all models)
+    from db.model.conversation import Conversation
+    from db.model.message import Message
+    from db.session import SessionLocal
+    from repository.conversation import conversation as conversation_repo
+    from schema.conversation import ConversationInDB
+    from schema.message import MessageInDB
+
+    print(f"{'messages':>8}  {'load+build validate':>19}  {'construct':>9}  {'speedup':>7}  "
+          f"{'build validate':>14}  {'construct':>9}  {'speedup':>7}")
+    with SessionLocal() as db:
+        ids = [_seed(db, n) for n in sizes]
+        try:
+            for n, conversation_id in zip(sizes, ids):
+                def load_validate():
+                    db.expire_all()
+                    conv = db.get(Conversation, conversation_id)
+                    return ConversationInDB.model_validate(conv)
+
+                def load_construct():
+                    db.expire_all()
+                    return conversation_repo.get_with_messages(db, id=conversation_id)
+
+                conv = db.get(Conversation, conversation_id)
+                conv.messages  # loaded once for "build only"
+                rows = db.execute(
+                    select(Message.id, Message.sender_type, Message.content, Message.created_at)
+                    .where(Message.conversation_id == conversation_id)
+                    .order_by(Message.created_at)
+                ).all()
+
+                def build_validate():
+                    return ConversationInDB.model_validate(conv)
+
+                def build_construct():
+                    return ConversationInDB.model_construct(
+                        id=conv.id, session_id=conv.session_id, title=conv.title, created_at=conv.created_at,
+                        messages=[MessageInDB.model_construct(**row._mapping) for row in rows],
+                    )
+
+                load = (_best(load_validate, args.repeat), _best(load_construct, args.repeat))
+                build = (_best(build_validate, args.repeat), _best(build_construct, args.repeat))
+                print(f"{n:>8}  {load[0]:>16.2f} ms  {load[1]:>6.2f} ms  {load[0] / load[1]:>6.1f}x  "
+                      f"{build[0]:>11.2f} ms  {build[1]:>6.2f} ms  {build[0] / build[1]:>6.1f}x")
+        finally:
+            conversation_repo.remove_many(db, ids=ids)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Throughput as the number of gunicorn workers grows.
+
+For each worker count the app is started with gunicorn.conf.py (as in the
+Procfile) on a local port, and client processes, each holding one keep-alive
+connection, request the same path for a fixed time. The database in
+DATABASE_URL is used as-is; unless `--path` is given, a conversation with
+`--messages` messages is added to it and its message list is fetched, which
+exercises the DB pool, the ORM and serialization but not the AI provider.
+Rate limiting is switched off for the servers started here.
+
+    python -m bench.workers                              # 1, 2 and 4 workers
+    python -m bench.workers --workers 1,2,4,8 --clients 64 --duration 20
+    python -m bench.workers --path /api/v1/conversations/<id>
+
+Run it on the machine size it should describe: workers beyond the number of
+free CPU cores (client processes need some too) cannot add throughput.
+"""
+
+import argparse
+import http.client
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import time
+from typing import List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _wait_ready(port: int, process: subprocess.Popen, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with status {process.returncode}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/")
+            if conn.getresponse().status == 200:
+                conn.close()
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"server on port {port} not ready after {timeout:.0f}s")
+
+
+def _start_server(workers: int, port: int) -> subprocess.Popen:
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), PORT=str(port), RATE_LIMIT_ENABLED="false")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "main:app", "-c", "gunicorn.conf.py",
+         "--access-logfile", "/dev/null", "--log-level", "warning"],
+        cwd=ROOT, env=env,
+    )
+    try:
+        _wait_ready(port, process)
+    except Exception:
+        _stop_server(process)
+        raise
+    return process
+
+
+def _stop_server(process: subprocess.Popen) -> None:
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=60)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def _seed(messages: int) -> str:
+    """Adds a conversation with `messages` messages; returns the path of its message list."""
+    sys.path.insert(0, ROOT)
+    import uuid
+
+    from db import model  # noqa: F401  (maps all models)
+    from db.model.conversation import Conversation
+    from db.model.message import Message, SenderType
+    from db.model.session import Session
+    from db.session import SessionLocal
+
+    with SessionLocal() as db:
+        session = Session(id=uuid.uuid4())
+        conversation = Conversation(id=uuid.uuid4(), session_id=session.id)
+        db.add(session)
+        db.flush()
+        db.add(conversation)
+        for i in range(messages):
+            sender = SenderType.USER if i % 2 == 0 else SenderType.AI
+            content = f"benchmark message {i} " + "lorem ipsum dolor sit amet " * 20
+            db.add(Message(conversation=conversation, sender_type=sender, content=content))
+        db.commit()
+        return f"/api/v1/conversations/{conversation.id}/messages"
+
+
+def _client(args: Tuple[int, str, float]) -> Tuple[int, int, List[float]]:
+    """One keep-alive connection requesting `path` until `stop_at`: (ok, errors, latencies)."""
+    port, path, stop_at = args
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    ok = errors = 0
+    latencies = []
+    while time.time() < stop_at:
+        start = time.perf_counter()
+        try:
+            conn.request("GET", path)
+            response = conn.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - start)
+        if response.status == 200:
+            ok += 1
+        else:
+            errors += 1
+    conn.close()
+    return ok, errors, latencies
+
+
+def _measure(pool, port: int, path: str, clients: int, duration: float, warmup: float) -> Tuple[float, int, List[float]]:
+    if warmup:
+        pool.map(_client, [(port, path, time.time() + warmup)] * clients)
+    results = pool.map(_client, [(port, path, time.time() + duration)] * clients)
+    ok = sum(r[0] for r in results)
+    errors = sum(r[1] for r in results)
+    latencies = sorted(latency for r in results for latency in r[2])
+    return ok / duration, errors, latencies
+
+
+def _percentile(latencies: List[float], q: float) -> float:
+    return latencies[min(len(latencies) - 1, int(q * len(latencies)))] if latencies else float("nan")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m bench.workers")
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated worker counts (default: 1,2,4)")
+    parser.add_argument("--clients", type=int, default=0, help="Concurrent connections (default: 8 per worker of the largest count)")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds measured per worker count")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Seconds of unmeasured load first")
+    parser.add_argument("--path", help="Path to request (default: the message list of a seeded conversation)")
+    parser.add_argument("--messages", type=int, default=20, help="Messages in the seeded conversation")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args(argv)
+
+    counts = [int(n) for n in args.workers.split(",")]
+    clients = args.clients or 8 * max(counts)
+    path: Optional[str] = args.path
+    print(f"{clients} connections, {args.duration:.0f}s per run, {os.cpu_count()} CPUs")
+    print(f"{'workers':>7}  {'req/s':>9}  {'speedup':>7}  {'p50 ms':>7}  {'p99 ms':>7}  {'errors':>6}")
+
+    baseline = None
+    with multiprocessing.Pool(clients) as pool:
+        for workers in counts:
+            server = _start_server(workers, args.port)
+            try:
+                # Seeded once the first server has run the migrations.
+                path = path or _seed(args.messages)
+                rate, errors, latencies = _measure(pool, args.port, path, clients, args.duration, args.warmup)
+            finally:
+                _stop_server(server)
+            baseline = baseline or rate
+            print(f"{workers:>7}  {rate:>9,.0f}  {rate / baseline:>6.2f}x  "
+                  f"{_percentile(latencies, 0.5) * 1e3:>7.1f}  {_percentile(latencies, 0.99) * 1e3:>7.1f}  {errors:>6}")
+
+
+if __name__ == "__main__":
+    main()
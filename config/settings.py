@@ -20,6 +20,107 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8  # 8 days
     ALGORITHM: str = "HS256"
 
+    # Write-behind buffer for session inserts / session-end beacons
+    SESSION_BUFFER_FLUSH_INTERVAL_MS: int = 500
+    SESSION_BUFFER_MAX_ROWS: int = 200
+    SESSION_BUFFER_DEAD_LETTER_PATH: str = "dead_letters/session_buffer.jsonl"  # rows the database rejected
+
+    # Database backups
+    BACKUP_DIR: str = "backups"
+    BACKUP_KEEP: int = 7
+    BACKUP_INTERVAL_MINUTES: int = 0  # 0 disables scheduled snapshots
+    BACKUP_TIMEOUT_SECONDS: int = 1800  # a snapshot taking longer is aborted
+    BACKUP_DOWNLOAD_MAX_AGE_SECONDS: int = 0  # /download-db reuses a snapshot younger than this; 0 = always a new one
+
+    # Archival of idle conversations
+    ARCHIVE_DIR: str = "archive"
+    ARCHIVE_IDLE_DAYS: int = 30
+    ARCHIVE_SEGMENT_MAX_MB: int = 64
+
+    # Run pending Alembic migrations on startup (disable when a release step runs them)
+    AUTO_MIGRATE: bool = True
+
+    # State shared between worker processes (services/state_store.py)
+    STATE_STORE_BACKEND: str = "database"  # "memory", "database" or "redis"
+    REDIS_URL: str = "redis://localhost:6379/0"
+    CHAT_STATE_TTL_SECONDS: int = 7 * 24 * 3600
+    OAUTH_STATE_TTL_SECONDS: int = 600
+    OAUTH_STATE_MAX_OUTSTANDING: int = 10_000
+
+    # Multi-worker serving (gunicorn.conf.py)
+    WEB_CONCURRENCY: int = 0  # worker processes; 0 = one per CPU core
+    WEB_TIMEOUT_SECONDS: int = 120
+    WEB_GRACEFUL_TIMEOUT_SECONDS: int = 90  # time in-flight AI calls get to finish on SIGTERM
+    # Proxies whose X-Forwarded-For is trusted for the client address (rate limits, Session.ip_address).
+    # The Heroku router connects from 10.0.0.0/8; the rightmost untrusted address is the client.
+    FORWARDED_ALLOW_IPS: str = "127.0.0.1,10.0.0.0/8"
+
+    # Per-request phase timing (services/timing.py)
+    SERVER_TIMING_ENABLED: bool = True  # send a Server-Timing response header
+    REQUEST_TIMING_LOG: bool = False  # one JSON log line per request
+    SLOW_REQUEST_THRESHOLD_MS: int = 5000  # 0 disables slow-request sampling
+    SLOW_REQUEST_SAMPLE_RATE: float = 1.0  # fraction of slow requests stored
+    SLOW_REQUEST_RETENTION_DAYS: int = 14
+
+    # Query instrumentation (db/query_log.py)
+    SLOW_QUERY_THRESHOLD_MS: int = 200  # log slower statements with their EXPLAIN plan; 0 disables
+    QUERY_COUNT_WARN_THRESHOLD: int = 50  # warn when one request runs more statements; 0 disables
+
+    # On-demand sampling profiler (services/profiler.py)
+    PROFILE_DIR: str = "profiles"
+    PROFILE_KEEP: int = 50
+    PROFILER_MAX_SECONDS: int = 600  # longest an arm can stay active
+
+    # OpenTelemetry tracing (services/tracing.py)
+    TRACING_EXPORTER: str = "none"  # "none", "file" or "otlp"
+    TRACING_SAMPLE_RATIO: float = 1.0  # fraction of new traces recorded
+    TRACING_FILE_DIR: str = "traces"
+    TRACING_OTLP_ENDPOINT: str = "http://localhost:4318/v1/traces"
+
+    # Response compression (services/compression.py)
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MIN_BYTES: int = 1024  # smaller single-message responses are sent uncompressed
+
+    # Local red-flag triage (services/triage.py); hits always set criticality_flag
+    TRIAGE_EMERGENCY_REPLY: bool = False  # answer red-flag messages with emergency guidance, skipping the AI call
+
+    # Token-bucket rate limiting (services/rate_limit.py)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "database"  # "memory" (per worker), "database" or "redis"
+    # "<route>:<scope>" -> "<N>/<period>"; scopes are ip, session and user
+    RATE_LIMITS: dict[str, str] = {
+        "sessions:ip": "60/hour",
+        "messages:ip": "30/minute",
+        "messages:session": "10/minute",
+        "messages:user": "10/minute",
+    }
+    # Routes whose buckets use another backend. POST /sessions must not wait on the
+    # database (it is write-behind), so its per-IP limit is kept per worker.
+    RATE_LIMIT_ROUTE_BACKENDS: dict[str, str] = {"sessions": "memory"}
+
+    # Background extraction of conditions / urgency / specialty from AI replies (services/extraction.py)
+    EXTRACTION_ENABLED: bool = True
+    EXTRACTION_WORKERS: int = 2  # threads per process, i.e. concurrent provider calls
+    EXTRACTION_BATCH_SIZE: int = 10  # replies per provider call
+    EXTRACTION_BATCH_WAIT_MS: int = 2000  # how long a partial batch waits for more replies
+    EXTRACTION_QUEUE_MAX: int = 1000  # replies beyond this are left for the backfill command
+    EXTRACTION_MAX_ATTEMPTS: int = 3
+    EXTRACTION_MAX_FAILURES: int = 3  # failed batches before a reply is only retried by `backfill --retry-failed`
+    EXTRACTION_BACKFILL_LIMIT: int = 500  # replies per run of the periodic `extraction_backfill` job
+
+    # Durable background jobs (services/jobs.py)
+    JOBS_ENABLED: bool = True
+    JOBS_WORKERS: int = 2  # threads per process
+    JOBS_POLL_INTERVAL_MS: int = 1000  # how often idle workers look for due jobs from other processes
+    JOBS_MAX_ATTEMPTS: int = 5
+    JOBS_RETRY_BASE_SECONDS: int = 10  # backoff after a failed attempt; doubles with every attempt
+    JOBS_LEASE_SECONDS: int = 600  # a job not renewed for this long (its worker died) is presumed lost
+    # Periodic jobs: name -> interval in minutes (0 disables)
+    JOBS_PERIODIC: dict[str, int] = {
+        "extraction_backfill": 0,
+        "archive_idle": 0,
+    }
+
     class Config:
         env_file = ".env"
 
@@ -0,0 +1,206 @@
+"""
+Incrementally maintained marketing attribution cubes.
+
+Each activity row (session, conversation, message, login, feedback) adds one
+to the `attribution_cubes` cell for the day it happened and the UTM source /
+medium / campaign of the session it belongs to. A login (an anonymous session
+linked to an account) counts on the day its session started, live and in the
+backfill alike, so login rates compare logins with the sessions they came
+from. Cubes record activity as it happens, so later deletes do not rewrite
+history. `backfill` rebuilds cells from the base tables for historical data;
+the messages and feedback of archived conversations are read from their
+archive frames by the caller (`services.archive`) and passed in:
+
+    python -m db.attribution backfill [--since YYYY-MM-DD]
+"""
+
+import argparse
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import event, func, inspect, select, delete
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from db.counters import to_utc_day
+from db.session import SessionLocal
+from db.upsert import upsert_add
+from db.model.session import Session as SessionModel
+from db.model.conversation import Conversation as ConversationModel
+from db.model.message import Message as MessageModel
+from db.model.response_feedback import ResponseFeedback, FeedbackType
+from db.model.attribution import AttributionCube
+
+METRICS = ("sessions", "conversations", "messages", "logins", "likes", "dislikes")
+
+Utm = Tuple[str, str, str]  # (utm_source, utm_medium, utm_campaign), "" when missing
+# (day, utm) -> metric -> delta
+CubeDeltas = Dict[Tuple[date, Utm], Dict[str, int]]
+
+
+def utm_key(source: Optional[str], medium: Optional[str], campaign: Optional[str]) -> Utm:
+    return (source or "", medium or "", campaign or "")
+
+
+def feedback_column(feedback_type) -> str:
+    return "likes" if FeedbackType(feedback_type) == FeedbackType.LIKE else "dislikes"
+
+
+def apply_cube_deltas(connection: Connection, deltas: CubeDeltas) -> None:
+    """Writes cube deltas using the caller's transaction."""
+    table = AttributionCube.__table__
+    for (day, (source, medium, campaign)), metrics in deltas.items():
+        metrics = {k: v for k, v in metrics.items() if v}
+        if metrics:
+            key = {"day": day, "utm_source": source, "utm_medium": medium, "utm_campaign": campaign}
+            upsert_add(connection, table, key, metrics)
+
+
+# ---- Incremental maintenance ----
+
+def _resolve_utms(connection: Connection, column, join_path: Iterable, ids: set) -> Dict:
+    """Maps ids in `column` (sessions, conversations or messages) to their session's UTM key."""
+    if not ids:
+        return {}
+    stmt = select(column, SessionModel.utm_source, SessionModel.utm_medium, SessionModel.utm_campaign)
+    for target, on in join_path:
+        stmt = stmt.join(target, on)
+    rows = connection.execute(stmt.where(column.in_(ids))).all()
+    return {row[0]: utm_key(row[1], row[2], row[3]) for row in rows}
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _maintain_cubes(session: Session, flush_context) -> None:
+    today = datetime.now(timezone.utc).date()
+    deltas: CubeDeltas = defaultdict(lambda: defaultdict(int))
+
+    # (metric, owner id, delta) entries whose UTM has to be looked up
+    by_session: list = []
+    by_conversation: list = []
+    by_message: list = []
+
+    for obj in session.new:
+        if isinstance(obj, SessionModel):
+            deltas[(today, utm_key(obj.utm_source, obj.utm_medium, obj.utm_campaign))]["sessions"] += 1  # type: ignore
+        elif isinstance(obj, ConversationModel):
+            by_session.append(("conversations", obj.session_id, 1))
+        elif isinstance(obj, MessageModel):
+            by_conversation.append(("messages", obj.conversation_id, 1))
+        elif isinstance(obj, ResponseFeedback):
+            by_message.append((feedback_column(obj.feedback_type), obj.message_id, 1))
+
+    for obj in session.dirty:
+        if obj in session.deleted:
+            continue
+        state = inspect(obj)
+        if isinstance(obj, SessionModel):
+            history = state.attrs.user_id.history
+            # An anonymous session being linked to an account is a login.
+            if history.added and history.added[0] is not None and not any(history.deleted or ()):
+                utm = utm_key(state.dict.get("utm_source"), state.dict.get("utm_medium"), state.dict.get("utm_campaign"))
+                deltas[(to_utc_day(state.dict.get("started_at")) or today, utm)]["logins"] += 1
+        elif isinstance(obj, ResponseFeedback):
+            history = state.attrs.feedback_type.history
+            for old in history.deleted or ():
+                if old is not None:
+                    by_message.append((feedback_column(old), state.dict.get("message_id"), -1))
+            for new in history.added or ():
+                if new is not None:
+                    by_message.append((feedback_column(new), state.dict.get("message_id"), 1))
+
+    if not (deltas or by_session or by_conversation or by_message):
+        return
+
+    connection = session.connection()
+    session_utms = _resolve_utms(connection, SessionModel.id, [], {i for _, i, _ in by_session})
+    conversation_utms = _resolve_utms(
+        connection, ConversationModel.id,
+        [(SessionModel, SessionModel.id == ConversationModel.session_id)],
+        {i for _, i, _ in by_conversation},
+    )
+    message_utms = _resolve_utms(
+        connection, MessageModel.id,
+        [(ConversationModel, ConversationModel.id == MessageModel.conversation_id),
+         (SessionModel, SessionModel.id == ConversationModel.session_id)],
+        {i for _, i, _ in by_message},
+    )
+    for pending, utms in ((by_session, session_utms), (by_conversation, conversation_utms), (by_message, message_utms)):
+        for metric, owner_id, delta in pending:
+            deltas[(today, utms.get(owner_id, utm_key(None, None, None)))][metric] += delta
+
+    apply_cube_deltas(connection, deltas)
+
+
+# ---- Backfill ----
+
+def backfill(db: Session, *, since: Optional[date] = None, archived: Optional[CubeDeltas] = None) -> int:
+    """
+    Rebuilds cube cells from the base tables, for all days or from `since` on.
+    Logins are attributed to the day the session started. `archived` holds
+    the cells for messages and feedback of archived conversations, which are
+    no longer in the base tables (`ConversationArchive.attribution_deltas`).
+    Returns the number of cells written.
+    """
+    utm_cols = (SessionModel.utm_source, SessionModel.utm_medium, SessionModel.utm_campaign)
+    deltas: CubeDeltas = defaultdict(lambda: defaultdict(int))
+
+    def add(metric: Optional[str], day_col, base, *joins, where=()):
+        # metric=None splits feedback rows into likes / dislikes
+        day_expr = func.date(day_col)
+        extra = [ResponseFeedback.feedback_type] if metric is None else []
+        stmt = select(day_expr, *utm_cols, *extra, func.count()).select_from(base)
+        for target, on in joins:
+            stmt = stmt.join(target, on)
+        if since is not None:
+            stmt = stmt.where(day_col >= since)
+        stmt = stmt.where(*where).group_by(day_expr, *utm_cols, *extra)
+        for row in db.execute(stmt):
+            day = date.fromisoformat(row[0]) if isinstance(row[0], str) else row[0]
+            if day is None:
+                continue
+            column = metric or feedback_column(row[4])
+            deltas[(day, utm_key(row[1], row[2], row[3]))][column] += row[-1]
+
+    conv_join = (SessionModel, SessionModel.id == ConversationModel.session_id)
+    msg_join = (ConversationModel, ConversationModel.id == MessageModel.conversation_id)
+    fb_join = (MessageModel, MessageModel.id == ResponseFeedback.message_id)
+
+    add("sessions", SessionModel.started_at, SessionModel)
+    add("logins", SessionModel.started_at, SessionModel, where=[SessionModel.user_id.isnot(None)])
+    add("conversations", ConversationModel.created_at, ConversationModel, conv_join)
+    add("messages", MessageModel.created_at, MessageModel, msg_join, conv_join)
+    add(None, ResponseFeedback.created_at, ResponseFeedback, fb_join, msg_join, conv_join)
+
+    for cell, metrics in (archived or {}).items():
+        for metric, count in metrics.items():
+            deltas[cell][metric] += count
+
+    stmt = delete(AttributionCube.__table__)
+    if since is not None:
+        stmt = stmt.where(AttributionCube.day >= since)
+    db.execute(stmt)
+    apply_cube_deltas(db.connection(), deltas)
+    db.commit()
+    return len(deltas)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m db.attribution")
+    sub = parser.add_subparsers(dest="command", required=True)
+    backfill_cmd = sub.add_parser("backfill", help="Rebuild attribution cubes from the base tables")
+    backfill_cmd.add_argument("--since", type=date.fromisoformat, default=None,
+                              help="Only rebuild days on or after this date (YYYY-MM-DD)")
+    args = parser.parse_args(argv)
+
+    from db import migrate
+    from repository.attribution import attribution  # reads the archive too
+
+    migrate.upgrade_to_head()
+    with SessionLocal() as db:
+        cells = attribution.backfill(db, since=args.since)
+    print(f"Backfilled {cells} attribution cube cells.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+Incrementally maintained dashboard counters and daily rollups.
+
+Every ORM flush is inspected for inserted/deleted sessions, conversations,
+messages and feedback (plus like <-> dislike changes), and the resulting deltas
+are written to `stats_counters` / `daily_stats_rollups` in the same
+transaction. Core bulk writes that bypass the ORM call `apply_deltas` directly.
+`rebuild` recomputes everything from the base tables (bootstrap / compaction).
+"""
+
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import event, func, inspect, delete, insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from db.session import SessionLocal
+from db.upsert import upsert_add
+from db.model.session import Session as SessionModel
+from db.model.conversation import Conversation as ConversationModel
+from db.model.message import Message as MessageModel
+from db.model.response_feedback import ResponseFeedback, FeedbackType
+from db.model.stats import StatsCounter, DailyStatsRollup
+from db.model.archived_conversation import ArchivedConversation
+
+SESSIONS = "sessions"
+CONVERSATIONS = "conversations"
+MESSAGES = "messages"
+FEEDBACK_LIKE = "feedback_like"
+FEEDBACK_DISLIKE = "feedback_dislike"
+
+METRICS = (SESSIONS, CONVERSATIONS, MESSAGES, FEEDBACK_LIKE, FEEDBACK_DISLIKE)
+
+# (metric, day) -> delta; day is None when a deleted row's date is unknown
+Deltas = Dict[Tuple[str, Optional[date]], int]
+
+# model -> (metric, name of the creation timestamp attribute)
+_TRACKED = {
+    SessionModel: (SESSIONS, "started_at"),
+    ConversationModel: (CONVERSATIONS, "created_at"),
+    MessageModel: (MESSAGES, "created_at"),
+}
+
+
+def feedback_metric(feedback_type: FeedbackType | str | None) -> Optional[str]:
+    if feedback_type is None:
+        return None
+    return FEEDBACK_LIKE if FeedbackType(feedback_type) == FeedbackType.LIKE else FEEDBACK_DISLIKE
+
+
+def to_utc_day(value: Optional[datetime]) -> Optional[date]:
+    if value is None:
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.date()
+
+
+def _metric_and_day(obj, *, deleted: bool) -> Tuple[Optional[str], Optional[date]]:
+    state = inspect(obj)
+    if isinstance(obj, ResponseFeedback):
+        metric, attr = feedback_metric(state.dict.get("feedback_type")), "created_at"
+    elif type(obj) in _TRACKED:
+        metric, attr = _TRACKED[type(obj)]
+    else:
+        return None, None
+
+    if not deleted:
+        # Server-side defaults aren't loaded yet; a new row is created "now".
+        return metric, datetime.now(timezone.utc).date()
+    # Only look at already-loaded state; never trigger a load mid-flush.
+    return metric, to_utc_day(state.dict.get(attr))
+
+
+def _collect_deltas(session: Session) -> Deltas:
+    deltas: Deltas = defaultdict(int)
+    for obj in session.new:
+        metric, day = _metric_and_day(obj, deleted=False)
+        if metric:
+            deltas[(metric, day)] += 1
+    for obj in session.deleted:
+        metric, day = _metric_and_day(obj, deleted=True)
+        if metric:
+            deltas[(metric, day)] -= 1
+    for obj in session.dirty:
+        if not isinstance(obj, ResponseFeedback) or obj in session.deleted:
+            continue
+        state = inspect(obj)
+        history = state.attrs.feedback_type.history
+        if not history.has_changes():
+            continue
+        day = to_utc_day(state.dict.get("created_at"))
+        for old in history.deleted or ():
+            if old is not None:
+                deltas[(feedback_metric(old), day)] -= 1  # type: ignore
+        for new in history.added or ():
+            if new is not None:
+                deltas[(feedback_metric(new), day)] += 1  # type: ignore
+    return deltas
+
+
+def apply_deltas(connection: Connection, deltas: Deltas) -> None:
+    """Writes counter and rollup deltas using the caller's transaction."""
+    totals: Dict[str, int] = defaultdict(int)
+    for (metric, day), delta in deltas.items():
+        totals[metric] += delta
+        if day is not None and delta:
+            upsert_add(connection, DailyStatsRollup.__table__, {"day": day, "metric": metric}, {"value": delta})
+    for metric, delta in totals.items():
+        if delta:
+            upsert_add(connection, StatsCounter.__table__, {"name": metric}, {"value": delta})
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _maintain_counters(session: Session, flush_context) -> None:
+    deltas = _collect_deltas(session)
+    if deltas:
+        apply_deltas(session.connection(), deltas)
+
+
+def deleted_conversation_deltas(db: Session, conversation_ids) -> Deltas:
+    """
+    Counter deltas for deleting the given conversations (a list or id subquery)
+    with everything under them, computed with grouped queries instead of
+    loading the rows. Call before the set-based deletes, then `apply_deltas`.
+    """
+    deltas: Deltas = defaultdict(int)
+    in_scope = MessageModel.conversation_id.in_(conversation_ids)
+    sources = [
+        (CONVERSATIONS, ConversationModel.created_at, ConversationModel.id.in_(conversation_ids), None),
+        (MESSAGES, MessageModel.created_at, in_scope, None),
+        (FEEDBACK_LIKE, ResponseFeedback.created_at, in_scope, ResponseFeedback.feedback_type == FeedbackType.LIKE),
+        (FEEDBACK_DISLIKE, ResponseFeedback.created_at, in_scope, ResponseFeedback.feedback_type == FeedbackType.DISLIKE),
+    ]
+    for metric, created_col, scope, condition in sources:
+        day_col = func.date(created_col)
+        query = db.query(day_col, func.count()).select_from(created_col.class_)
+        if created_col.class_ is ResponseFeedback:
+            query = query.join(MessageModel, MessageModel.id == ResponseFeedback.message_id)
+        query = query.filter(scope)
+        if condition is not None:
+            query = query.filter(condition)
+        for day, count in query.group_by(day_col).all():
+            if isinstance(day, str):
+                day = date.fromisoformat(day)
+            deltas[(metric, day)] -= count
+
+    # Archived messages and feedback only ever counted towards the totals.
+    archived = db.query(
+        func.sum(ArchivedConversation.message_count),
+        func.sum(ArchivedConversation.like_count),
+        func.sum(ArchivedConversation.dislike_count),
+    ).filter(ArchivedConversation.conversation_id.in_(conversation_ids)).one()
+    for metric, count in zip((MESSAGES, FEEDBACK_LIKE, FEEDBACK_DISLIKE), archived):
+        if count:
+            deltas[(metric, None)] -= count
+    return deltas
+
+
+def rebuild(db: Session) -> None:
+    """
+    Recomputes all counters and daily rollups from the base tables.
+
+    This is the compactor: it runs once to bootstrap an existing database and
+    can be re-run (e.g. from the admin API) to correct drift from writes that
+    bypassed the ORM. Archived messages and feedback only count towards the
+    all-time totals.
+    """
+    daily: Deltas = defaultdict(int)
+    sources = [
+        (SESSIONS, SessionModel.started_at, None),
+        (CONVERSATIONS, ConversationModel.created_at, None),
+        (MESSAGES, MessageModel.created_at, None),
+        (FEEDBACK_LIKE, ResponseFeedback.created_at, ResponseFeedback.feedback_type == FeedbackType.LIKE),
+        (FEEDBACK_DISLIKE, ResponseFeedback.created_at, ResponseFeedback.feedback_type == FeedbackType.DISLIKE),
+    ]
+    for metric, created_col, condition in sources:
+        day_col = func.date(created_col)
+        query = db.query(day_col, func.count()).select_from(created_col.class_)
+        if condition is not None:
+            query = query.filter(condition)
+        for day, count in query.group_by(day_col).all():
+            if isinstance(day, str):
+                day = date.fromisoformat(day)
+            daily[(metric, day)] += count
+
+    # Archived rows left the base tables but still count towards the totals.
+    archived = db.query(
+        func.sum(ArchivedConversation.message_count),
+        func.sum(ArchivedConversation.like_count),
+        func.sum(ArchivedConversation.dislike_count),
+    ).one()
+    for metric, count in zip((MESSAGES, FEEDBACK_LIKE, FEEDBACK_DISLIKE), archived):
+        daily[(metric, None)] += count or 0
+
+    db.execute(delete(StatsCounter.__table__))
+    db.execute(delete(DailyStatsRollup.__table__))
+    for metric in METRICS:
+        db.execute(insert(StatsCounter.__table__).values(name=metric, value=0))
+    apply_deltas(db.connection(), daily)
+    db.commit()
+
+
+def ensure_initialized(db: Session) -> None:
+    """Bootstraps the counters from the base tables if they have never been built."""
+    if db.query(StatsCounter.name).first() is None:
+        rebuild(db)
@@ -0,0 +1,37 @@
+"""
+Schema management through Alembic (see `migrations/`).
+
+`upgrade_to_head` is what the app runs on startup when `AUTO_MIGRATE` is on,
+and what the release step in the Procfile runs. Databases created by the old
+import-time `create_all` need no special handling: the early revisions only
+create the tables and columns that are missing.
+"""
+
+import os
+from typing import TYPE_CHECKING
+
+from db.session import engine
+
+if TYPE_CHECKING:
+    from alembic.config import Config
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _alembic_config() -> "Config":
+    from alembic.config import Config
+
+    config = Config(os.path.join(_ROOT, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(_ROOT, "migrations"))
+    config.attributes["configure_logger"] = False  # keep the app's logging setup
+    return config
+
+
+def upgrade_to_head() -> None:
+    """Brings the database schema up to date."""
+    from alembic import command
+
+    config = _alembic_config()
+    with engine.begin() as connection:
+        config.attributes["connection"] = connection
+        command.upgrade(config, "head")
@@ -0,0 +1,15 @@
+from .user import User
+from .session import Session
+from .conversation import Conversation
+from .message import Message, SenderType
+from .ai_analysis import AIAnalysis
+from .response_feedback import ResponseFeedback, FeedbackType
+from .survey_response import SurveyResponse
+from .symptom_log import SymptomLog
+from .stats import StatsCounter, DailyStatsRollup
+from .attribution import AttributionCube
+from .archived_conversation import ArchivedConversation
+from .shared_state import SharedState
+from .slow_request import SlowRequest
+from .rate_limit import RateLimitBucket
+from .job import Job
\ No newline at end of file
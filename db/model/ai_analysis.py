@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, Boolean, Integer, String, JSON, ForeignKey
+from sqlalchemy import Column, Boolean, DateTime, Integer, String, JSON, ForeignKey
 from sqlalchemy.types import UUID
 from sqlalchemy.orm import relationship
 from db.base import Base
@@ -13,6 +13,14 @@ class AIAnalysis(Base):
     criticality_flag = Column(Boolean, default=False)
     processing_time_ms = Column(Integer, nullable=True)
     ai_provider = Column(String(100), nullable=True)
+    ai_model = Column(String(100), nullable=True)
+    is_error = Column(Boolean, default=False)
     token_usage = Column(JSON, nullable=True)
+    trace_id = Column(String(32), nullable=True)  # OpenTelemetry trace of the request that produced it
+    # Filled in the background by services/extraction.py; NULL extracted_at = not extracted yet
+    urgency = Column(String(20), nullable=True)  # emergency / urgent / routine / self_care
+    recommended_specialty = Column(String(100), nullable=True)
+    extracted_at = Column(DateTime(timezone=True), nullable=True, index=True)
+    extraction_failures = Column(Integer, nullable=False, default=0, server_default="0")  # failed batches so far
     
     message = relationship("Message", back_populates="ai_analysis")
\ No newline at end of file
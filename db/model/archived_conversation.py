@@ -0,0 +1,27 @@
+import uuid
+from sqlalchemy import Column, String, Integer, BigInteger, DateTime, ForeignKey
+from sqlalchemy.types import UUID
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from db.base import Base
+
+class ArchivedConversation(Base):
+    """
+    Index entry for a conversation whose messages were moved to an archive segment.
+    The conversation row itself stays in `conversations`; its messages, analyses
+    and feedback live in one compressed frame at `segment`[`frame_offset`:+`frame_length`].
+    """
+    __tablename__ = "archived_conversations"
+    conversation_id = Column(UUID(as_uuid=True), ForeignKey("conversations.id"), primary_key=True)
+
+    segment = Column(String(255), nullable=False)
+    frame_offset = Column(BigInteger, nullable=False)
+    frame_length = Column(Integer, nullable=False)
+
+    message_count = Column(Integer, nullable=False, default=0)
+    like_count = Column(Integer, nullable=False, default=0)
+    dislike_count = Column(Integer, nullable=False, default=0)
+    last_message_at = Column(DateTime(timezone=True), nullable=True)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    conversation = relationship("Conversation", back_populates="archive")
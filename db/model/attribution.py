@@ -0,0 +1,20 @@
+from sqlalchemy import Column, String, Date, BigInteger
+from db.base import Base
+
+class AttributionCube(Base):
+    """
+    Pre-aggregated activity per day x utm_source x utm_medium x utm_campaign.
+    Missing UTM values are stored as "" so they can be part of the primary key.
+    """
+    __tablename__ = "attribution_cubes"
+    day = Column(Date, primary_key=True)
+    utm_source = Column(String(255), primary_key=True, default="")
+    utm_medium = Column(String(255), primary_key=True, default="")
+    utm_campaign = Column(String(255), primary_key=True, default="")
+
+    sessions = Column(BigInteger, nullable=False, default=0)
+    conversations = Column(BigInteger, nullable=False, default=0)
+    messages = Column(BigInteger, nullable=False, default=0)
+    logins = Column(BigInteger, nullable=False, default=0)
+    likes = Column(BigInteger, nullable=False, default=0)
+    dislikes = Column(BigInteger, nullable=False, default=0)
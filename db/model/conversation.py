@@ -1,16 +1,23 @@
 import uuid
-from sqlalchemy import Column, String, DateTime, ForeignKey
+from sqlalchemy import Column, String, DateTime, ForeignKey, Index
 from sqlalchemy.types import UUID
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 from db.base import Base
 
+DEFAULT_TITLE = "New Chat"  # until one is generated (services/tasks.py) or set by the user
+
 class Conversation(Base):
     __tablename__ = "conversations"
+    __table_args__ = (
+        # A session's conversations, most recent first
+        Index("ix_conversations_session_id_created_at", "session_id", text("created_at DESC")),
+    )
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    session_id = Column(UUID(as_uuid=True), ForeignKey("sessions.id"), nullable=False, index=True)
+    session_id = Column(UUID(as_uuid=True), ForeignKey("sessions.id"), nullable=False)
     
-    title = Column(String(255), default="New Chat")
+    title = Column(String(255), default=DEFAULT_TITLE)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
-    messages = relationship("Message", back_populates="conversation", cascade="all, delete-orphan")
\ No newline at end of file
+    messages = relationship("Message", back_populates="conversation", cascade="all, delete-orphan", order_by="Message.created_at")
+    archive = relationship("ArchivedConversation", back_populates="conversation", uselist=False, cascade="all, delete-orphan")
\ No newline at end of file
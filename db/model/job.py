@@ -0,0 +1,32 @@
+import uuid
+from sqlalchemy import Column, DateTime, Index, Integer, JSON, String, Text
+from sqlalchemy.types import UUID
+from sqlalchemy.sql import func
+from db.base import Base
+
+class Job(Base):
+    """
+    A unit of background work for `services.jobs`. A one-off job's row is
+    deleted once it succeeds; a periodic one (`interval_seconds` set) keeps
+    its row and is re-queued after every run.
+    """
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # The claim query: the earliest due queued job
+        Index("ix_jobs_status_run_at", "status", "run_at"),
+    )
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    name = Column(String(100), nullable=False)
+    payload = Column(JSON, nullable=True)
+    # At most one job per key at a time, e.g. "title:<conversation_id>"; periodic jobs use "periodic:<name>"
+    key = Column(String(255), nullable=True, unique=True)
+    status = Column(String(20), nullable=False, default="queued")  # queued / running / failed
+    run_at = Column(DateTime(timezone=True), nullable=False)
+    interval_seconds = Column(Integer, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False)
+    locked_by = Column(String(100), nullable=True)  # "<host>:<pid>:<thread>" of the worker running it
+    locked_at = Column(DateTime(timezone=True), nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
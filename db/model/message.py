@@ -1,6 +1,7 @@
 import uuid
 import enum
-from sqlalchemy import Column, Text, DateTime, ForeignKey, Enum
+from datetime import datetime, timezone
+from sqlalchemy import Column, Text, DateTime, ForeignKey, Enum, Index
 from sqlalchemy.types import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -12,12 +13,18 @@ class SenderType(str, enum.Enum):
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        # Loading a conversation's messages in order
+        Index("ix_messages_conversation_id_created_at", "conversation_id", "created_at"),
+    )
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    conversation_id = Column(UUID(as_uuid=True), ForeignKey("conversations.id"), nullable=False, index=True)
+    conversation_id = Column(UUID(as_uuid=True), ForeignKey("conversations.id"), nullable=False)
     
     sender_type = Column(Enum(SenderType), nullable=False)
     content = Column(Text, nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Set in Python as well: CURRENT_TIMESTAMP only has second precision on SQLite,
+    # which is not enough to order a user message and its reply.
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), server_default=func.now())
     
     conversation = relationship("Conversation", back_populates="messages")
     ai_analysis = relationship("AIAnalysis", back_populates="message", uselist=False, cascade="all, delete-orphan")
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, String, Float, Index
+from db.base import Base
+
+class RateLimitBucket(Base):
+    """
+    Token bucket for the database backend of `services.rate_limit`. Times are
+    Unix seconds so the refill can be computed inside a single UPDATE.
+    A row past `expires_at` has refilled completely and only waits to be swept.
+    """
+    __tablename__ = "rate_limit_buckets"
+    __table_args__ = (
+        Index("ix_rate_limit_buckets_expires_at", "expires_at"),
+    )
+    key = Column(String(255), primary_key=True)  # "<rule>:<scope>:<value>"
+    tokens = Column(Float, nullable=False)
+    updated_at = Column(Float, nullable=False)
+    expires_at = Column(Float, nullable=False)
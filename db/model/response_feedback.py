@@ -1,6 +1,6 @@
 import uuid
 import enum
-from sqlalchemy import Column, Text, DateTime, ForeignKey, Enum
+from sqlalchemy import Column, Text, DateTime, ForeignKey, Enum, Index
 from sqlalchemy.types import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -12,6 +12,10 @@ class FeedbackType(str, enum.Enum):
 
 class ResponseFeedback(Base):
     __tablename__ = "response_feedback" # Renamed table
+    __table_args__ = (
+        # Admin feedback listing filtered by type, newest first
+        Index("ix_response_feedback_feedback_type_created_at", "feedback_type", "created_at"),
+    )
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     message_id = Column(UUID(as_uuid=True), ForeignKey("messages.id"), nullable=False, unique=True)
     
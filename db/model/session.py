@@ -1,12 +1,16 @@
 import uuid
-from sqlalchemy import Column, String, Text, DateTime, JSON, ForeignKey, Integer
+from sqlalchemy import Column, String, Text, DateTime, JSON, ForeignKey, Integer, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.types import UUID
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 from db.base import Base
 
 class Session(Base):
     __tablename__ = "sessions"
+    __table_args__ = (
+        # A user's most recent session
+        Index("ix_sessions_user_id_started_at", "user_id", text("started_at DESC")),
+    )
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     
     ip_address = Column(String(45), nullable=True) 
@@ -25,5 +29,5 @@ class Session(Base):
     ended_at = Column(DateTime(timezone=True), nullable=True)
     
     
-    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=True, index=True)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=True)
     user = relationship("User", back_populates="sessions")
\ No newline at end of file
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, String, Text, DateTime, Index
+from db.base import Base
+
+class SharedState(Base):
+    """
+    Key/value row for the database backend of `services.state_store`: short-lived
+    state (OAuth states, chat histories) that every worker process must see.
+    """
+    __tablename__ = "shared_state"
+    __table_args__ = (
+        Index("ix_shared_state_expires_at", "expires_at"),
+    )
+    namespace = Column(String(50), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    value = Column(Text, nullable=False)  # JSON
+    expires_at = Column(DateTime(timezone=True), nullable=True)  # NULL = never
@@ -0,0 +1,20 @@
+from datetime import datetime, timezone
+from sqlalchemy import Column, Integer, String, Float, JSON, DateTime, Index
+from sqlalchemy.sql import func
+from db.base import Base
+
+class SlowRequest(Base):
+    """A sampled request that exceeded SLOW_REQUEST_THRESHOLD_MS, with its phase breakdown."""
+    __tablename__ = "slow_requests"
+    __table_args__ = (
+        Index("ix_slow_requests_created_at", "created_at"),
+    )
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), server_default=func.now())
+    method = Column(String(10), nullable=False)
+    route = Column(String(255), nullable=False)
+    status_code = Column(Integer, nullable=False)
+    duration_ms = Column(Float, nullable=False)
+    db_queries = Column(Integer, nullable=True)
+    db_ms = Column(Float, nullable=True)
+    phases = Column(JSON, nullable=False)  # phase name -> milliseconds
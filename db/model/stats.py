@@ -0,0 +1,15 @@
+from sqlalchemy import Column, String, Date, BigInteger
+from db.base import Base
+
+class StatsCounter(Base):
+    """Incrementally maintained all-time total for a dashboard metric."""
+    __tablename__ = "stats_counters"
+    name = Column(String(50), primary_key=True)
+    value = Column(BigInteger, nullable=False, default=0)
+
+class DailyStatsRollup(Base):
+    """Per-day count of a dashboard metric, keyed by the row's creation date (UTC)."""
+    __tablename__ = "daily_stats_rollups"
+    day = Column(Date, primary_key=True)
+    metric = Column(String(50), primary_key=True)
+    value = Column(BigInteger, nullable=False, default=0)
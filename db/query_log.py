@@ -0,0 +1,181 @@
+"""
+Query instrumentation via SQLAlchemy engine events.
+
+- Every statement is counted and timed against the current request's timer
+  (services/timing.py), so the Server-Timing header, request log line and
+  slow-request samples show how many queries a request ran and how long
+  they took.
+- Statements slower than SLOW_QUERY_THRESHOLD_MS are logged with their
+  EXPLAIN plan (bound parameters are not logged; they may contain patient
+  messages). Each distinct statement is explained at most once per
+  EXPLAIN_INTERVAL_SECONDS.
+- Requests that run more than QUERY_COUNT_WARN_THRESHOLD statements are
+  logged, which is how N+1 patterns (lazy loads in a loop) show up.
+
+`count_queries` / `assert_max_queries` count the statements run inside a
+block, for pinning the query budget of an endpoint or repository method.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from config import SETTINGS
+from services import metrics, timing
+
+logger = logging.getLogger(__name__)
+
+EXPLAIN_INTERVAL_SECONDS = 600
+
+_EXPLAIN_PREFIX = {
+    "sqlite": "EXPLAIN QUERY PLAN ",
+    "postgresql": "EXPLAIN ",
+    "mysql": "EXPLAIN ",
+    "mariadb": "EXPLAIN ",
+}
+# EXPLAIN without ANALYZE never runs the statement, so writes are safe to explain too.
+_EXPLAINABLE = ("SELECT", "WITH", "UPDATE", "DELETE")
+
+
+class QueryCounter:
+    """Statements seen while a `count_queries` block is active."""
+
+    def __init__(self):
+        self.statements: List[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+
+_counters_lock = threading.Lock()
+_counters: List[QueryCounter] = []
+
+
+@contextmanager
+def count_queries() -> Iterator[QueryCounter]:
+    """Counts statements run by any thread while the block is active."""
+    counter = QueryCounter()
+    with _counters_lock:
+        _counters.append(counter)
+    try:
+        yield counter
+    finally:
+        with _counters_lock:
+            _counters.remove(counter)
+
+
+@contextmanager
+def assert_max_queries(limit: int) -> Iterator[QueryCounter]:
+    """Raises AssertionError if the block runs more than `limit` statements."""
+    with count_queries() as counter:
+        yield counter
+    if counter.count > limit:
+        listing = "\n".join(f"  {i + 1}. {s}" for i, s in enumerate(counter.statements))
+        raise AssertionError(f"Expected at most {limit} queries, got {counter.count}:\n{listing}")
+
+
+class SlowQueryLog:
+    def __init__(
+        self,
+        threshold_ms: int = SETTINGS.SLOW_QUERY_THRESHOLD_MS,
+        interval_seconds: int = EXPLAIN_INTERVAL_SECONDS,
+        max_tracked: int = 1000,
+    ):
+        self.threshold = threshold_ms / 1000 if threshold_ms > 0 else None
+        self.interval_seconds = interval_seconds
+        self.max_tracked = max_tracked
+        self._last_explained: Dict[str, float] = {}  # statement digest -> time.monotonic()
+
+    def _should_explain(self, statement: str) -> bool:
+        digest = hashlib.sha1(statement.encode()).hexdigest()
+        now = time.monotonic()
+        last = self._last_explained.get(digest)
+        if last is not None and now - last < self.interval_seconds:
+            return False
+        if len(self._last_explained) >= self.max_tracked:
+            self._last_explained.clear()
+        self._last_explained[digest] = now
+        return True
+
+    def _explain(self, conn, statement: str, parameters) -> Optional[str]:
+        prefix = _EXPLAIN_PREFIX.get(conn.dialect.name)
+        verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+        if prefix is None or verb not in _EXPLAINABLE:
+            return None
+        # On the statement's own connection, so no second pooled connection is
+        # needed, at the DBAPI level with a cursor of its own: the statement's
+        # results are left alone and these event handlers aren't re-entered.
+        # Where a failed statement aborts the transaction (PostgreSQL), the
+        # EXPLAIN runs inside a savepoint.
+        savepoint = conn.dialect.name == "postgresql"
+        try:
+            cursor = conn.connection.dbapi_connection.cursor()
+        except Exception as e:
+            return f"<EXPLAIN failed: {e}>"
+        try:
+            if savepoint:
+                cursor.execute("SAVEPOINT query_log_explain")
+            try:
+                cursor.execute(prefix + statement, parameters)
+                plan = "\n".join(" | ".join(str(col) for col in row) for row in cursor.fetchall())
+            except Exception as e:
+                if savepoint:
+                    cursor.execute("ROLLBACK TO SAVEPOINT query_log_explain")
+                return f"<EXPLAIN failed: {e}>"
+            if savepoint:
+                cursor.execute("RELEASE SAVEPOINT query_log_explain")
+            return plan
+        except Exception as e:
+            return f"<EXPLAIN failed: {e}>"
+        finally:
+            cursor.close()
+
+    def observe(self, conn, statement: str, parameters, seconds: float, executemany: bool) -> None:
+        if self.threshold is None or seconds < self.threshold:
+            return
+        metrics.DB_SLOW_QUERIES.inc()
+        if not self._should_explain(statement):
+            return
+        plan = None if executemany else self._explain(conn, statement, parameters)
+        logger.warning(
+            "Slow query (%.1f ms):\n%s\nPlan:\n%s", seconds * 1000, statement.strip(), plan or "<not available>"
+        )
+
+
+slow_query_log = SlowQueryLog()
+
+
+def instrument(engine: Engine) -> None:
+    """Hooks query counting, per-request totals and the slow-query log into `engine`."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_log_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("query_log_start")
+        if not starts:
+            return
+        seconds = time.perf_counter() - starts.pop()
+        timer = timing.current()
+        if timer is not None:
+            timer.count_query(seconds)
+        if _counters:
+            with _counters_lock:
+                for counter in _counters:
+                    counter.statements.append(statement)
+        slow_query_log.observe(conn, statement, parameters, seconds, executemany)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_log_start"):
+            conn.info["query_log_start"].pop()
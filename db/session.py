@@ -1,13 +1,20 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from config import SETTINGS
 
 engine = create_engine(SETTINGS.DATABASE_URL, connect_args={"check_same_thread": False})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+if engine.dialect.name == "sqlite":
+    @event.listens_for(engine, "connect")
+    def _enable_wal(dbapi_connection, connection_record):
+        # Readers (including `VACUUM INTO` snapshots) and the writer don't block
+        # each other. Stored in the database file; setting it again is a no-op.
+        dbapi_connection.execute("PRAGMA journal_mode=WAL")
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
@@ -0,0 +1,58 @@
+from typing import Dict
+
+from sqlalchemy import insert, update
+from sqlalchemy.engine import Connection
+
+
+def upsert_add(connection: Connection, table, key: Dict, deltas: Dict[str, int]) -> None:
+    """
+    Adds `deltas` to the numeric columns of the row identified by `key`,
+    inserting the row if it does not exist yet.
+
+    Uses a single `INSERT ... ON CONFLICT DO UPDATE` on SQLite and PostgreSQL,
+    and falls back to update-then-insert elsewhere.
+    """
+    dialect = connection.dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        stmt = dialect_insert(table).values(**key, **deltas)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(key),
+            set_={col: table.c[col] + stmt.excluded[col] for col in deltas},
+        )
+        connection.execute(stmt)
+        return
+
+    where = [table.c[k] == v for k, v in key.items()]
+    values = {col: table.c[col] + delta for col, delta in deltas.items()}
+    result = connection.execute(update(table).where(*where).values(**values))
+    if result.rowcount == 0:
+        connection.execute(insert(table).values(**key, **deltas))
+
+
+def upsert_replace(connection: Connection, table, key: Dict, values: Dict) -> None:
+    """
+    Sets `values` on the row identified by `key`, inserting the row if it does
+    not exist yet. Same dialect handling as `upsert_add`.
+    """
+    dialect = connection.dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        stmt = dialect_insert(table).values(**key, **values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(key),
+            set_={col: stmt.excluded[col] for col in values},
+        )
+        connection.execute(stmt)
+        return
+
+    where = [table.c[k] == v for k, v in key.items()]
+    result = connection.execute(update(table).where(*where).values(**values))
+    if result.rowcount == 0:
+        connection.execute(insert(table).values(**key, **values))
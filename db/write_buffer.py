@@ -0,0 +1,302 @@
+import atexit
+import json
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import bindparam, insert, update
+from sqlalchemy.exc import DataError, IntegrityError
+
+from config import SETTINGS
+from db import attribution, counters
+from db.session import SessionLocal
+from services import metrics
+from db.model.session import Session as SessionModel
+from db.model.conversation import Conversation as ConversationModel
+
+logger = logging.getLogger(__name__)
+
+
+def _merge(units) -> tuple:
+    """Concatenates (sessions, conversations, ended) units."""
+    sessions = [row for unit in units for row in unit[0]]
+    conversations = [row for unit in units for row in unit[1]]
+    ended = {k: v for unit in units for k, v in unit[2].items()}
+    return sessions, conversations, ended
+
+
+class SessionWriteBuffer:
+    """
+    In-process write-behind buffer for session writes.
+
+    `POST /sessions` runs on every app load and `POST /sessions/{id}/end` is a
+    fire-and-forget beacon, so neither should wait on the database. Rows are
+    queued here with application-generated UUIDs and written in batches by a
+    background thread every `flush_interval_ms`, or as soon as `max_rows`
+    rows are pending.
+
+    Anything that needs a buffered row to exist in the database (e.g. adding a
+    message to a freshly created conversation) calls `ensure_persisted` first.
+    Rows the database rejects are set aside in `dead_letter_path` (JSON lines)
+    so one bad row cannot hold up the rest.
+
+    The buffer is only visible to its own process: with several gunicorn
+    workers, the request after `POST /sessions` may reach another worker
+    before the flush. There `buffer_inserts` is turned off (see
+    gunicorn.conf.py) and new sessions are written straight away; session
+    ends, which only update existing rows, are still buffered.
+    """
+
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        *,
+        flush_interval_ms: int = SETTINGS.SESSION_BUFFER_FLUSH_INTERVAL_MS,
+        max_rows: int = SETTINGS.SESSION_BUFFER_MAX_ROWS,
+        dead_letter_path: str = SETTINGS.SESSION_BUFFER_DEAD_LETTER_PATH,
+    ):
+        self._session_factory = session_factory
+        self.buffer_inserts = True
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_rows = max_rows
+        self.dead_letter_path = dead_letter_path
+
+        self._lock = threading.Lock()        # guards the pending buffers
+        self._flush_lock = threading.Lock()  # serializes flushes
+        self._sessions: List[Dict[str, Any]] = []
+        self._conversations: List[Dict[str, Any]] = []
+        self._ended: Dict[uuid.UUID, datetime] = {}
+        # ids of sessions/conversations queued but not committed yet
+        self._pending_ids: set[uuid.UUID] = set()
+
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._atexit_registered = False
+
+    # ---- Lifecycle ----
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """Starts the background flusher thread (idempotent)."""
+        if self.running:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="session-write-buffer", daemon=True)
+        self._thread.start()
+        if not self._atexit_registered:
+            atexit.register(self.stop)
+            self._atexit_registered = True
+
+    def stop(self) -> None:
+        """Stops the flusher and writes out everything still buffered."""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                # Already logged and re-queued (database unavailable); retry on the next tick.
+                pass
+
+    # ---- Producers ----
+
+    def add_session(self, session_row: Dict[str, Any], conversation_row: Dict[str, Any]) -> None:
+        """Queues a new session together with its first conversation (writes them now without `buffer_inserts`)."""
+        if not self.buffer_inserts:
+            self._write([session_row], [conversation_row], {})
+            return
+        with self._lock:
+            self._sessions.append(session_row)
+            self._conversations.append(conversation_row)
+            self._pending_ids.add(session_row["id"])
+            self._pending_ids.add(conversation_row["id"])
+            size = self._size()
+        metrics.SESSION_BUFFER_PENDING.set(size)
+        self._after_add(size)
+
+    def end_session(self, session_id: uuid.UUID, ended_at: Optional[datetime] = None) -> None:
+        """Queues setting `ended_at` on a session that has not ended yet."""
+        ended_at = ended_at or datetime.now(timezone.utc)
+        with self._lock:
+            if session_id in self._pending_ids:
+                # Still buffered: fold the end into the pending insert.
+                for row in self._sessions:
+                    if row["id"] == session_id:
+                        row["ended_at"] = row["ended_at"] or ended_at
+                        break
+                else:
+                    self._ended.setdefault(session_id, ended_at)
+            else:
+                self._ended.setdefault(session_id, ended_at)
+            size = self._size()
+        metrics.SESSION_BUFFER_PENDING.set(size)
+        self._after_add(size)
+
+    def _size(self) -> int:
+        return len(self._sessions) + len(self._conversations) + len(self._ended)
+
+    def _after_add(self, size: int) -> None:
+        if not self.running:
+            # No flusher (scripts, tests, shutdown in progress): write through.
+            self.flush()
+        elif size >= self.max_rows:
+            self._wakeup.set()
+
+    # ---- Consumers ----
+
+    def is_pending(self, obj_id: Any) -> bool:
+        return obj_id in self._pending_ids
+
+    def ensure_persisted(self, *ids: Any) -> None:
+        """Flushes synchronously if any of the given ids is still buffered."""
+        if any(i in self._pending_ids for i in ids):
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Writes all buffered rows in a single transaction. If the batch is
+        rejected for its data (a constraint or value error), each session is
+        retried on its own with its conversations, and the rows that still fail
+        go to the dead-letter file instead of blocking the buffer. Any other
+        error (database unreachable, locked, ...) re-queues everything.
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._size():
+                    return
+                sessions, self._sessions = self._sessions, []
+                conversations, self._conversations = self._conversations, []
+                ended, self._ended = self._ended, {}
+
+            try:
+                self._write(sessions, conversations, ended)
+            except (IntegrityError, DataError):
+                metrics.ERRORS.labels("session_write_buffer").inc()
+                logger.exception("Session write buffer flush failed; retrying %d rows one session at a time",
+                                 len(sessions) + len(conversations) + len(ended))
+                self._write_each(sessions, conversations, ended)
+            except Exception:
+                metrics.ERRORS.labels("session_write_buffer").inc()
+                logger.exception("Session write buffer flush failed; re-queueing %d rows",
+                                 len(sessions) + len(conversations) + len(ended))
+                self._requeue(sessions, conversations, ended)
+                raise
+
+            self._settled(sessions, conversations)
+
+    def _write_each(self, sessions, conversations, ended) -> None:
+        """Writes each session with its conversations, and each other row, in its own transaction."""
+        by_session: Dict[Any, List[Dict[str, Any]]] = {}
+        for row in conversations:
+            by_session.setdefault(row["session_id"], []).append(row)
+        units = [([s], by_session.pop(s["id"], []), {}) for s in sessions]
+        units += [([], rows, {}) for rows in by_session.values()]
+        units += [([], [], {k: v}) for k, v in ended.items()]
+
+        for i, unit in enumerate(units):
+            try:
+                self._write(*unit)
+            except (IntegrityError, DataError) as e:
+                self._dead_letter(*unit, error=e)
+            except Exception:
+                # Not the rows' fault: keep this unit and the ones after it for the next flush.
+                self._requeue(*_merge(units[i:]))
+                self._settled(*_merge(units[:i])[:2])
+                raise
+
+    def _dead_letter(self, sessions, conversations, ended, *, error: Exception) -> None:
+        """Appends rows that cannot be written to `dead_letter_path`, one JSON object per row."""
+        failed_at = datetime.now(timezone.utc).isoformat()
+        entries = [("sessions", row) for row in sessions] + [("conversations", row) for row in conversations]
+        entries += [("session_ends", {"id": k, "ended_at": v}) for k, v in ended.items()]
+        logger.error("Session write buffer dropped %d rows to %s: %s", len(entries), self.dead_letter_path, error)
+        metrics.SESSION_BUFFER_DEAD_LETTERS.inc(len(entries))
+        try:
+            os.makedirs(os.path.dirname(self.dead_letter_path) or ".", exist_ok=True)
+            with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+                for table, row in entries:
+                    f.write(json.dumps(
+                        {"table": table, "row": row, "error": str(error.orig), "failed_at": failed_at},
+                        default=str, ensure_ascii=False,
+                    ) + "\n")
+        except OSError:
+            logger.exception("Could not write the session write buffer dead letters")
+
+    def _requeue(self, sessions, conversations, ended) -> None:
+        with self._lock:
+            self._sessions[:0] = sessions
+            self._conversations[:0] = conversations
+            for k, v in ended.items():
+                self._ended.setdefault(k, v)
+
+    def _settled(self, sessions, conversations) -> None:
+        """Rows written or dead-lettered are no longer pending."""
+        with self._lock:
+            for row in sessions:
+                self._pending_ids.discard(row["id"])
+            for row in conversations:
+                self._pending_ids.discard(row["id"])
+            metrics.SESSION_BUFFER_PENDING.set(self._size())
+
+    def _write(self, sessions, conversations, ended) -> None:
+        db = self._session_factory()
+        try:
+            if sessions:
+                db.execute(insert(SessionModel.__table__), sessions)
+            if conversations:
+                db.execute(insert(ConversationModel.__table__), conversations)
+            if ended:
+                table = SessionModel.__table__
+                db.execute(
+                    update(table)
+                    .where(table.c.id == bindparam("b_id"), table.c.ended_at.is_(None))
+                    .values(ended_at=bindparam("b_ended_at")),
+                    [{"b_id": k, "b_ended_at": v} for k, v in ended.items()],
+                )
+            # Core inserts bypass the ORM flush hook, so count them here.
+            deltas: counters.Deltas = {}
+            for metric, rows, column in (
+                (counters.SESSIONS, sessions, "started_at"),
+                (counters.CONVERSATIONS, conversations, "created_at"),
+            ):
+                for row in rows:
+                    key = (metric, counters.to_utc_day(row[column]))
+                    deltas[key] = deltas.get(key, 0) + 1
+            counters.apply_deltas(db.connection(), deltas)
+
+            cube: attribution.CubeDeltas = {}
+            utms = {}
+            for row in sessions:
+                utms[row["id"]] = attribution.utm_key(row["utm_source"], row["utm_medium"], row["utm_campaign"])
+                cell = cube.setdefault((counters.to_utc_day(row["started_at"]), utms[row["id"]]), {})
+                cell["sessions"] = cell.get("sessions", 0) + 1
+            for row in conversations:
+                utm = utms.get(row["session_id"], attribution.utm_key(None, None, None))
+                cell = cube.setdefault((counters.to_utc_day(row["created_at"]), utm), {})
+                cell["conversations"] = cell.get("conversations", 0) + 1
+            attribution.apply_cube_deltas(db.connection(), cube)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+
+# Singleton instance, started/stopped from the app lifespan
+session_write_buffer = SessionWriteBuffer()
@@ -2,7 +2,6 @@ from fastapi import Depends, HTTPException, Security
 from fastapi.security import APIKeyHeader, HTTPBearer, HTTPAuthorizationCredentials
 from starlette import status
 from sqlalchemy.orm import Session
-from jose import jwt, JWTError
 from pydantic import ValidationError
 
 from db.session import get_db
@@ -46,6 +45,8 @@ def get_current_user_optional(
         # No 'Authorization' header was found. This is an anonymous user.
         return None
     
+    from jose import jwt, JWTError
+
     token = credentials.credentials
     try:
         payload = jwt.decode(
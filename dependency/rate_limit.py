@@ -0,0 +1,88 @@
+import logging
+import uuid
+from typing import Dict, Optional
+
+from fastapi import Depends, HTTPException, Request, Response
+from sqlalchemy.orm import Session
+from starlette import status
+
+from config.settings import SETTINGS
+from db.session import get_db
+from repository import conversation as conversation_repo
+from services import metrics
+from services.rate_limit import RateLimiter, headers, rate_limiter
+
+logger = logging.getLogger(__name__)
+
+
+def _user_key(request: Request) -> Optional[str]:
+    """The user id from a bearer token. Only read here; the auth dependency still validates it."""
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    # Imported on first use, to keep it out of worker start-up.
+    from jose import jwt, JWTError
+
+    try:
+        payload = jwt.decode(token, SETTINGS.SECRET_KEY, algorithms=[SETTINGS.ALGORITHM])
+        return str(payload["sub"]["id"])
+    except (JWTError, KeyError, TypeError):
+        return None
+
+
+def _session_key(request: Request, db: Session) -> Optional[str]:
+    params = request.path_params
+    if "session_id" in params:
+        return str(params["session_id"])
+    if "conversation_id" in params:
+        try:
+            conversation_id = uuid.UUID(str(params["conversation_id"]))
+        except ValueError:  # the route's own validation rejects it
+            return None
+        session_id = conversation_repo.get_session_id(db, id=conversation_id)
+        return str(session_id) if session_id is not None else None
+    return None
+
+
+def rate_limit(route: str, limiter: RateLimiter = rate_limiter):
+    """
+    Dependency that spends a token from each `RATE_LIMITS` bucket of `route`:
+
+        @router.post("/{conversation_id}", dependencies=[Depends(rate_limit("messages"))])
+
+    Sets `RateLimit-*` headers, or raises 429 with `Retry-After` when a bucket is empty.
+    If the bucket store is unreachable the request is let through.
+    """
+    def dependency(request: Request, response: Response, db: Session = Depends(get_db)) -> None:
+        if not SETTINGS.RATE_LIMIT_ENABLED:
+            return
+        scopes = limiter.scopes(route)
+        if not scopes:
+            return
+        # Only look up what this route's rules need.
+        keys: Dict[str, Optional[str]] = {}
+        if "ip" in scopes:
+            keys["ip"] = request.client.host if request.client else None
+        if "session" in scopes:
+            keys["session"] = _session_key(request, db)
+        if "user" in scopes:
+            keys["user"] = _user_key(request)
+
+        try:
+            decision = limiter.check(route, keys)
+        except Exception:
+            logger.exception("Rate limit check failed for %s", route)
+            metrics.ERRORS.labels("rate_limit").inc()
+            return
+        if decision is None:
+            return
+        if not decision.allowed:
+            metrics.RATE_LIMITED.labels(decision.rule.name).inc()
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests, please slow down.",
+                headers=headers(decision),
+            )
+        response.headers.update(headers(decision))
+
+    return dependency
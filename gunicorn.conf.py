@@ -0,0 +1,78 @@
+"""
+Gunicorn configuration for multi-worker serving:
+
+    gunicorn main:app -c gunicorn.conf.py
+
+The app is imported once in the master (`preload_app`) so code and read-only
+module state are shared copy-on-write between workers. Migrations run once in
+the master before forking; each worker then re-creates what must not cross a
+fork (DB connection pool, AI provider client) and starts its own background
+threads from the app lifespan. On SIGTERM workers stop accepting connections
+and in-flight requests (including slow AI calls) get `graceful_timeout`
+seconds to finish before the write buffer is drained and the worker exits.
+Behind the router, client addresses come from X-Forwarded-For for the proxies
+in FORWARDED_ALLOW_IPS.
+
+`python -m bench.workers` measures how throughput scales with WEB_CONCURRENCY.
+"""
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+from config import SETTINGS
+
+# Workers write their Prometheus metrics here so a scrape of any one of them
+# reports all of them. Must be set before prometheus_client is imported.
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "tebnegar-metrics"))
+shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = SETTINGS.WEB_CONCURRENCY or multiprocessing.cpu_count()
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+
+# Client addresses come from X-Forwarded-For when the connection is from one of these.
+forwarded_allow_ips = SETTINGS.FORWARDED_ALLOW_IPS
+
+timeout = SETTINGS.WEB_TIMEOUT_SECONDS
+graceful_timeout = SETTINGS.WEB_GRACEFUL_TIMEOUT_SECONDS
+keepalive = 5
+
+accesslog = "-"
+errorlog = "-"
+
+
+def when_ready(server):
+    import main
+    from db.session import engine
+    from services.ai.ai_manager import ai_manager
+
+    main.init_database()
+    # Workers must not race each other running migrations.
+    SETTINGS.AUTO_MIGRATE = False
+    ai_manager.preload()
+    # Don't hand pooled connections opened by the master down to the workers.
+    engine.dispose()
+    server.log.info("Database ready; forking %s workers", server.num_workers)
+
+
+def post_fork(server, worker):
+    from db.session import engine
+    from db.write_buffer import session_write_buffer
+    from services.ai.ai_manager import ai_manager
+
+    # Fresh connection pool per worker; close=False leaves the parent's sockets alone.
+    engine.dispose(close=False)
+    ai_manager.reset()
+    # A buffered new session is invisible to the other workers, which may get the next request.
+    session_write_buffer.buffer_inserts = server.num_workers <= 1
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    # Drop the dead worker's live gauges (in-flight requests, pool usage, ...).
+    multiprocess.mark_process_dead(worker.pid)
@@ -1,22 +1,64 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from config.settings import SETTINGS
-from db.base import Base
-from db.session import engine
+from db.session import engine, SessionLocal
+from db import counters, migrate, query_log
+from api import metrics as metrics_api
 from api.v1 import api_v1_router
 from db.model import * # Import all models
+from db.write_buffer import session_write_buffer
+from services.backup import backup_manager
+from services.extraction import extraction_pipeline
+from services.jobs import job_runner
+from services import tasks  # noqa: F401  (registers the job handlers)
+from services import metrics, timing, tracing
+from services.compression import CompressionMiddleware
+from services.profiler import ProfilerMiddleware, profiler
+
+def init_database() -> None:
+    """Runs pending migrations (if enabled) and bootstraps the dashboard counters."""
+    if SETTINGS.AUTO_MIGRATE:
+        migrate.upgrade_to_head()
+    with SessionLocal() as db:
+        counters.ensure_initialized(db)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    tracing.setup()
+    init_database()
+    session_write_buffer.start()
+    backup_manager.start_schedule()
+    profiler.start()
+    if SETTINGS.EXTRACTION_ENABLED:
+        extraction_pipeline.start()
+    if SETTINGS.JOBS_ENABLED:
+        job_runner.start()
+    yield
+    job_runner.stop()
+    extraction_pipeline.stop()
+    backup_manager.stop_schedule()
+    profiler.stop()
+    # Drain buffered session writes before the process exits.
+    session_write_buffer.stop()
+    tracing.shutdown()
 
-# Create all database tables
-Base.metadata.create_all(bind=engine)
 
 app = FastAPI(
     title="TebNegar MVP",
     description="AI-powered preliminary symptom assessment.",
     version="0.0.1",
-    debug=SETTINGS.DEVELOPMENT
+    debug=SETTINGS.DEVELOPMENT,
+    lifespan=lifespan,
+    # Request spans go to the provider installed by `tracing.setup()`. Metrics are
+    # served by Prometheus, and logs could carry request bodies (patient messages).
+    telemetry={"metrics": False, "logs": False},
 )
 
 app.include_router(api_v1_router.router, prefix="/api/v1")
+app.include_router(metrics_api.router)
 
 
 # Setup CORS
@@ -36,6 +78,16 @@ app.add_middleware(
     allow_headers=["*"],            # HTTP headers allowed
 )
 
+# Inside the timing/profiling middlewares, so compression CPU shows up in both.
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(ProfilerMiddleware)
+app.add_middleware(timing.ServerTimingMiddleware)
+# Outermost, so latency includes every other middleware.
+app.add_middleware(metrics.MetricsMiddleware)
+metrics.instrument_engine(engine)
+query_log.instrument(engine)
+tracing.instrument_engine(engine)
+
 
 
 @app.get("/", tags=["Root"])
@@ -43,12 +95,13 @@ def read_root():
     return {"message": f"Welcome to the TebNegar MVP API v{app.version}"}
 
 
-import uvicorn
-
 if __name__ == "__main__":
+    # Local development server. Production runs gunicorn with gunicorn.conf.py.
+    import uvicorn
+
     uvicorn.run(
         "main:app",
         host="127.0.0.1",
         port=8000,
-        reload=True        # auto-reload on code changes (optional)
+        reload=SETTINGS.DEVELOPMENT        # auto-reload on code changes
     )
@@ -0,0 +1,175 @@
+"""baseline schema
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-19 14:53:54.687506
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Databases created before migrations existed (by the app's import-time
+    # `create_all`) already have some of these tables, with their indexes; only
+    # the missing ones are created, so `alembic upgrade head` adopts them as-is.
+    tables = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if 'survey_responses' not in tables:
+        op.create_table('survey_responses',
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.Column('session_id', sa.String(), nullable=False),
+        sa.Column('rating', sa.Integer(), nullable=False),
+        sa.Column('comment', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('survey_responses', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_survey_responses_session_id'), ['session_id'], unique=False)
+
+    if 'symptom_logs' not in tables:
+        op.create_table('symptom_logs',
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.Column('session_id', sa.String(), nullable=False),
+        sa.Column('symptoms_text', sa.Text(), nullable=False),
+        sa.Column('ai_response', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('symptom_logs', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_symptom_logs_session_id'), ['session_id'], unique=False)
+
+    if 'users' not in tables:
+        op.create_table('users',
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.Column('google_id', sa.String(), nullable=False),
+        sa.Column('email', sa.String(), nullable=False),
+        sa.Column('full_name', sa.String(), nullable=True),
+        sa.Column('picture_url', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('users', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_users_email'), ['email'], unique=True)
+            batch_op.create_index(batch_op.f('ix_users_google_id'), ['google_id'], unique=True)
+
+    if 'sessions' not in tables:
+        op.create_table('sessions',
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.Column('ip_address', sa.String(length=45), nullable=True),
+        sa.Column('user_agent', sa.Text(), nullable=True),
+        sa.Column('landing_page_url', sa.Text(), nullable=True),
+        sa.Column('referrer_url', sa.Text(), nullable=True),
+        sa.Column('utm_source', sa.String(length=255), nullable=True),
+        sa.Column('utm_medium', sa.String(length=255), nullable=True),
+        sa.Column('utm_campaign', sa.String(length=255), nullable=True),
+        sa.Column('utm_term', sa.String(length=255), nullable=True),
+        sa.Column('utm_content', sa.String(length=255), nullable=True),
+        sa.Column('client_metadata', sa.JSON(), nullable=True),
+        sa.Column('started_at', sa.DateTime(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+        sa.Column('ended_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('user_id', sa.UUID(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('sessions', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_sessions_user_id'), ['user_id'], unique=False)
+            batch_op.create_index(batch_op.f('ix_sessions_utm_campaign'), ['utm_campaign'], unique=False)
+            batch_op.create_index(batch_op.f('ix_sessions_utm_medium'), ['utm_medium'], unique=False)
+            batch_op.create_index(batch_op.f('ix_sessions_utm_source'), ['utm_source'], unique=False)
+
+    if 'conversations' not in tables:
+        op.create_table('conversations',
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.Column('session_id', sa.UUID(), nullable=False),
+        sa.Column('title', sa.String(length=255), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+        sa.ForeignKeyConstraint(['session_id'], ['sessions.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('conversations', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_conversations_session_id'), ['session_id'], unique=False)
+
+    if 'messages' not in tables:
+        op.create_table('messages',
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.Column('conversation_id', sa.UUID(), nullable=False),
+        sa.Column('sender_type', sa.Enum('USER', 'AI', name='sendertype'), nullable=False),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+        sa.ForeignKeyConstraint(['conversation_id'], ['conversations.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('messages', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_messages_conversation_id'), ['conversation_id'], unique=False)
+
+    if 'ai_analyses' not in tables:
+        op.create_table('ai_analyses',
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.Column('message_id', sa.UUID(), nullable=False),
+        sa.Column('potential_conditions', sa.JSON(), nullable=True),
+        sa.Column('criticality_flag', sa.Boolean(), nullable=True),
+        sa.Column('processing_time_ms', sa.Integer(), nullable=True),
+        sa.Column('ai_provider', sa.String(length=100), nullable=True),
+        sa.Column('token_usage', sa.JSON(), nullable=True),
+        sa.ForeignKeyConstraint(['message_id'], ['messages.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('message_id')
+        )
+
+    if 'response_feedback' not in tables:
+        op.create_table('response_feedback',
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.Column('message_id', sa.UUID(), nullable=False),
+        sa.Column('feedback_type', sa.Enum('LIKE', 'DISLIKE', name='feedbacktype'), nullable=False),
+        sa.Column('comment', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+        sa.ForeignKeyConstraint(['message_id'], ['messages.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('message_id')
+        )
+
+
+def downgrade() -> None:
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.drop_table('response_feedback')
+    op.drop_table('ai_analyses')
+    with op.batch_alter_table('messages', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_messages_conversation_id'))
+
+    op.drop_table('messages')
+    with op.batch_alter_table('conversations', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_conversations_session_id'))
+
+    op.drop_table('conversations')
+    with op.batch_alter_table('sessions', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_sessions_utm_source'))
+        batch_op.drop_index(batch_op.f('ix_sessions_utm_medium'))
+        batch_op.drop_index(batch_op.f('ix_sessions_utm_campaign'))
+        batch_op.drop_index(batch_op.f('ix_sessions_user_id'))
+
+    op.drop_table('sessions')
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_users_google_id'))
+        batch_op.drop_index(batch_op.f('ix_users_email'))
+
+    op.drop_table('users')
+    with op.batch_alter_table('symptom_logs', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_symptom_logs_session_id'))
+
+    op.drop_table('symptom_logs')
+    with op.batch_alter_table('survey_responses', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_survey_responses_session_id'))
+
+    op.drop_table('survey_responses')
+    # ### end Alembic commands ###
@@ -0,0 +1,138 @@
+"""stats, attribution, archive tables and hot-query indexes
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 14:54:02.384317
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _existing_tables() -> set:
+    return set(sa.inspect(op.get_bind()).get_table_names())
+
+
+def _existing_columns(table: str) -> set:
+    return {c["name"] for c in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def _existing_indexes(table: str) -> set:
+    return {i["name"] for i in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade() -> None:
+    # Databases created before migrations existed may already have some of
+    # these tables/columns from `create_all`, so every step checks first.
+    tables = _existing_tables()
+
+    if 'stats_counters' not in tables:
+        op.create_table('stats_counters',
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('value', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+        )
+    if 'daily_stats_rollups' not in tables:
+        op.create_table('daily_stats_rollups',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('metric', sa.String(length=50), nullable=False),
+        sa.Column('value', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('day', 'metric')
+        )
+    if 'attribution_cubes' not in tables:
+        op.create_table('attribution_cubes',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('utm_source', sa.String(length=255), nullable=False),
+        sa.Column('utm_medium', sa.String(length=255), nullable=False),
+        sa.Column('utm_campaign', sa.String(length=255), nullable=False),
+        sa.Column('sessions', sa.BigInteger(), nullable=False),
+        sa.Column('conversations', sa.BigInteger(), nullable=False),
+        sa.Column('messages', sa.BigInteger(), nullable=False),
+        sa.Column('logins', sa.BigInteger(), nullable=False),
+        sa.Column('likes', sa.BigInteger(), nullable=False),
+        sa.Column('dislikes', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('day', 'utm_source', 'utm_medium', 'utm_campaign')
+        )
+    if 'archived_conversations' not in tables:
+        op.create_table('archived_conversations',
+        sa.Column('conversation_id', sa.UUID(), nullable=False),
+        sa.Column('segment', sa.String(length=255), nullable=False),
+        sa.Column('frame_offset', sa.BigInteger(), nullable=False),
+        sa.Column('frame_length', sa.Integer(), nullable=False),
+        sa.Column('message_count', sa.Integer(), nullable=False),
+        sa.Column('like_count', sa.Integer(), nullable=False),
+        sa.Column('dislike_count', sa.Integer(), nullable=False),
+        sa.Column('last_message_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('archived_at', sa.DateTime(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+        sa.ForeignKeyConstraint(['conversation_id'], ['conversations.id'], ),
+        sa.PrimaryKeyConstraint('conversation_id')
+        )
+
+    columns = _existing_columns('ai_analyses')
+    with op.batch_alter_table('ai_analyses', schema=None) as batch_op:
+        if 'ai_model' not in columns:
+            batch_op.add_column(sa.Column('ai_model', sa.String(length=100), nullable=True))
+        if 'is_error' not in columns:
+            batch_op.add_column(sa.Column('is_error', sa.Boolean(), nullable=True))
+
+    # Composite indexes for the hot lookups; they cover the single-column ones they replace.
+    indexes = _existing_indexes('messages')
+    with op.batch_alter_table('messages', schema=None) as batch_op:
+        if 'ix_messages_conversation_id_created_at' not in indexes:
+            batch_op.create_index('ix_messages_conversation_id_created_at', ['conversation_id', 'created_at'], unique=False)
+        if 'ix_messages_conversation_id' in indexes:
+            batch_op.drop_index('ix_messages_conversation_id')
+
+    indexes = _existing_indexes('conversations')
+    with op.batch_alter_table('conversations', schema=None) as batch_op:
+        if 'ix_conversations_session_id_created_at' not in indexes:
+            batch_op.create_index('ix_conversations_session_id_created_at', ['session_id', sa.text('created_at DESC')], unique=False)
+        if 'ix_conversations_session_id' in indexes:
+            batch_op.drop_index('ix_conversations_session_id')
+
+    indexes = _existing_indexes('sessions')
+    with op.batch_alter_table('sessions', schema=None) as batch_op:
+        if 'ix_sessions_user_id_started_at' not in indexes:
+            batch_op.create_index('ix_sessions_user_id_started_at', ['user_id', sa.text('started_at DESC')], unique=False)
+        if 'ix_sessions_user_id' in indexes:
+            batch_op.drop_index('ix_sessions_user_id')
+
+    indexes = _existing_indexes('response_feedback')
+    with op.batch_alter_table('response_feedback', schema=None) as batch_op:
+        if 'ix_response_feedback_feedback_type_created_at' not in indexes:
+            batch_op.create_index('ix_response_feedback_feedback_type_created_at', ['feedback_type', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('response_feedback', schema=None) as batch_op:
+        batch_op.drop_index('ix_response_feedback_feedback_type_created_at')
+
+    with op.batch_alter_table('sessions', schema=None) as batch_op:
+        batch_op.create_index('ix_sessions_user_id', ['user_id'], unique=False)
+        batch_op.drop_index('ix_sessions_user_id_started_at')
+
+    with op.batch_alter_table('conversations', schema=None) as batch_op:
+        batch_op.create_index('ix_conversations_session_id', ['session_id'], unique=False)
+        batch_op.drop_index('ix_conversations_session_id_created_at')
+
+    with op.batch_alter_table('messages', schema=None) as batch_op:
+        batch_op.create_index('ix_messages_conversation_id', ['conversation_id'], unique=False)
+        batch_op.drop_index('ix_messages_conversation_id_created_at')
+
+    with op.batch_alter_table('ai_analyses', schema=None) as batch_op:
+        batch_op.drop_column('is_error')
+        batch_op.drop_column('ai_model')
+
+    op.drop_table('archived_conversations')
+    op.drop_table('attribution_cubes')
+    op.drop_table('daily_stats_rollups')
+    op.drop_table('stats_counters')
@@ -0,0 +1,37 @@
+"""shared state
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 15:00:39.550109
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('shared_state',
+    sa.Column('namespace', sa.String(length=50), nullable=False),
+    sa.Column('key', sa.String(length=255), nullable=False),
+    sa.Column('value', sa.Text(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('namespace', 'key')
+    )
+    with op.batch_alter_table('shared_state', schema=None) as batch_op:
+        batch_op.create_index('ix_shared_state_expires_at', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('shared_state', schema=None) as batch_op:
+        batch_op.drop_index('ix_shared_state_expires_at')
+
+    op.drop_table('shared_state')
@@ -0,0 +1,40 @@
+"""slow request samples
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 15:20:11.804153
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('slow_requests',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+    sa.Column('method', sa.String(length=10), nullable=False),
+    sa.Column('route', sa.String(length=255), nullable=False),
+    sa.Column('status_code', sa.Integer(), nullable=False),
+    sa.Column('duration_ms', sa.Float(), nullable=False),
+    sa.Column('phases', sa.JSON(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('slow_requests', schema=None) as batch_op:
+        batch_op.create_index('ix_slow_requests_created_at', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('slow_requests', schema=None) as batch_op:
+        batch_op.drop_index('ix_slow_requests_created_at')
+
+    op.drop_table('slow_requests')
@@ -0,0 +1,30 @@
+"""query totals on slow request samples
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 15:31:47.209518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('slow_requests', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('db_queries', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('db_ms', sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('slow_requests', schema=None) as batch_op:
+        batch_op.drop_column('db_ms')
+        batch_op.drop_column('db_queries')
@@ -0,0 +1,28 @@
+"""trace id on ai analyses
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 15:44:05.917336
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('ai_analyses', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('trace_id', sa.String(length=32), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('ai_analyses', schema=None) as batch_op:
+        batch_op.drop_column('trace_id')
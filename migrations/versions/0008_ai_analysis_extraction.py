@@ -0,0 +1,34 @@
+"""extraction results on ai analyses
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19 17:05:41.226093
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('ai_analyses', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('urgency', sa.String(length=20), nullable=True))
+        batch_op.add_column(sa.Column('recommended_specialty', sa.String(length=100), nullable=True))
+        batch_op.add_column(sa.Column('extracted_at', sa.DateTime(timezone=True), nullable=True))
+        batch_op.create_index(batch_op.f('ix_ai_analyses_extracted_at'), ['extracted_at'], unique=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('ai_analyses', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_ai_analyses_extracted_at'))
+        batch_op.drop_column('extracted_at')
+        batch_op.drop_column('recommended_specialty')
+        batch_op.drop_column('urgency')
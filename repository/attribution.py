@@ -0,0 +1,83 @@
+from datetime import date
+from typing import List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from db import attribution as attribution_cubes
+from db.model.attribution import AttributionCube
+from schema.admin.attribution import AttributionDimension, AttributionFunnelRow, AttributionFunnelResponse
+from services import tracing
+from services.archive import conversation_archive
+
+
+def _ratio(numerator: int, denominator: int) -> float:
+    return round(numerator / denominator, 4) if denominator else 0.0
+
+
+@tracing.traced_methods
+class CRUDAttribution:
+    def get_funnel(
+        self,
+        db: Session,
+        *,
+        start: date,
+        end: date,
+        group_by: List[AttributionDimension],
+        utm_source: Optional[str] = None,
+        utm_medium: Optional[str] = None,
+        utm_campaign: Optional[str] = None,
+    ) -> AttributionFunnelResponse:
+        """
+        Sums the pre-aggregated cube cells between `start` and `end` (inclusive)
+        per requested UTM dimension(s). Only cube rows are scanned, never sessions.
+        """
+        group_cols = [getattr(AttributionCube, dim.value) for dim in group_by]
+        sums = [func.sum(getattr(AttributionCube, metric)) for metric in attribution_cubes.METRICS]
+
+        stmt = (
+            select(*group_cols, *sums)
+            .where(AttributionCube.day >= start, AttributionCube.day <= end)
+        )
+        # Filters use the same "" sentinel for missing UTM values as the cubes.
+        for column, value in (
+            (AttributionCube.utm_source, utm_source),
+            (AttributionCube.utm_medium, utm_medium),
+            (AttributionCube.utm_campaign, utm_campaign),
+        ):
+            if value is not None:
+                stmt = stmt.where(column == value)
+        if group_cols:
+            stmt = stmt.group_by(*group_cols)
+
+        rows = []
+        for row in db.execute(stmt):
+            dims = {dim.value: (row[i] or None) for i, dim in enumerate(group_by)}
+            sessions, conversations, messages, logins, likes, dislikes = (int(v or 0) for v in row[len(group_by):])
+            if not any((sessions, conversations, messages, logins, likes, dislikes)):
+                continue
+            rows.append(AttributionFunnelRow(
+                **dims,
+                sessions=sessions,
+                conversations=conversations,
+                messages=messages,
+                logins=logins,
+                likes=likes,
+                dislikes=dislikes,
+                conversation_rate=_ratio(conversations, sessions),
+                login_rate=_ratio(logins, sessions),
+                messages_per_session=_ratio(messages, sessions),
+                like_rate=_ratio(likes, likes + dislikes) if likes + dislikes else None,
+            ))
+        rows.sort(key=lambda r: r.sessions, reverse=True)
+
+        return AttributionFunnelResponse(start=start, end=end, group_by=group_by, rows=rows)
+
+    def backfill(self, db: Session, *, since: Optional[date] = None) -> int:
+        """
+        Rebuilds the cubes from the base tables and the archive (all days, or from `since` on).
+        """
+        archived = conversation_archive.attribution_deltas(db, since=since)
+        return attribution_cubes.backfill(db, since=since, archived=archived)
+
+attribution = CRUDAttribution()
@@ -1,28 +1,76 @@
 # crud/crud_conversation.py
 
 import uuid
-from typing import List
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+from sqlalchemy import delete, func, select, update
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
 
 from .base import CRUDBase
-from db.model.conversation import Conversation
+from db.model.conversation import Conversation, DEFAULT_TITLE
 from db.model.session import Session as SessionModel
-from schema.conversation import ConversationCreateInternal, ConversationUpdate
+from db.model.message import Message
+from db.model.ai_analysis import AIAnalysis
+from db.model.response_feedback import ResponseFeedback
+from db.model.archived_conversation import ArchivedConversation
+from db import counters
+from schema.conversation import ConversationCreateInternal, ConversationUpdate, ConversationHistory, ConversationInDB
+from schema.message import MessageInDB
+from schema.admin.conversation import ConversationAdminView
+from db.write_buffer import session_write_buffer
+from services.archive import conversation_archive
+from services import tracing
 
 
+@tracing.traced_methods
 class CRUDConversation(CRUDBase[Conversation, ConversationCreateInternal, ConversationUpdate]):
     """
     CRUD methods for Conversation, with custom methods for specific business logic.
     """
-    
+
+    def get(self, db: Session, id: Any) -> Optional[Conversation]:
+        """
+        Get a conversation by ID, making sure a still-buffered one is written first.
+        """
+        session_write_buffer.ensure_persisted(id)
+        return super().get(db, id=id)
+
+    def get_session_id(self, db: Session, *, id: uuid.UUID) -> Optional[uuid.UUID]:
+        """
+        The session a conversation belongs to, or None if it doesn't exist.
+        """
+        session_write_buffer.ensure_persisted(id)
+        return db.scalar(select(Conversation.session_id).where(Conversation.id == id))
+
+    def get_title(self, db: Session, *, id: uuid.UUID) -> Optional[str]:
+        """
+        The title of a conversation, or None if it doesn't exist.
+        """
+        session_write_buffer.ensure_persisted(id)
+        return db.scalar(select(Conversation.title).where(Conversation.id == id))
+
+    def set_generated_title(self, db: Session, *, id: uuid.UUID, title: str) -> bool:
+        """
+        Replaces the default title with a generated one. False if the conversation
+        is gone or has been renamed in the meantime (a user's title wins).
+        """
+        result = db.execute(
+            update(Conversation)
+            .where(Conversation.id == id, Conversation.title == DEFAULT_TITLE)
+            .values(title=title)
+        )
+        db.commit()
+        return result.rowcount > 0
+
     def create(self, db: Session, *, obj_in: ConversationCreateInternal) -> Conversation:
         """
         Overrides the base create method to handle conversation creation.
         The base method is more generic; this is tailored to our needs.
         """
-        # The title will use the default "New Chat" from the model definition.
+        # The title will use DEFAULT_TITLE from the model definition.
         if obj_in.session_id:
+            session_write_buffer.ensure_persisted(obj_in.session_id)
             db_obj = self.model(session_id=obj_in.session_id)
             db.add(db_obj)
             db.commit()
@@ -40,53 +88,186 @@ class CRUDConversation(CRUDBase[Conversation, ConversationCreateInternal, Conver
         else:
             raise HTTPException(status_code=400, detail="Either session_id or user_id must be provided to create a conversation.")
 
-    def get_all_by_session_id(self, db: Session, *, session_id: uuid.UUID) -> List[Conversation]:
+    # The read paths below build the response schemas directly from column
+    # tuples: no ORM objects are hydrated and, since the rows come straight from
+    # the database, `model_construct` skips re-validating them.
+
+    def get_history_by_session_id(self, db: Session, *, session_id: uuid.UUID) -> List[ConversationHistory]:
         """
-        Get all conversations for a specific session, ordered by most recent.
+        Sidebar rows for all conversations of a session, most recent first.
         """
-        return (
-            db.query(self.model)
-            .filter(Conversation.session_id == session_id)
+        session_write_buffer.ensure_persisted(session_id)
+        rows = db.execute(
+            select(Conversation.id, Conversation.title, Conversation.created_at)
+            .where(Conversation.session_id == session_id)
             .order_by(Conversation.created_at.desc())
-            .all()
         )
-    def get_all_by_user_id(self, db: Session, *, user_id: uuid.UUID) -> List[Conversation]:
+        return [ConversationHistory.model_construct(**row._mapping) for row in rows]
+
+    def get_history_by_user_id(self, db: Session, *, user_id: uuid.UUID) -> List[ConversationHistory]:
         """
-        Retrieves all conversation histories for a given authenticated user.
-        
+        Sidebar rows for all conversations of an authenticated user, most recent first.
+
         It works by finding all sessions linked to the user and then joining
         to the conversations within those sessions.
         """
-        return (
-            db.query(self.model)
-            .join(self.model.session)
-            .filter(SessionModel.user_id == user_id)
-            .order_by(self.model.created_at.desc())
-            .all()
+        rows = db.execute(
+            select(Conversation.id, Conversation.title, Conversation.created_at)
+            .join(SessionModel, SessionModel.id == Conversation.session_id)
+            .where(SessionModel.user_id == user_id)
+            .order_by(Conversation.created_at.desc())
         )
+        return [ConversationHistory.model_construct(**row._mapping) for row in rows]
 
-    def search_by_content(self, db: Session, *, keyword: str, skip: int = 0, limit: int = 100 ) -> List[Conversation]:
+    def get_with_messages(self, db: Session, *, id: uuid.UUID) -> Optional[ConversationInDB]:
+        """
+        A conversation with all its messages (archived ones first), or None if it doesn't exist.
+        """
+        session_write_buffer.ensure_persisted(id)
+        conv = db.execute(
+            select(
+                Conversation.id, Conversation.session_id, Conversation.title, Conversation.created_at,
+                ArchivedConversation.conversation_id.is_not(None).label("archived"),
+            )
+            .outerjoin(ArchivedConversation, ArchivedConversation.conversation_id == Conversation.id)
+            .where(Conversation.id == id)
+        ).first()
+        if conv is None:
+            return None
+
+        messages: List[MessageInDB] = []
+        if conv.archived:
+            # Read back from the archive segment; these are plain JSON, so validate them.
+            messages = [MessageInDB.model_validate(m) for m in conversation_archive.get_messages(db, id)]
+        rows = db.execute(
+            select(Message.id, Message.sender_type, Message.content, Message.created_at)
+            .where(Message.conversation_id == id)
+            .order_by(Message.created_at)
+        )
+        messages.extend(MessageInDB.model_construct(**row._mapping) for row in rows)
+        return ConversationInDB.model_construct(
+            id=conv.id, session_id=conv.session_id, title=conv.title, created_at=conv.created_at, messages=messages
+        )
+
+    def get_many_with_messages(self, db: Session, *, ids: List[uuid.UUID]) -> List[ConversationInDB]:
+        """
+        Several conversations with their messages, in the order of `ids`; unknown ids are skipped.
+        Two queries however many conversations are asked for (plus one archive read per archived one).
+        """
+        session_write_buffer.ensure_persisted(*ids)
+        convs = db.execute(
+            select(
+                Conversation.id, Conversation.session_id, Conversation.title, Conversation.created_at,
+                ArchivedConversation.conversation_id.is_not(None).label("archived"),
+            )
+            .outerjoin(ArchivedConversation, ArchivedConversation.conversation_id == Conversation.id)
+            .where(Conversation.id.in_(ids))
+        ).all()
+        if not convs:
+            return []
+
+        messages: Dict[uuid.UUID, List[MessageInDB]] = defaultdict(list)
+        for conv in convs:
+            if conv.archived:
+                messages[conv.id] = [MessageInDB.model_validate(m) for m in conversation_archive.get_messages(db, conv.id)]
+        rows = db.execute(
+            select(Message.conversation_id, Message.id, Message.sender_type, Message.content, Message.created_at)
+            .where(Message.conversation_id.in_([conv.id for conv in convs]))
+            .order_by(Message.conversation_id, Message.created_at)
+        )
+        for row in rows:
+            messages[row.conversation_id].append(MessageInDB.model_construct(
+                id=row.id, sender_type=row.sender_type, content=row.content, created_at=row.created_at
+            ))
+
+        by_id = {conv.id: conv for conv in convs}
+        return [
+            ConversationInDB.model_construct(
+                id=conv.id, session_id=conv.session_id, title=conv.title, created_at=conv.created_at,
+                messages=messages[conv.id],
+            )
+            for conv in (by_id[conversation_id] for conversation_id in dict.fromkeys(ids) if conversation_id in by_id)
+        ]
+
+    def remove_many(self, db: Session, *, ids: List[uuid.UUID]) -> List[uuid.UUID]:
+        """
+        Deletes conversations with their messages, analyses, feedback and archive
+        entries, and returns the ids that existed.
+
+        Set-based deletes, children first, in one transaction: nothing is loaded
+        into Python. Since the ORM's flush hook doesn't see these, the dashboard
+        counter deltas are computed up front and applied in the same transaction.
+        Archive frames stay in their append-only segments, unreferenced.
+        """
+        session_write_buffer.ensure_persisted(*ids)
+        existing = list(db.scalars(select(Conversation.id).where(Conversation.id.in_(ids))))
+        if not existing:
+            return []
+
+        deltas = counters.deleted_conversation_deltas(db, existing)
+        message_ids = select(Message.id).where(Message.conversation_id.in_(existing)).scalar_subquery()
+        db.execute(delete(AIAnalysis).where(AIAnalysis.message_id.in_(message_ids)))
+        db.execute(delete(ResponseFeedback).where(ResponseFeedback.message_id.in_(message_ids)))
+        db.execute(delete(Message).where(Message.conversation_id.in_(existing)))
+        db.execute(delete(ArchivedConversation).where(ArchivedConversation.conversation_id.in_(existing)))
+        db.execute(delete(Conversation).where(Conversation.id.in_(existing)))
+        counters.apply_deltas(db.connection(), deltas)
+        db.commit()
+        return existing
+
+    def rename_many(self, db: Session, *, titles: Dict[uuid.UUID, str]) -> List[ConversationHistory]:
+        """
+        Sets the title of several conversations with one executemany UPDATE and
+        returns the renamed ones; unknown ids are skipped.
+        """
+        session_write_buffer.ensure_persisted(*titles)
+        existing = list(db.scalars(select(Conversation.id).where(Conversation.id.in_(list(titles)))))
+        if not existing:
+            return []
+        db.execute(update(Conversation), [{"id": conversation_id, "title": titles[conversation_id]} for conversation_id in existing])
+        db.commit()
+        rows = db.execute(
+            select(Conversation.id, Conversation.title, Conversation.created_at)
+            .where(Conversation.id.in_(existing))
+            .order_by(Conversation.created_at.desc())
+        )
+        return [ConversationHistory.model_construct(**row._mapping) for row in rows]
+
+    def search_by_content(self, db: Session, *, keyword: str, skip: int = 0, limit: int = 100, include_archived: bool = False) -> List[ConversationAdminView]:
         """
         Searches for conversations containing a message with the given keyword.
+        With `include_archived`, archived conversations are scanned on demand as well.
+        Message counts (hot plus archived) come from the same query.
         """
-        from db.model.message import Message
         # This subquery finds conversation_ids that have a matching message
         subquery = (
-            db.query(Message.conversation_id)
-            .filter(Message.content.ilike(f"%{keyword}%"))
+            select(Message.conversation_id)
+            .where(Message.content.ilike(f"%{keyword}%"))
             .distinct()
-            .subquery()
         )
         
+        condition = Conversation.id.in_(subquery) # type: ignore
+        if include_archived:
+            archived_ids = list(conversation_archive.search(db, keyword=keyword))
+            if archived_ids:
+                condition = condition | Conversation.id.in_(archived_ids)
+
+        hot_count = (
+            select(func.count(Message.id)).where(Message.conversation_id == Conversation.id).scalar_subquery()
+        )
         # The main query fetches the conversations based on the subquery results
-        return (
-            db.query(self.model)
-            .filter(Conversation.id.in_(subquery)) # type: ignore
+        rows = db.execute(
+            select(
+                Conversation.id, Conversation.session_id, Conversation.title, Conversation.created_at,
+                (hot_count + func.coalesce(ArchivedConversation.message_count, 0)).label("message_count"),
+            )
+            .outerjoin(ArchivedConversation, ArchivedConversation.conversation_id == Conversation.id)
+            .where(condition)
             .order_by(Conversation.created_at.desc())
             .offset(skip)
             .limit(limit)
-            .all()
         )
+        return [ConversationAdminView.model_construct(**row._mapping) for row in rows]
 
 # Singleton instance for use in the API layer
 conversation = CRUDConversation(Conversation)
\ No newline at end of file
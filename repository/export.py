@@ -0,0 +1,172 @@
+import uuid
+from datetime import datetime
+from itertools import groupby
+from typing import Any, Dict, Iterator, List, Optional
+
+from sqlalchemy import select, exists, and_, or_
+from sqlalchemy.orm import Session, aliased
+
+from db.model.conversation import Conversation
+from db.model.message import Message, SenderType
+from db.model.ai_analysis import AIAnalysis
+from db.model.response_feedback import ResponseFeedback, FeedbackType
+from db.model.archived_conversation import ArchivedConversation
+from services import tracing
+from services.archive import conversation_archive
+
+# One flat row per message, in this column order.
+EXPORT_COLUMNS = [
+    "conversation_id",
+    "session_id",
+    "conversation_title",
+    "conversation_created_at",
+    "message_id",
+    "sender_type",
+    "content",
+    "message_created_at",
+    "criticality_flag",
+    "potential_conditions",
+    "processing_time_ms",
+    "ai_provider",
+    "ai_model",
+    "is_error",
+    "token_usage",
+    "feedback_type",
+    "feedback_comment",
+    "feedback_created_at",
+]
+_AI_PROVIDER = EXPORT_COLUMNS.index("ai_provider")
+
+
+@tracing.traced_methods
+class CRUDExport:
+    def build_query(
+        self,
+        *,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        feedback_type: Optional[FeedbackType] = None,
+        ai_provider: Optional[str] = None,
+    ):
+        """
+        Builds the flat message export query. Filters select whole conversations:
+        created in [start, end), having any feedback of `feedback_type`, and/or
+        having any reply from `ai_provider`.
+
+        Each row ends with an extra column, the conversation's archive entry id
+        (NULL if it has none); archived conversations also yield a row with NULL
+        message columns, so `iter_batches` can add their archived messages.
+        """
+        stmt = (
+            select(
+                Conversation.id,
+                Conversation.session_id,
+                Conversation.title,
+                Conversation.created_at,
+                Message.id,
+                Message.sender_type,
+                Message.content,
+                Message.created_at,
+                AIAnalysis.criticality_flag,
+                AIAnalysis.potential_conditions,
+                AIAnalysis.processing_time_ms,
+                AIAnalysis.ai_provider,
+                AIAnalysis.ai_model,
+                AIAnalysis.is_error,
+                AIAnalysis.token_usage,
+                ResponseFeedback.feedback_type,
+                ResponseFeedback.comment,
+                ResponseFeedback.created_at,
+                ArchivedConversation.conversation_id,
+            )
+            .select_from(Conversation)
+            .outerjoin(ArchivedConversation, ArchivedConversation.conversation_id == Conversation.id)
+            .outerjoin(Message, Message.conversation_id == Conversation.id)
+            .outerjoin(AIAnalysis, AIAnalysis.message_id == Message.id)
+            .outerjoin(ResponseFeedback, ResponseFeedback.message_id == Message.id)
+            .where(or_(Message.id.isnot(None), ArchivedConversation.conversation_id.isnot(None)))
+        )
+        if start is not None:
+            stmt = stmt.where(Conversation.created_at >= start)
+        if end is not None:
+            stmt = stmt.where(Conversation.created_at < end)
+        if feedback_type is not None:
+            msg, fb = aliased(Message), aliased(ResponseFeedback)
+            archived_count = ArchivedConversation.like_count if feedback_type == FeedbackType.LIKE else ArchivedConversation.dislike_count
+            stmt = stmt.where(or_(
+                exists().where(and_(
+                    msg.conversation_id == Conversation.id,
+                    fb.message_id == msg.id,
+                    fb.feedback_type == feedback_type,
+                )).correlate(Conversation),
+                archived_count > 0,
+            ))
+        if ai_provider is not None:
+            # Archived replies are only known once the frame is read; `iter_batches` checks those.
+            msg, analysis = aliased(Message), aliased(AIAnalysis)
+            stmt = stmt.where(or_(
+                exists().where(and_(
+                    msg.conversation_id == Conversation.id,
+                    analysis.message_id == msg.id,
+                    analysis.ai_provider == ai_provider,
+                )).correlate(Conversation),
+                ArchivedConversation.conversation_id.isnot(None),
+            ))
+
+        # Keeps each conversation's messages contiguous for grouped output.
+        return stmt.order_by(Conversation.created_at, Conversation.id, Message.created_at, Message.id)
+
+    def iter_batches(
+        self, db: Session, stmt, *, batch_size: int = 1000, ai_provider: Optional[str] = None
+    ) -> Iterator[List[tuple]]:
+        """
+        Streams the export in batches of `EXPORT_COLUMNS` tuples through a
+        server-side cursor, so memory use is bounded by `batch_size` (plus one
+        conversation) rather than the result. Archived messages are read from
+        their frame and put before the conversation's hot ones; pass the same
+        `ai_provider` filter as `build_query` so archived conversations are
+        checked against it too.
+        """
+        result = db.execute(stmt.execution_options(stream_results=True, yield_per=batch_size))
+        batch: List[tuple] = []
+        for _, rows in groupby(result, key=lambda row: row[0]):
+            batch.extend(self._conversation_rows(db, list(rows), ai_provider))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _conversation_rows(self, db: Session, rows: List[Any], ai_provider: Optional[str]) -> List[tuple]:
+        messages = [tuple(row[:-1]) for row in rows if row[4] is not None]
+        if rows[0][-1] is None:
+            return messages
+        head = tuple(rows[0][:4])
+        archived = [head + self._archived_values(m) for m in conversation_archive.get_messages(db, rows[0][0])]
+        messages = archived + messages
+        if ai_provider is not None and not any(row[_AI_PROVIDER] == ai_provider for row in messages):
+            return []
+        return messages
+
+    @staticmethod
+    def _archived_values(message: Dict[str, Any]) -> tuple:
+        analysis = message["ai_analysis"] or {}
+        feedback = message["feedback"] or {}
+        return (
+            uuid.UUID(message["id"]),
+            SenderType(message["sender_type"]),
+            message["content"],
+            message["created_at"],
+            analysis.get("criticality_flag"),
+            analysis.get("potential_conditions"),
+            analysis.get("processing_time_ms"),
+            analysis.get("ai_provider"),
+            analysis.get("ai_model"),
+            analysis.get("is_error"),
+            analysis.get("token_usage"),
+            FeedbackType(feedback["feedback_type"]) if feedback else None,
+            feedback.get("comment"),
+            datetime.fromisoformat(feedback["created_at"]) if feedback.get("created_at") else None,
+        )
+
+export = CRUDExport()
@@ -5,7 +5,10 @@ from .base import CRUDBase
 from db.model.message import Message, SenderType
 from db.model.ai_analysis import AIAnalysis
 from schema.message import MessageCreate # No update schema for messages
+from db.write_buffer import session_write_buffer
+from services import timing, tracing
 
+@tracing.traced_methods
 class CRUDMessage(CRUDBase[Message, MessageCreate, MessageCreate]):
     def create_user_message(
         self, db: Session, *, conversation_id: uuid.UUID, obj_in: MessageCreate
@@ -13,14 +16,18 @@ class CRUDMessage(CRUDBase[Message, MessageCreate, MessageCreate]):
         """
         Creates a message specifically from a user.
         """
-        db_obj = self.model(
-            conversation_id=conversation_id,
-            sender_type=SenderType.USER,
-            content=obj_in.content
-        )
-        db.add(db_obj)
-        db.commit()
-        db.refresh(db_obj)
+        # The conversation may still be sitting in the session write buffer.
+        with timing.phase("session_buffer"):
+            session_write_buffer.ensure_persisted(conversation_id)
+        with timing.phase("user_message_insert"):
+            db_obj = self.model(
+                conversation_id=conversation_id,
+                sender_type=SenderType.USER,
+                content=obj_in.content
+            )
+            db.add(db_obj)
+            db.commit()
+        # Not refreshed: the endpoint doesn't read it back, and any attribute access reloads it.
         return db_obj
 
     def create_ai_message_with_analysis(
@@ -29,21 +36,27 @@ class CRUDMessage(CRUDBase[Message, MessageCreate, MessageCreate]):
         """
         Creates an AI message and its associated analysis record in a single transaction.
         """
-        ai_message = self.model(
-            conversation_id=conversation_id,
-            sender_type=SenderType.AI,
-            content=content
-        )
-        db.add(ai_message)
-        db.flush()  # Flush to get the ai_message.id
+        with timing.phase("ai_message_insert"):
+            ai_message = self.model(
+                conversation_id=conversation_id,
+                sender_type=SenderType.AI,
+                content=content
+            )
+            db.add(ai_message)
+            db.flush()  # Flush to get the ai_message.id
 
-        ai_analysis = AIAnalysis(
-            message_id=ai_message.id,
-            **analysis_data
-        )
-        db.add(ai_analysis)
-        db.commit()
-        db.refresh(ai_message)
+            ai_analysis = AIAnalysis(
+                message_id=ai_message.id,
+                **analysis_data
+            )
+            db.add(ai_analysis)
+            db.flush()
+            # created_at is read back as stored (SQLite drops the UTC offset), so the
+            # reply matches later reads; the other columns are exactly what was inserted.
+            # Detached, the commit doesn't expire them.
+            db.refresh(ai_message, ["created_at"])
+            db.expunge(ai_message)
+            db.commit()
         return ai_message
 
 # Singleton instance
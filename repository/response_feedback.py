@@ -5,7 +5,9 @@ from sqlalchemy.orm import Session, joinedload
 from .base import CRUDBase
 from db.model.response_feedback import ResponseFeedback, FeedbackType
 from schema.response_feedback import ResponseFeedbackCreate
+from services import tracing
 
+@tracing.traced_methods
 class CRUDResponseFeedback(CRUDBase[ResponseFeedback, ResponseFeedbackCreate, ResponseFeedbackCreate]):
     def get_multi_with_filter(self, db: Session, *, feedback_type: Optional[FeedbackType] = None, skip: int = 0, limit: int = 100) -> List[ResponseFeedback]:
         query = db.query(self.model).options(joinedload(self.model.message))
@@ -1,3 +1,4 @@
+import logging
 import uuid
 from datetime import datetime, timezone
 from typing import Tuple, Optional, Dict, Any
@@ -5,10 +6,15 @@ from sqlalchemy.orm import Session
 
 from .base import CRUDBase
 from db.model.session import Session as SessionModel
-from db.model.conversation import Conversation as ConversationModel
+from db.model.conversation import Conversation as ConversationModel, DEFAULT_TITLE
 from schema.session import SessionCreate
+from db.write_buffer import session_write_buffer
+from services import tracing
+
+logger = logging.getLogger(__name__)
 
 # We use Dict[str, Any] for the UpdateSchemaType as we don't have a specific one.
+@tracing.traced_methods
 class CRUDSession(CRUDBase[SessionModel, SessionCreate, Dict[str, Any]]): # type: ignore
     """
     CRUD operations for Session objects.
@@ -66,6 +72,45 @@ class CRUDSession(CRUDBase[SessionModel, SessionCreate, Dict[str, Any]]): # type
         
         return new_session, new_conversation
 
+    def enqueue_with_conversation(
+        self,
+        *,
+        obj_in: SessionCreate,
+        ip_address: Optional[str],
+        user_agent: Optional[str]
+    ) -> Tuple[uuid.UUID, uuid.UUID]:
+        """
+        Write-behind variant of `create_with_conversation`.
+
+        The IDs are generated here rather than by the database, so the caller can
+        respond immediately while the rows are batch-inserted in the background.
+
+        Returns:
+            Tuple[uuid.UUID, uuid.UUID]: The new session ID and conversation ID.
+        """
+        now = datetime.now(timezone.utc)
+        session_id = uuid.uuid4()
+        conversation_id = uuid.uuid4()
+
+        # Every row needs the same keys for the batched executemany insert.
+        session_row = {column.key: None for column in self.model.__table__.columns}
+        session_row.update(obj_in.model_dump(mode="json"))
+        session_row.update(
+            id=session_id,
+            ip_address=ip_address,
+            user_agent=user_agent,
+            started_at=now,
+        )
+        conversation_row = {
+            "id": conversation_id,
+            "session_id": session_id,
+            "title": DEFAULT_TITLE,
+            "created_at": now,
+        }
+
+        session_write_buffer.add_session(session_row, conversation_row)
+        return session_id, conversation_id
+
     def get_or_create_active_session_for_user(
         self, db: Session, *, user_id: uuid.UUID
     ) -> SessionModel:
@@ -81,11 +126,11 @@ class CRUDSession(CRUDBase[SessionModel, SessionCreate, Dict[str, Any]]): # type
         Returns:
             The active (most recent) or newly created Session object.
         """
-        # 1. Try to find the user's most recent session by ordering by creation date.
+        # 1. Try to find the user's most recent session by ordering by start date.
         session = (
             db.query(self.model)
             .filter(self.model.user_id == user_id)
-            .order_by(self.model.created_at.desc())
+            .order_by(self.model.started_at.desc())
             .first()
         )
 
@@ -95,7 +140,7 @@ class CRUDSession(CRUDBase[SessionModel, SessionCreate, Dict[str, Any]]): # type
         
         # 2. If no session is found, create a new one for this user.
         #    This handles the "cold start" case for a newly logged-in user.
-        print(f"No active session found for user_id {user_id}. Creating a new one.")
+        logger.info("No active session found for user_id %s. Creating a new one.", user_id)
         
         # We don't have ip_address or user_agent here, which is perfectly acceptable
         # as this session is initiated by an authenticated, server-side action.
@@ -119,6 +164,7 @@ class CRUDSession(CRUDBase[SessionModel, SessionCreate, Dict[str, Any]]): # type
             # If the session_id is not a valid UUID, it can't exist in the DB.
             return None
 
+        session_write_buffer.ensure_persisted(session_uuid)
         db_session = self.get(db, id=session_uuid)
 
         # Only associate if the session exists and is currently anonymous
@@ -142,5 +188,12 @@ class CRUDSession(CRUDBase[SessionModel, SessionCreate, Dict[str, Any]]): # type
             db.refresh(db_obj)
         return db_obj
 
+    def enqueue_end_session(self, *, session_id: uuid.UUID) -> None:
+        """
+        Write-behind variant of `end_session`: queues the `ended_at` update
+        without reading the session first. Unknown session IDs are a no-op.
+        """
+        session_write_buffer.end_session(session_id, datetime.now(timezone.utc))
+
 # Create a singleton instance of the CRUDSession class for the application to use
 session = CRUDSession(SessionModel)
\ No newline at end of file
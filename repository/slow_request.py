@@ -0,0 +1,49 @@
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete
+from sqlalchemy.orm import Session
+
+from .base import CRUDBase
+from config import SETTINGS
+from db.model.slow_request import SlowRequest
+from schema.admin.analytics import SlowRequestSample
+from services import tracing
+
+@tracing.traced_methods
+class CRUDSlowRequest(CRUDBase[SlowRequest, SlowRequestSample, SlowRequestSample]):
+    def record(
+        self,
+        db: Session,
+        *,
+        method: str,
+        route: str,
+        status_code: int,
+        duration_ms: float,
+        db_queries: int,
+        db_ms: float,
+        phases: Dict[str, float],
+    ) -> None:
+        """
+        Stores one sample and drops samples older than SLOW_REQUEST_RETENTION_DAYS,
+        so the table stays small without a separate cleanup job.
+        """
+        db.add(self.model(
+            method=method, route=route, status_code=status_code, duration_ms=duration_ms,
+            db_queries=db_queries, db_ms=db_ms, phases=phases,
+        ))
+        cutoff = datetime.now(timezone.utc) - timedelta(days=SETTINGS.SLOW_REQUEST_RETENTION_DAYS)
+        db.execute(delete(self.model).where(self.model.created_at < cutoff))
+        db.commit()
+
+    def get_recent(
+        self, db: Session, *, since: datetime, route: Optional[str] = None, limit: int = 100
+    ) -> List[SlowRequest]:
+        """Samples taken since `since`, slowest first."""
+        query = db.query(self.model).filter(self.model.created_at >= since)
+        if route:
+            query = query.filter(self.model.route == route)
+        return query.order_by(self.model.duration_ms.desc()).limit(limit).all()
+
+# Singleton instance
+slow_request = CRUDSlowRequest(SlowRequest)
@@ -1,35 +1,85 @@
 # crud/crud_stats.py
 
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Dict
+
 from sqlalchemy.orm import Session
-from sqlalchemy import func, case
 
-from db.model.session import Session as SessionModel
-from db.model.conversation import Conversation as ConversationModel
-from db.model.message import Message as MessageModel
-# --- CHANGE HERE: Import the new model ---
-from db.model.response_feedback import ResponseFeedback, FeedbackType
-from schema.admin.stats import StatsResponse
+from db import counters
+from db.model.stats import StatsCounter, DailyStatsRollup
+from schema.admin.stats import StatsResponse, StatsBucket, StatsGranularity, StatsTimeSeriesResponse
+from services import tracing
+
+# rollup metric -> StatsBucket / StatsResponse field
+_FIELDS = {
+    counters.SESSIONS: "sessions",
+    counters.CONVERSATIONS: "conversations",
+    counters.MESSAGES: "messages",
+    counters.FEEDBACK_LIKE: "like_count",
+    counters.FEEDBACK_DISLIKE: "dislike_count",
+}
+
 
+def _bucket_start(day: date, granularity: StatsGranularity) -> date:
+    if granularity == StatsGranularity.WEEK:
+        return day - timedelta(days=day.weekday())
+    if granularity == StatsGranularity.MONTH:
+        return day.replace(day=1)
+    return day
+
+
+@tracing.traced_methods
 class CRUDStats:
     def get_dashboard_stats(self, db: Session) -> StatsResponse:
-        total_sessions = db.query(func.count(SessionModel.id)).scalar()
-        total_conversations = db.query(func.count(ConversationModel.id)).scalar()
-        total_messages = db.query(func.count(MessageModel.id)).scalar()
-        
-
-        feedback_stats = db.query(
-            func.count(case((ResponseFeedback.feedback_type == FeedbackType.LIKE, ResponseFeedback.id), else_=None)),
-            func.count(case((ResponseFeedback.feedback_type == FeedbackType.DISLIKE, ResponseFeedback.id), else_=None))
-        ).one()
-        
-        like_count, dislike_count = feedback_stats
-        
+        """
+        Reads the all-time totals from the materialized counters (one small
+        primary-key scan, independent of table sizes).
+        """
+        values: Dict[str, int] = dict(db.query(StatsCounter.name, StatsCounter.value).all())  # type: ignore
+
         return StatsResponse(
-            total_sessions=total_sessions or 0,
-            total_conversations=total_conversations or 0,
-            total_messages=total_messages or 0,
-            like_count=like_count or 0,
-            dislike_count=dislike_count or 0,
+            total_sessions=values.get(counters.SESSIONS) or 0,
+            total_conversations=values.get(counters.CONVERSATIONS) or 0,
+            total_messages=values.get(counters.MESSAGES) or 0,
+            like_count=values.get(counters.FEEDBACK_LIKE) or 0,
+            dislike_count=values.get(counters.FEEDBACK_DISLIKE) or 0,
         )
 
-stats = CRUDStats()
\ No newline at end of file
+    def get_time_series(
+        self, db: Session, *, start: date, end: date, granularity: StatsGranularity
+    ) -> StatsTimeSeriesResponse:
+        """
+        Returns per-period counts between `start` and `end` (inclusive), served
+        from the daily rollups and re-bucketed by `granularity`.
+        """
+        rows = (
+            db.query(DailyStatsRollup.day, DailyStatsRollup.metric, DailyStatsRollup.value)
+            .filter(DailyStatsRollup.day >= start, DailyStatsRollup.day <= end)
+            .all()
+        )
+
+        buckets: Dict[date, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        for day, metric, value in rows:
+            field = _FIELDS.get(metric)
+            if field:
+                buckets[_bucket_start(day, granularity)][field] += value
+
+        return StatsTimeSeriesResponse(
+            start=start,
+            end=end,
+            granularity=granularity,
+            buckets=[
+                StatsBucket(period_start=period_start, **values)
+                for period_start, values in sorted(buckets.items())
+            ],
+        )
+
+    def rebuild(self, db: Session) -> StatsResponse:
+        """
+        Recomputes the counters and rollups from the base tables.
+        """
+        counters.rebuild(db)
+        return self.get_dashboard_stats(db)
+
+stats = CRUDStats()
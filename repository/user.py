@@ -2,7 +2,9 @@ from sqlalchemy.orm import Session
 from db.model.user import User
 from schema.user import UserCreate
 from .base import CRUDBase
+from services import tracing
 
+@tracing.traced_methods
 class CRUDUser(CRUDBase[User, UserCreate, UserCreate]):
     def get_by_google_id(self, db: Session, *, google_id: str) -> User | None:
         return db.query(User).filter(User.google_id == google_id).first()
@@ -1,3 +1,8 @@
 from . import stats
 from . import response_feedback
-from . import conversation
\ No newline at end of file
+from . import conversation
+from . import analytics
+from . import attribution
+from . import backup
+from . import archive
+from . import profiler
\ No newline at end of file
@@ -0,0 +1,45 @@
+import enum
+from datetime import datetime
+from typing import Dict, List
+
+from pydantic import BaseModel
+
+class AnalyticsBucketSize(str, enum.Enum):
+    HOUR = "hour"
+    DAY = "day"
+
+class LatencyBucket(BaseModel):
+    """AI reply latency and quality figures for one period / provider / model."""
+    period_start: datetime
+    ai_provider: str | None
+    ai_model: str | None
+    reply_count: int
+    throughput_per_min: float
+    p50_ms: float | None
+    p90_ms: float | None
+    p99_ms: float | None
+    mean_ms: float | None
+    max_ms: int | None
+    error_rate: float
+    feedback_rate: float
+    dislike_rate: float
+
+class LatencyAnalyticsResponse(BaseModel):
+    start: datetime
+    end: datetime
+    bucket: AnalyticsBucketSize
+    buckets: List[LatencyBucket]
+
+class SlowRequestSample(BaseModel):
+    """A request slower than SLOW_REQUEST_THRESHOLD_MS and where its time went (phase -> ms)."""
+    created_at: datetime
+    method: str
+    route: str
+    status_code: int
+    duration_ms: float
+    db_queries: int | None
+    db_ms: float | None
+    phases: Dict[str, float]
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,4 @@
+from pydantic import BaseModel
+
+class ArchiveRunResponse(BaseModel):
+    archived_conversations: int
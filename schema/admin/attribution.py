@@ -0,0 +1,35 @@
+import enum
+from datetime import date
+from typing import List
+
+from pydantic import BaseModel
+
+class AttributionDimension(str, enum.Enum):
+    SOURCE = "utm_source"
+    MEDIUM = "utm_medium"
+    CAMPAIGN = "utm_campaign"
+
+class AttributionFunnelRow(BaseModel):
+    """Funnel counts and conversion rates for one UTM group."""
+    utm_source: str | None = None
+    utm_medium: str | None = None
+    utm_campaign: str | None = None
+    sessions: int
+    conversations: int
+    messages: int
+    logins: int
+    likes: int
+    dislikes: int
+    conversation_rate: float
+    login_rate: float
+    messages_per_session: float
+    like_rate: float | None
+
+class AttributionFunnelResponse(BaseModel):
+    start: date
+    end: date
+    group_by: List[AttributionDimension]
+    rows: List[AttributionFunnelRow]
+
+class AttributionBackfillResponse(BaseModel):
+    cells_written: int
@@ -0,0 +1,18 @@
+from datetime import datetime
+from typing import List
+
+from pydantic import BaseModel
+
+class SnapshotView(BaseModel):
+    name: str
+    size_bytes: int
+    created_at: datetime
+
+class SnapshotListResponse(BaseModel):
+    in_progress: bool
+    last_error: str | None = None
+    snapshots: List[SnapshotView]
+
+class SnapshotStartResponse(BaseModel):
+    started: bool
+    in_progress: bool
@@ -0,0 +1,32 @@
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+class ProfilerArmRequest(BaseModel):
+    route: Optional[str] = Field(
+        None, description="Only profile requests to this path or route template, e.g. '/api/v1/messages/{conversation_id}'"
+    )
+    requests: Optional[int] = Field(None, ge=1, le=100, description="Stop after this many profiled requests")
+    seconds: Optional[int] = Field(None, ge=1, description="Stop after this many seconds (capped by PROFILER_MAX_SECONDS)")
+    interval_ms: int = Field(10, ge=1, le=1000, description="Sampling interval")
+
+class ProfilerArm(BaseModel):
+    id: str
+    route: Optional[str]
+    requests: Optional[int]
+    interval_ms: int
+    armed_at: datetime
+    expires_at: datetime
+
+class ProfilerStatus(BaseModel):
+    armed: bool
+    arm: Optional[ProfilerArm] = None
+
+class ProfileView(BaseModel):
+    name: str
+    size_bytes: int
+    created_at: datetime
+
+class ProfileListResponse(BaseModel):
+    profiles: List[ProfileView]
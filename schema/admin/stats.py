@@ -1,6 +1,9 @@
+import enum
+from datetime import date
+from typing import List
 
 from pydantic import BaseModel
-from typing import  Optional
+
 class StatsResponse(BaseModel):
     """High-level KPIs for the admin dashboard."""
     total_sessions: int
@@ -8,3 +11,31 @@ class StatsResponse(BaseModel):
     total_messages: int
     like_count: int
     dislike_count: int
+
+class StatsGranularity(str, enum.Enum):
+    DAY = "day"
+    WEEK = "week"
+    MONTH = "month"
+
+class StatsBucket(BaseModel):
+    """Counts of rows created within one period."""
+    period_start: date
+    sessions: int = 0
+    conversations: int = 0
+    messages: int = 0
+    like_count: int = 0
+    dislike_count: int = 0
+
+class StatsTimeSeriesResponse(BaseModel):
+    start: date
+    end: date
+    granularity: StatsGranularity
+    buckets: List[StatsBucket]
+
+class OAuthStateMetrics(BaseModel):
+    """OAuth login states: outstanding across all workers, counters for this worker process."""
+    outstanding: int
+    issued: int
+    consumed: int
+    rejected: int
+    evicted: int
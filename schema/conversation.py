@@ -74,4 +74,33 @@ class ConversationInDB(BaseModel):
         from_attributes = True
 
 class ConversationTitle(BaseModel):
-    title: str 
\ No newline at end of file
+    title: str 
+    pending: bool = False  # a title is being generated in the background
+
+# ---------------------------------------------------------------------------
+# Batch operations
+# ---------------------------------------------------------------------------
+
+MAX_BATCH_SIZE = 100
+
+
+class ConversationBatchIds(BaseModel):
+    """
+    The conversations a batch fetch or delete applies to.
+    """
+    ids: List[uuid.UUID] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+
+class ConversationRename(ConversationUpdate):
+    id: uuid.UUID
+
+
+class ConversationBatchRename(BaseModel):
+    """
+    New titles for several conversations.
+    """
+    items: List[ConversationRename] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+
+class ConversationBatchDeleteResult(BaseModel):
+    deleted: List[uuid.UUID]
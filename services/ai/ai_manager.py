@@ -1,7 +1,19 @@
-from services.ai.session_manager import SessionManager
-from services.ai.client.gemini import GeminiClient
+import logging
+import time
+from threading import Lock
+from typing import Any
+
+from opentelemetry.trace import SpanKind
+
+from services import metrics, timing, tracing
+from services.ai.session_manager import SessionManager, append_exchange
+
+logger = logging.getLogger(__name__)
 
 class AIManager:
+    # Returned by `generate_title` when there is nothing to title yet or the provider call fails.
+    FALLBACK_TITLE = "New Conversation"
+
     def __init__(self, provider_name: str = "gemini"):
         # The system instruction is now a core part of the AIManager's configuration.
         self.system_instruction = """
@@ -17,12 +29,50 @@ Your operational protocol is as follows:
 6.  **Give Safe, Actionable Advice**: Your primary advice should almost always be to consult a healthcare professional. You can also suggest safe, general home care tips (e.g., "resting and staying hydrated can be helpful for many common illnesses").
 7.  **Maintain Persona**: Your tone should be calm, reassuring, and professional throughout the conversation.
 """
-        self._provider = self._get_provider(provider_name, self.system_instruction)
-        self.sessions = SessionManager(self._provider)
+        self.provider_name = provider_name
+        # The provider (SDK import + client setup) is created on first use,
+        # so importing this module doesn't slow down worker start-up.
+        self._provider_instance = None
+        self._sessions = None
+        self._init_lock = Lock()
+
+    @property
+    def _provider(self):
+        if self._provider_instance is None:
+            self._initialize()
+        return self._provider_instance
+
+    @property
+    def sessions(self) -> SessionManager:
+        if self._sessions is None:
+            self._initialize()
+        return self._sessions  # type: ignore
+
+    def _initialize(self) -> None:
+        with self._init_lock:
+            if self._provider_instance is None:
+                provider = self._get_provider(self.provider_name, self.system_instruction)
+                self._sessions = SessionManager(provider)
+                self._provider_instance = provider
+
+    def preload(self) -> None:
+        """
+        Imports the provider SDK without creating a client. Called in the gunicorn
+        master so workers share the imported modules copy-on-write.
+        """
+        if self.provider_name == "gemini":
+            import google.generativeai  # noqa: F401
+
+    def reset(self) -> None:
+        """Drops the provider client and chat sessions; they are rebuilt on next use (e.g. after fork)."""
+        with self._init_lock:
+            self._provider_instance = None
+            self._sessions = None
 
     def _get_provider(self, provider_name: str, system_instruction: str):
         """Factory for creating a configured AI provider."""
         if provider_name == "gemini":
+            from services.ai.client.gemini import GeminiClient
             # Pass the instruction during client creation.
             return GeminiClient(system_instruction=system_instruction)
         # future: elif provider_name == "openai": return OpenAIClient(system_instruction)
@@ -35,14 +85,40 @@ Your operational protocol is as follows:
         """
         return self.sessions.send_message(patient_id, message)
 
+    def record_reply(self, patient_id: str, message: str, reply: str) -> None:
+        """
+        Adds a reply given without the provider (e.g. triage's emergency
+        guidance) to the chat history, so the next provider call sees it.
+        """
+        append_exchange(patient_id, message, reply)
+
+    def generate_json(self, prompt: str) -> Any:
+        """Structured-output call outside any conversation; raises on provider or parse errors."""
+        provider = self._provider
+        start = time.perf_counter()
+        span_attributes = {
+            "gen_ai.system": type(provider).__name__,
+            "gen_ai.request.model": provider.model_name or "",
+        }
+        try:
+            with tracing.span("ai.generate_json", kind=SpanKind.CLIENT, attributes=span_attributes):
+                result = provider.generate_json(prompt)
+        except Exception:
+            metrics.observe_ai_call(type(provider).__name__, provider.model_name, time.perf_counter() - start, error=True)
+            raise
+        metrics.observe_ai_call(type(provider).__name__, provider.model_name, time.perf_counter() - start, error=False)
+        return result
+
 
-    def generate_title(self, patient_id: str) -> str:
+    def generate_title(self, patient_id: str, *, raise_errors: bool = False) -> str:
         """
         Generates a title by sending a hidden prompt to the active chat session
         and then removing the interaction from the history.
 
         Args:
             patient_id: The conversation_id to identify the active chat session.
+            raise_errors: Re-raise provider errors instead of returning the
+                fallback (background jobs retry on them).
 
         Returns:
             A generated title string, or a fallback title if an error occurs.
@@ -53,7 +129,7 @@ Your operational protocol is as follows:
         
         # If the conversation has just started, there's no context for a title
         if not chat_session.history:
-            return "New Conversation"
+            return self.FALLBACK_TITLE
 
         # 2. Define the "hidden" prompt that will be temporarily added
         prompt = """
@@ -63,7 +139,8 @@ Your operational protocol is as follows:
 
         try:
             # 3. Send the message. This WILL add the prompt and response to the session's history.
-            response = chat_session.send_message(prompt)
+            with timing.phase("ai_title"):
+                response = chat_session.send_message(prompt)
             
             # 4. CRITICAL STEP: Clean up the history.
             #    We are removing the last two entries:
@@ -79,8 +156,11 @@ Your operational protocol is as follows:
 
         except Exception as e:
             # If anything goes wrong, log it and return a safe default
-            print(f"Error generating title for session {patient_id}: {e}")
-            return "New Conversation"
+            logger.warning("Error generating title for session %s: %s", patient_id, e)
+            metrics.ERRORS.labels("ai_title").inc()
+            if raise_errors:
+                raise
+            return self.FALLBACK_TITLE
 
 # Global instance
 ai_manager = AIManager(provider_name="gemini")
\ No newline at end of file
@@ -1,15 +1,41 @@
 from abc import ABC, abstractmethod
-from google.generativeai.generative_models import ChatSession
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+if TYPE_CHECKING:
+    from google.generativeai.generative_models import ChatSession
 
 class AIProvider(ABC):
     """Abstract interface for all AI providers."""
 
+    # Reply returned to the user when the provider call fails.
+    FALLBACK_REPLY = "I'm sorry, but I encountered an error and can't continue this conversation. Please try again later."
+
+    # Name of the underlying model, recorded on every AIAnalysis row.
+    model_name: str | None = None
+
+    @abstractmethod
+    def start_session(self, history: Optional[List[Dict[str, Any]]] = None) -> "ChatSession":
+        """
+        Create a new session (chat), optionally continuing from a history saved with
+        `dump_history`. The system instruction is handled at initialization.
+        """
+        pass
+
     @abstractmethod
-    def start_session(self) -> ChatSession:
-        """Create a new session (chat). The system instruction is handled at initialization."""
+    def dump_history(self, session) -> List[Dict[str, Any]]:
+        """Return the session's history as JSON-serializable turns, for `start_session`."""
         pass
 
     @abstractmethod
     def send_message(self, session, message: str) -> str:
         """Send a message to an existing session."""
-        pass
\ No newline at end of file
+        pass
+
+    @abstractmethod
+    def generate_json(self, prompt: str) -> Any:
+        """
+        One-shot structured-output call outside any chat session (no system
+        instruction, no history): returns the reply parsed as JSON. Errors are
+        raised, not replaced with a fallback, so callers can retry.
+        """
+        pass
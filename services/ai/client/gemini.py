@@ -1,25 +1,52 @@
-import google.generativeai as genai
-from google.generativeai.generative_models import ChatSession
+import json
+import logging
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
 
 from config import SETTINGS  # Assuming your settings are in config.settings
+from services import metrics, tracing
 from services.ai.base import AIProvider
 
+if TYPE_CHECKING:
+    from google.generativeai.generative_models import ChatSession
+
+logger = logging.getLogger(__name__)
+
 
 class GeminiClient(AIProvider):
     def __init__(self, system_instruction: str):
         """
         Initializes the Gemini client with a system instruction that defines its behavior.
         """
+        # Imported here: the SDK takes most of a second to import and is only
+        # needed once the first message is sent.
+        import google.generativeai as genai
+
         genai.configure(api_key=SETTINGS.GEMINI_API_KEY, transport="rest")  # type: ignore
 
+        self.model_name = SETTINGS.GEMINI_MODEL
         self.model = genai.GenerativeModel(SETTINGS.GEMINI_MODEL, system_instruction=system_instruction)  # type: ignore
+        # Structured-output calls (services/extraction.py): no persona, JSON only.
+        self.json_model = genai.GenerativeModel(  # type: ignore
+            SETTINGS.GEMINI_MODEL, generation_config={"response_mime_type": "application/json"}
+        )
+
+    def start_session(self, history: Optional[List[Dict[str, Any]]] = None) -> "ChatSession":
+        """
+        Starts a chat session, empty or continuing from a saved history.
+        The model already knows its system instruction.
+        """
+        # The system instruction is handled by the model itself, never part of the history.
+        return self.model.start_chat(history=history or [])
 
-    def start_session(self) -> ChatSession:
+    def dump_history(self, session) -> List[Dict[str, Any]]:
         """
-        Starts a new chat session. The model already knows its system instruction.
+        Converts the session's history to `{"role", "parts"}` dicts of text,
+        which `start_chat` accepts as-is.
         """
-        # The history should start empty. The system instruction is handled by the model itself.
-        return self.model.start_chat(history=[])
+        return [
+            {"role": content.role, "parts": [part.text for part in content.parts]}
+            for content in session.history
+        ]
 
     def send_message(self, session, message: str) -> str:
         """
@@ -27,9 +54,26 @@ class GeminiClient(AIProvider):
         """
         try:
             response = session.send_message(message)
+            self._count_tokens(response)
             return response.text
-        except Exception as e:
-            # Logging
-            print(f"Error during Gemini API call: {e}")
+        except Exception:
+            logger.exception("Error during Gemini API call")
             # Return a safe, generic error message to the user
-            return "I'm sorry, but I encountered an error and can't continue this conversation. Please try again later."
+            return self.FALLBACK_REPLY
+
+    def generate_json(self, prompt: str) -> Any:
+        response = self.json_model.generate_content(prompt)
+        self._count_tokens(response)
+        return json.loads(response.text)
+
+    def _count_tokens(self, response) -> None:
+        usage = getattr(response, "usage_metadata", None)
+        if usage is None:
+            return
+        tracing.set_attributes({
+            "gen_ai.usage.input_tokens": usage.prompt_token_count or 0,
+            "gen_ai.usage.output_tokens": usage.candidates_token_count or 0,
+        })
+        for kind, count in (("prompt", usage.prompt_token_count), ("completion", usage.candidates_token_count)):
+            if count:
+                metrics.AI_TOKENS.labels(type(self).__name__, self.model_name, kind).inc(count)
\ No newline at end of file
@@ -1,26 +1,81 @@
-from threading import Lock
+import time
+from typing import TYPE_CHECKING
 
-from google.generativeai.generative_models import ChatSession
+from config import SETTINGS
+from opentelemetry.trace import SpanKind
+
+from services import metrics, timing, tracing
+from services.state_store import StateStore, state_store
+
+if TYPE_CHECKING:
+    from google.generativeai.generative_models import ChatSession
 
 class SessionManager:
-    def __init__(self, provider):
+    """
+    Chat sessions keyed by patient_id (the conversation id).
+
+    Only the chat history is kept, in the shared state store, so any worker
+    process can continue a conversation. A provider session is rebuilt from
+    it for every message; that is local and cheap.
+    """
+
+    NAMESPACE = "chat_history"
+
+    def __init__(self, provider, store: StateStore = state_store, ttl_seconds: int = SETTINGS.CHAT_STATE_TTL_SECONDS):
         self.provider = provider
-        self.sessions: dict[str,ChatSession] = {}   # patient_id → session object
-        self.lock = Lock()
+        self.store = store
+        self.ttl_seconds = ttl_seconds
 
-    def get_or_create_session(self, patient_id: str):
+    def get_or_create_session(self, patient_id: str) -> "ChatSession":
         """
         Gets a session or creates one if it doesn't exist.
         It no longer needs the system_instruction.
         """
-        with self.lock:
-            if patient_id not in self.sessions:
-                self.sessions[patient_id] = self.provider.start_session()
-            return self.sessions[patient_id]
+        with timing.phase("ai_history_load"):
+            history = self.store.get(self.NAMESPACE, patient_id)
+        metrics.CHAT_HISTORY_LOOKUPS.labels("miss" if history is None else "hit").inc()
+        return self.provider.start_session(history=history)
+
+    def save_session(self, patient_id: str, session) -> None:
+        """Persists the session's history so the next message (on any worker) continues it."""
+        with timing.phase("ai_history_save"):
+            self.store.set(self.NAMESPACE, patient_id, self.provider.dump_history(session), ttl_seconds=self.ttl_seconds)
 
     def send_message(self, patient_id: str, message: str) -> str:
         """
         Sends a message to the correct session.
         """
         session = self.get_or_create_session(patient_id)
-        return self.provider.send_message(session, message)
\ No newline at end of file
+        start = time.perf_counter()
+        span_attributes = {
+            "gen_ai.system": type(self.provider).__name__,
+            "gen_ai.request.model": self.provider.model_name or "",
+        }
+        with timing.phase("ai_provider"), \
+                tracing.span("ai.send_message", kind=SpanKind.CLIENT, attributes=span_attributes):
+            reply = self.provider.send_message(session, message)
+            tracing.set_attributes({"tebnegar.ai.fallback_reply": reply == self.provider.FALLBACK_REPLY})
+        metrics.observe_ai_call(
+            type(self.provider).__name__, self.provider.model_name, time.perf_counter() - start,
+            error=reply == self.provider.FALLBACK_REPLY,
+        )
+        self.save_session(patient_id, session)
+        return reply
+
+
+def append_exchange(
+    patient_id: str,
+    message: str,
+    reply: str,
+    store: StateStore = state_store,
+    ttl_seconds: int = SETTINGS.CHAT_STATE_TTL_SECONDS,
+) -> None:
+    """
+    Appends a message and a reply that did not come from the provider to the
+    saved history, in the `{"role", "parts"}` form `dump_history` writes. Needs
+    no provider, so it doesn't set one up.
+    """
+    with timing.phase("ai_history_save"):
+        history = store.get(SessionManager.NAMESPACE, patient_id) or []
+        history += [{"role": "user", "parts": [message]}, {"role": "model", "parts": [reply]}]
+        store.set(SessionManager.NAMESPACE, patient_id, history, ttl_seconds=ttl_seconds)
\ No newline at end of file
@@ -0,0 +1,282 @@
+"""
+Tiered archival of idle conversations.
+
+Conversations with no activity for `ARCHIVE_IDLE_DAYS` have their messages,
+AI analyses and feedback moved out of the hot tables into append-only segment
+files under `ARCHIVE_DIR`. Each conversation is one zstd frame holding a
+single JSON line, so a segment is also a valid `.jsonl.zst` file. The
+`archived_conversations` table indexes every frame by conversation id; the
+conversation row itself stays in place so listings keep working.
+
+    python -m services.archive run [--idle-days N]
+"""
+
+import argparse
+import fcntl
+import json
+import logging
+import os
+import threading
+import uuid
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import zstandard
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+
+from config import SETTINGS
+from db import attribution
+from db.session import SessionLocal
+from db.model.session import Session as SessionModel
+from db.model.conversation import Conversation
+from db.model.message import Message
+from db.model.ai_analysis import AIAnalysis
+from db.model.response_feedback import ResponseFeedback, FeedbackType
+from db.model.archived_conversation import ArchivedConversation
+
+logger = logging.getLogger(__name__)
+
+_ANALYSIS_FIELDS = ["potential_conditions", "criticality_flag", "processing_time_ms", "ai_provider", "ai_model", "is_error", "token_usage",
+                   "urgency", "recommended_specialty"]
+
+
+def _iso(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+
+def _parse_dt(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+class ConversationArchive:
+    def __init__(
+        self,
+        archive_dir: str = SETTINGS.ARCHIVE_DIR,
+        segment_max_bytes: int = SETTINGS.ARCHIVE_SEGMENT_MAX_MB * 1024 * 1024,
+    ):
+        self.archive_dir = archive_dir
+        self.segment_max_bytes = segment_max_bytes
+        self._write_lock = threading.Lock()  # one appender per process; see `_append_frame` for others
+        self._compressor = zstandard.ZstdCompressor(level=10)
+        self._decompressor = zstandard.ZstdDecompressor()
+
+    # ---- Segment files ----
+
+    def _segment_path(self, segment: str) -> str:
+        return os.path.join(self.archive_dir, os.path.basename(segment))
+
+    def _current_segment(self) -> str:
+        os.makedirs(self.archive_dir, exist_ok=True)
+        segments = sorted(n for n in os.listdir(self.archive_dir) if n.startswith("segment-") and n.endswith(".jsonl.zst"))
+        if segments:
+            latest = segments[-1]
+            if os.path.getsize(self._segment_path(latest)) < self.segment_max_bytes:
+                return latest
+            number = int(latest[len("segment-"):-len(".jsonl.zst")]) + 1
+        else:
+            number = 1
+        return f"segment-{number:06d}.jsonl.zst"
+
+    def _append_frame(self, document: Dict[str, Any]) -> tuple:
+        """
+        Appends one compressed JSON line and returns (segment, offset, length).
+        The segment file is locked from seek to fsync, so appenders in other
+        processes (gunicorn workers, the CLI) cannot interleave with the offset.
+        """
+        frame = self._compressor.compress((json.dumps(document, ensure_ascii=False) + "\n").encode("utf-8"))
+        segment = self._current_segment()
+        with open(self._segment_path(segment), "ab") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                offset = f.seek(0, os.SEEK_END)
+                f.write(frame)
+                f.flush()
+                os.fsync(f.fileno())
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        return segment, offset, len(frame)
+
+    def read_frame(self, entry: ArchivedConversation) -> Dict[str, Any]:
+        with open(self._segment_path(entry.segment), "rb") as f:  # type: ignore
+            f.seek(entry.frame_offset)  # type: ignore
+            frame = f.read(entry.frame_length)  # type: ignore
+        return json.loads(self._decompressor.decompress(frame))
+
+    # ---- Archiving ----
+
+    def _snapshot_messages(self, db: Session, conversation_id: uuid.UUID) -> Tuple[List[Dict[str, Any]], Dict[str, list]]:
+        """
+        The conversation's hot messages as archive documents, and the ids of the
+        message, analysis and feedback rows they were built from.
+        """
+        rows = db.execute(
+            select(Message, AIAnalysis, ResponseFeedback)
+            .outerjoin(AIAnalysis, AIAnalysis.message_id == Message.id)
+            .outerjoin(ResponseFeedback, ResponseFeedback.message_id == Message.id)
+            .where(Message.conversation_id == conversation_id)
+            .order_by(Message.created_at, Message.id)
+        ).all()
+        messages = []
+        ids: Dict[str, list] = {"messages": [], "analyses": [], "feedback": []}
+        for message, analysis, feedback in rows:
+            ids["messages"].append(message.id)
+            if analysis is not None:
+                ids["analyses"].append(analysis.id)
+            if feedback is not None:
+                ids["feedback"].append(feedback.id)
+            messages.append({
+                "id": str(message.id),
+                "sender_type": message.sender_type.value,
+                "content": message.content,
+                "created_at": _iso(message.created_at),  # type: ignore
+                "ai_analysis": None if analysis is None else {f: getattr(analysis, f) for f in _ANALYSIS_FIELDS},
+                "feedback": None if feedback is None else {
+                    "feedback_type": feedback.feedback_type.value,
+                    "comment": feedback.comment,
+                    "created_at": _iso(feedback.created_at),  # type: ignore
+                },
+            })
+        return messages, ids
+
+    def archive_conversation(self, db: Session, conversation: Conversation) -> Optional[ArchivedConversation]:
+        """
+        Moves one conversation's hot rows into the archive. Messages added after
+        an earlier archival are merged into a new frame that supersedes the old one.
+        """
+        messages, snapshot_ids = self._snapshot_messages(db, conversation.id)  # type: ignore
+        if not messages:
+            return None
+
+        entry = db.get(ArchivedConversation, conversation.id)
+        if entry is not None:
+            messages = self.read_frame(entry)["messages"] + messages
+
+        document = {
+            "conversation_id": str(conversation.id),
+            "session_id": str(conversation.session_id),
+            "title": conversation.title,
+            "created_at": _iso(conversation.created_at),  # type: ignore
+            "messages": messages,
+        }
+        with self._write_lock:
+            segment, offset, length = self._append_frame(document)
+
+        if entry is None:
+            entry = ArchivedConversation(conversation_id=conversation.id)
+            db.add(entry)
+        entry.segment = segment  # type: ignore
+        entry.frame_offset = offset  # type: ignore
+        entry.frame_length = length  # type: ignore
+        entry.message_count = len(messages)  # type: ignore
+        entry.like_count = sum(1 for m in messages if (m["feedback"] or {}).get("feedback_type") == FeedbackType.LIKE.value)  # type: ignore
+        entry.dislike_count = sum(1 for m in messages if (m["feedback"] or {}).get("feedback_type") == FeedbackType.DISLIKE.value)  # type: ignore
+        entry.last_message_at = _parse_dt(messages[-1]["created_at"])  # type: ignore
+        entry.archived_at = datetime.now(timezone.utc)  # type: ignore
+
+        # Only the rows in the snapshot: a message (or feedback) written since then
+        # stays hot and goes out with the next archival.
+        db.execute(delete(AIAnalysis).where(AIAnalysis.id.in_(snapshot_ids["analyses"])))
+        db.execute(delete(ResponseFeedback).where(ResponseFeedback.id.in_(snapshot_ids["feedback"])))
+        db.execute(delete(Message).where(Message.id.in_(snapshot_ids["messages"])))
+        db.commit()
+        return entry
+
+    def archive_idle(self, db: Session, *, idle_days: int = SETTINGS.ARCHIVE_IDLE_DAYS, batch_size: int = 100) -> int:
+        """
+        Archives every conversation whose last message is older than `idle_days`.
+        Returns the number of conversations archived.
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(days=idle_days)
+        last_activity = (
+            select(Message.conversation_id)
+            .group_by(Message.conversation_id)
+            .having(func.max(Message.created_at) < cutoff)
+        )
+        archived = 0
+        while True:
+            ids = db.scalars(last_activity.limit(batch_size)).all()
+            if not ids:
+                return archived
+            for conversation in db.scalars(select(Conversation).where(Conversation.id.in_(ids))).all():
+                try:
+                    if self.archive_conversation(db, conversation):
+                        archived += 1
+                except Exception:
+                    db.rollback()
+                    logger.exception("Failed to archive conversation %s", conversation.id)
+                    return archived
+
+    # ---- Reading ----
+
+    def get_entry(self, db: Session, conversation_id: uuid.UUID) -> Optional[ArchivedConversation]:
+        return db.get(ArchivedConversation, conversation_id)
+
+    def get_messages(self, db: Session, conversation_id: uuid.UUID) -> List[Dict[str, Any]]:
+        """Archived messages of a conversation (empty if it was never archived)."""
+        entry = self.get_entry(db, conversation_id)
+        if entry is None:
+            return []
+        messages = self.read_frame(entry)["messages"]
+        for m in messages:
+            m["created_at"] = _parse_dt(m["created_at"])
+        return messages
+
+    def attribution_deltas(self, db: Session, *, since: Optional[date] = None) -> attribution.CubeDeltas:
+        """
+        Attribution cube cells for the archived messages and feedback, by the day
+        each was created (from `since` on), for `attribution.backfill`.
+        """
+        deltas: attribution.CubeDeltas = defaultdict(lambda: defaultdict(int))
+        rows = db.execute(
+            select(ArchivedConversation, SessionModel.utm_source, SessionModel.utm_medium, SessionModel.utm_campaign)
+            .join(Conversation, Conversation.id == ArchivedConversation.conversation_id)
+            .join(SessionModel, SessionModel.id == Conversation.session_id)
+            .order_by(ArchivedConversation.segment, ArchivedConversation.frame_offset)
+        )
+        for entry, *utm in rows:
+            if since is not None and entry.archived_at is not None and entry.archived_at.date() < since:
+                continue  # everything in the frame happened before it was archived
+            for message in self.read_frame(entry)["messages"]:
+                counted = [("messages", message["created_at"])]
+                if message["feedback"]:
+                    counted.append((attribution.feedback_column(message["feedback"]["feedback_type"]), message["feedback"]["created_at"]))
+                for metric, created_at in counted:
+                    day = datetime.fromisoformat(created_at).date() if created_at else None
+                    if day is not None and (since is None or day >= since):
+                        deltas[(day, attribution.utm_key(*utm))][metric] += 1
+        return deltas
+
+    def search(self, db: Session, *, keyword: str) -> Iterator[uuid.UUID]:
+        """
+        Yields ids of archived conversations with a message containing `keyword`
+        (case-insensitive). Reads frames on demand, in segment order.
+        """
+        needle = keyword.casefold()
+        entries = db.scalars(
+            select(ArchivedConversation).order_by(ArchivedConversation.segment, ArchivedConversation.frame_offset)
+        )
+        for entry in entries:
+            document = self.read_frame(entry)
+            if any(needle in m["content"].casefold() for m in document["messages"]):
+                yield entry.conversation_id  # type: ignore
+
+
+conversation_archive = ConversationArchive()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m services.archive")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run_cmd = sub.add_parser("run", help="Archive idle conversations")
+    run_cmd.add_argument("--idle-days", type=int, default=SETTINGS.ARCHIVE_IDLE_DAYS)
+    args = parser.parse_args(argv)
+
+    with SessionLocal() as db:
+        count = conversation_archive.archive_idle(db, idle_days=args.idle_days)
+    print(f"Archived {count} conversations.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""
+Consistent, compressed online backups of the application database.
+
+Snapshots are taken in a background thread: SQLite copies the database with
+`VACUUM INTO` inside one read transaction (`db.session` puts the database in
+WAL mode, so writers carry on meanwhile, and the copy never restarts however
+busy they are), PostgreSQL streams `pg_dump`.
+A snapshot still running after `BACKUP_TIMEOUT_SECONDS` is aborted. Either
+way the output is gzip-compressed into `BACKUP_DIR`, and only the newest
+`BACKUP_KEEP` snapshots are kept.
+`iter_changes` produces an incremental export of rows created since a point
+in time.
+"""
+
+import fcntl
+import gzip
+import json
+import logging
+import os
+import re
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Iterator, List, Optional
+
+from sqlalchemy import select
+
+from config import SETTINGS
+from db.session import engine, SessionLocal
+from db.model.user import User
+from db.model.session import Session as SessionModel
+from db.model.conversation import Conversation
+from db.model.message import Message
+from db.model.ai_analysis import AIAnalysis
+from db.model.response_feedback import ResponseFeedback
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_NAME_RE = re.compile(r"^tebnegar-\d{8}T\d{6}Z\.(db|dump)\.gz$")
+
+# SQLite virtual machine instructions between checks of the snapshot deadline.
+SQLITE_PROGRESS_INTERVAL = 10000
+
+
+@dataclass
+class SnapshotInfo:
+    name: str
+    size_bytes: int
+    created_at: datetime
+
+
+class BackupManager:
+    def __init__(
+        self,
+        backup_dir: str = SETTINGS.BACKUP_DIR,
+        keep: int = SETTINGS.BACKUP_KEEP,
+        timeout_seconds: float = SETTINGS.BACKUP_TIMEOUT_SECONDS,
+        download_max_age_seconds: float = SETTINGS.BACKUP_DOWNLOAD_MAX_AGE_SECONDS,
+    ):
+        self.backup_dir = backup_dir
+        self.keep = keep
+        self.timeout_seconds = timeout_seconds
+        self.download_max_age_seconds = download_max_age_seconds
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.last_error: Optional[str] = None
+
+        self._scheduler: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._scheduler_lock_file = None
+
+    # ---- Snapshots ----
+
+    @property
+    def in_progress(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start_snapshot(self) -> bool:
+        """Starts a snapshot in a background thread. Returns False if one is already running."""
+        with self._lock:
+            if self.in_progress:
+                return False
+            self._thread = threading.Thread(target=self._snapshot_quietly, name="db-backup", daemon=True)
+            self._thread.start()
+            return True
+
+    def _snapshot_quietly(self) -> None:
+        try:
+            self.take_snapshot()
+        except Exception:
+            # Surfaced through `last_error` / the snapshot listing.
+            pass
+
+    def take_snapshot(self) -> SnapshotInfo:
+        """Takes a consistent, gzip-compressed snapshot synchronously and applies rotation."""
+        os.makedirs(self.backup_dir, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        dialect = engine.dialect.name
+        name = f"tebnegar-{stamp}.{'db' if dialect == 'sqlite' else 'dump'}.gz"
+        final_path = os.path.join(self.backup_dir, name)
+        partial_path = final_path + ".partial"
+
+        try:
+            if dialect == "sqlite":
+                self._snapshot_sqlite(partial_path)
+            elif dialect == "postgresql":
+                self._snapshot_postgres(partial_path)
+            else:
+                raise RuntimeError(f"Backups are not supported for the '{dialect}' dialect.")
+            os.replace(partial_path, final_path)
+        except Exception as e:
+            self.last_error = f"{type(e).__name__}: {e}"
+            metrics.ERRORS.labels("backup").inc()
+            logger.exception("Database snapshot failed")
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            raise
+
+        self.last_error = None
+        self._rotate()
+        return self._info(name)
+
+    def recent_snapshot(self) -> SnapshotInfo:
+        """
+        The newest snapshot if it is less than `download_max_age_seconds` old,
+        else a new one (taken synchronously).
+        """
+        snapshots = self.list_snapshots()
+        if snapshots and (datetime.now(timezone.utc) - snapshots[0].created_at).total_seconds() < self.download_max_age_seconds:
+            return snapshots[0]
+        return self.take_snapshot()
+
+    def _snapshot_sqlite(self, out_path: str) -> None:
+        source = sqlite3.connect(engine.url.database)  # type: ignore
+        copy_dir = tempfile.mkdtemp(dir=self.backup_dir)
+        copy_path = os.path.join(copy_dir, "snapshot.db")
+        deadline = time.monotonic() + self.timeout_seconds
+        # A non-zero return interrupts the statement.
+        source.set_progress_handler(lambda: time.monotonic() > deadline, SQLITE_PROGRESS_INTERVAL)
+        try:
+            # One read transaction from start to end, so the copy is consistent and,
+            # unlike a stepwise backup, is not restarted by concurrent writes.
+            try:
+                source.execute("VACUUM INTO ?", (copy_path,))
+            except sqlite3.OperationalError as e:
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"Snapshot did not finish within {self.timeout_seconds}s") from e
+                raise
+            with open(copy_path, "rb") as src, gzip.open(out_path, "wb", compresslevel=6) as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+        finally:
+            source.close()
+            shutil.rmtree(copy_dir, ignore_errors=True)
+
+    def _snapshot_postgres(self, out_path: str) -> None:
+        url = engine.url.set(drivername="postgresql")
+        process = subprocess.Popen(
+            ["pg_dump", "--format=plain", "--no-owner", url.render_as_string(hide_password=False)],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        timed_out = threading.Event()
+
+        def kill():
+            timed_out.set()
+            process.kill()
+
+        timer = threading.Timer(self.timeout_seconds, kill)
+        timer.start()
+        try:
+            with gzip.open(out_path, "wb", compresslevel=6) as dst:
+                shutil.copyfileobj(process.stdout, dst, 1024 * 1024)  # type: ignore
+            _, stderr = process.communicate()
+        finally:
+            timer.cancel()
+        if timed_out.is_set():
+            raise TimeoutError(f"pg_dump did not finish within {self.timeout_seconds}s")
+        if process.returncode != 0:
+            raise RuntimeError(f"pg_dump failed: {stderr.decode(errors='replace').strip()}")
+
+    def _rotate(self) -> None:
+        for old in self.list_snapshots()[self.keep:]:
+            os.remove(os.path.join(self.backup_dir, old.name))
+
+    def _info(self, name: str) -> SnapshotInfo:
+        stat = os.stat(os.path.join(self.backup_dir, name))
+        return SnapshotInfo(
+            name=name,
+            size_bytes=stat.st_size,
+            created_at=datetime.strptime(name.split("-")[1].split(".")[0], "%Y%m%dT%H%M%SZ").replace(tzinfo=timezone.utc),
+        )
+
+    def list_snapshots(self) -> List[SnapshotInfo]:
+        """Finished snapshots, newest first."""
+        if not os.path.isdir(self.backup_dir):
+            return []
+        names = [n for n in os.listdir(self.backup_dir) if SNAPSHOT_NAME_RE.match(n)]
+        return [self._info(n) for n in sorted(names, reverse=True)]
+
+    def snapshot_path(self, name: str) -> Optional[str]:
+        """Resolves a snapshot name to its path, rejecting anything that isn't one."""
+        if not SNAPSHOT_NAME_RE.match(name):
+            return None
+        path = os.path.join(self.backup_dir, name)
+        return path if os.path.isfile(path) else None
+
+    # ---- Scheduling ----
+
+    def _owns_schedule(self) -> bool:
+        """
+        With several worker processes, each one runs a scheduler but only the
+        holder of an exclusive lock on `BACKUP_DIR/.scheduler.lock` takes
+        snapshots. If that worker exits, another picks the lock up on its next tick.
+        """
+        if self._scheduler_lock_file is not None:
+            return True
+        os.makedirs(self.backup_dir, exist_ok=True)
+        lock_file = open(os.path.join(self.backup_dir, ".scheduler.lock"), "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._scheduler_lock_file = lock_file
+        return True
+
+    def start_schedule(self, interval_minutes: int = SETTINGS.BACKUP_INTERVAL_MINUTES) -> None:
+        """Takes a snapshot every `interval_minutes` (no-op when 0)."""
+        if interval_minutes <= 0 or (self._scheduler and self._scheduler.is_alive()):
+            return
+        self._stopping.clear()
+
+        def run():
+            while not self._stopping.wait(interval_minutes * 60):
+                if self._owns_schedule():
+                    self.start_snapshot()
+
+        self._scheduler = threading.Thread(target=run, name="db-backup-scheduler", daemon=True)
+        self._scheduler.start()
+
+    def stop_schedule(self) -> None:
+        self._stopping.set()
+        if self._scheduler_lock_file is not None:
+            self._scheduler_lock_file.close()  # releases the lock
+            self._scheduler_lock_file = None
+
+
+# Incremental export sources: (name, statement, column that marks a row as new).
+_users, _sessions, _conversations = User.__table__, SessionModel.__table__, Conversation.__table__
+_messages, _analyses, _feedback = Message.__table__, AIAnalysis.__table__, ResponseFeedback.__table__
+CHANGE_SOURCES = [
+    ("users", select(_users), _users.c.updated_at),
+    ("sessions", select(_sessions), _sessions.c.started_at),
+    ("conversations", select(_conversations), _conversations.c.created_at),
+    ("messages", select(_messages), _messages.c.created_at),
+    ("ai_analyses", select(_analyses).join(_messages, _messages.c.id == _analyses.c.message_id), _messages.c.created_at),
+    ("response_feedback", select(_feedback), _feedback.c.created_at),
+]
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def iter_changes(since: datetime, *, batch_size: int = 1000) -> Iterator[bytes]:
+    """
+    Streams rows created (users: updated) at or after `since` as gzip-compressed
+    NDJSON lines of `{"table": ..., "row": {...}}`; AI analyses follow their
+    messages. Owns its DB session so it can outlive the request.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip container
+    db = SessionLocal()
+    try:
+        for table_name, stmt, marker in CHANGE_SOURCES:
+            stmt = stmt.where(marker >= since).execution_options(stream_results=True, yield_per=batch_size)
+            for partition in db.execute(stmt).mappings().partitions():
+                lines = "".join(
+                    json.dumps({"table": table_name, "row": dict(row)}, ensure_ascii=False, default=_json_default) + "\n"
+                    for row in partition
+                )
+                chunk = compressor.compress(lines.encode("utf-8"))
+                if chunk:
+                    yield chunk
+        yield compressor.flush()
+    finally:
+        db.close()
+
+
+backup_manager = BackupManager()
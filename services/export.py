@@ -0,0 +1,161 @@
+"""
+Streaming encoders for the admin conversation export.
+
+Each encoder consumes batches of flat rows (see `repository.export.EXPORT_COLUMNS`)
+and yields encoded byte chunks as it goes, so nothing holds more than one
+batch in memory.
+"""
+
+import csv
+import enum
+import io
+import json
+import uuid
+from datetime import datetime
+from typing import Any, Iterable, Iterator, List
+
+from repository.export import EXPORT_COLUMNS
+
+_CONVERSATION_FIELDS = EXPORT_COLUMNS[:4]
+_MESSAGE_FIELDS = EXPORT_COLUMNS[4:]
+
+
+class ExportFormat(str, enum.Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+    PARQUET = "parquet"
+
+
+MEDIA_TYPES = {
+    ExportFormat.NDJSON: "application/x-ndjson",
+    ExportFormat.CSV: "text/csv; charset=utf-8",
+    ExportFormat.PARQUET: "application/vnd.apache.parquet",
+}
+
+
+def _plain(value: Any) -> Any:
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.value
+    return value
+
+
+def encode_ndjson(batches: Iterable[List[tuple]]) -> Iterator[bytes]:
+    """
+    One JSON object per conversation, with its messages nested. Relies on the
+    rows of a conversation being contiguous.
+    """
+    current = None
+    for batch in batches:
+        out = []
+        for row in batch:
+            values = [_plain(v) for v in row]
+            if current is None or current["conversation_id"] != values[0]:
+                if current is not None:
+                    out.append(json.dumps(current, ensure_ascii=False))
+                current = dict(zip(_CONVERSATION_FIELDS, values[:4]), messages=[])
+            current["messages"].append(dict(zip(_MESSAGE_FIELDS, values[4:])))
+        if out:
+            yield ("\n".join(out) + "\n").encode("utf-8")
+    if current is not None:
+        yield (json.dumps(current, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def encode_csv(batches: Iterable[List[tuple]]) -> Iterator[bytes]:
+    """One CSV line per message. JSON columns are written as JSON text."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM so spreadsheet apps detect UTF-8 (Persian text).
+    writer.writerow(EXPORT_COLUMNS)
+    yield ("\ufeff" + buffer.getvalue()).encode("utf-8")
+    for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        for row in batch:
+            writer.writerow([
+                json.dumps(v, ensure_ascii=False) if isinstance(v, (dict, list)) else _plain(v)
+                for v in row
+            ])
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _DrainableSink(io.RawIOBase):
+    """Write-only file object whose contents are handed out and dropped on `drain`."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+def encode_parquet(batches: Iterable[List[tuple]]) -> Iterator[bytes]:
+    """One Parquet row group per batch, streamed as it is written. Needs pyarrow."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("conversation_id", pa.string()),
+        ("session_id", pa.string()),
+        ("conversation_title", pa.string()),
+        ("conversation_created_at", pa.string()),
+        ("message_id", pa.string()),
+        ("sender_type", pa.string()),
+        ("content", pa.string()),
+        ("message_created_at", pa.string()),
+        ("criticality_flag", pa.bool_()),
+        ("potential_conditions", pa.string()),
+        ("processing_time_ms", pa.int64()),
+        ("ai_provider", pa.string()),
+        ("ai_model", pa.string()),
+        ("is_error", pa.bool_()),
+        ("token_usage", pa.string()),
+        ("feedback_type", pa.string()),
+        ("feedback_comment", pa.string()),
+        ("feedback_created_at", pa.string()),
+    ])
+    json_columns = {EXPORT_COLUMNS.index("potential_conditions"), EXPORT_COLUMNS.index("token_usage")}
+
+    sink = _DrainableSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        for batch in batches:
+            columns = [list(col) for col in zip(*batch)] if batch else [[] for _ in EXPORT_COLUMNS]
+            for i, col in enumerate(columns):
+                if i in json_columns:
+                    columns[i] = [None if v is None else json.dumps(v, ensure_ascii=False) for v in col]
+                else:
+                    columns[i] = [_plain(v) for v in col]
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(col, type=field.type) for col, field in zip(columns, schema)], schema=schema
+            ))
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+ENCODERS = {
+    ExportFormat.NDJSON: encode_ndjson,
+    ExportFormat.CSV: encode_csv,
+    ExportFormat.PARQUET: encode_parquet,
+}
@@ -0,0 +1,376 @@
+"""
+Background structured extraction from AI replies.
+
+After a reply is saved, `post_user_message` hands its message id to
+`extraction_pipeline.submit`. Worker threads collect ids into batches of up
+to `EXTRACTION_BATCH_SIZE` (waiting at most `EXTRACTION_BATCH_WAIT_MS` for a
+partial one to fill), ask the provider once per batch for each reply's
+potential conditions, urgency and recommended specialty, and write the
+results to the reply's `AIAnalysis` row in one transaction, setting
+`extracted_at`. The reply itself never waits on any of this.
+
+The queue is bounded (`EXTRACTION_QUEUE_MAX`): when it is full, or the
+pipeline isn't running (scripts, `EXTRACTION_ENABLED=false`), or a batch
+still fails after `EXTRACTION_MAX_ATTEMPTS`, the row simply keeps a NULL
+`extracted_at` and the backfill command picks it up later, as does the
+`extraction_backfill` job (services/tasks.py) if it is enabled in
+`JOBS_PERIODIC`. Every failed batch counts against its replies'
+`extraction_failures`; after `EXTRACTION_MAX_FAILURES` a reply is left
+alone until asked for explicitly:
+
+    python -m services.extraction backfill                  # every reply not extracted yet
+    python -m services.extraction backfill --retry-failed   # including ones that kept failing
+    python -m services.extraction backfill --all --since 2026-10-01  # re-run, e.g. after a prompt change
+"""
+
+import argparse
+import json
+import logging
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import bindparam, or_, select, update
+
+from config import SETTINGS
+from db.session import SessionLocal
+from db.model.ai_analysis import AIAnalysis
+from db.model.message import Message
+from services import metrics
+from services.ai.ai_manager import ai_manager
+
+logger = logging.getLogger(__name__)
+
+URGENCY_LEVELS = ("emergency", "urgent", "routine", "self_care")
+
+MAX_CONDITIONS = 5
+MAX_REPLY_CHARS = 4000  # longer replies are cut; the conditions come early in them
+
+PROMPT = """You extract structured data from replies a medical assistant gave to patients.
+The replies may be in Persian or English; answer in English.
+
+For each reply return an object with:
+- "id": the reply's id, as given
+- "conditions": possible conditions or diagnoses the reply mentions, lower case, at most {max_conditions}; [] if none
+- "urgency": how soon the patient should get care according to the reply, one of {urgency_levels}
+- "specialty": the medical specialty the patient should see (e.g. "cardiology", "general practice"), or null
+
+Return only a JSON array with one object per reply.
+
+Replies:
+{replies}"""
+
+
+def build_prompt(replies: List[Tuple[int, str]]) -> str:
+    """`replies` are (id, text) pairs; short integer ids keep the prompt and the answer small."""
+    items = [{"id": i, "reply": text[:MAX_REPLY_CHARS]} for i, text in replies]
+    return PROMPT.format(
+        max_conditions=MAX_CONDITIONS,
+        urgency_levels=", ".join(f'"{u}"' for u in URGENCY_LEVELS),
+        replies=json.dumps(items, ensure_ascii=False, indent=1),
+    )
+
+
+def parse_results(data: Any, count: int) -> Dict[int, Dict[str, Any]]:
+    """
+    Validated results by reply index. Malformed fields are dropped rather than
+    failing the batch; a reply the model left out is simply missing.
+    """
+    if isinstance(data, dict) and isinstance(data.get("results"), list):
+        data = data["results"]
+    if not isinstance(data, list):
+        raise ValueError(f"Expected a JSON array, got {type(data).__name__}")
+
+    results: Dict[int, Dict[str, Any]] = {}
+    for item in data:
+        if not isinstance(item, dict):
+            continue
+        index = item.get("id")
+        if not isinstance(index, int) or not 0 <= index < count:
+            continue
+        conditions = []
+        for condition in item.get("conditions") or []:
+            if isinstance(condition, str) and condition.strip():
+                condition = condition.strip().lower()[:100]
+                if condition not in conditions:
+                    conditions.append(condition)
+        urgency = item.get("urgency")
+        specialty = item.get("specialty")
+        results[index] = {
+            "potential_conditions": conditions[:MAX_CONDITIONS],
+            "urgency": urgency if urgency in URGENCY_LEVELS else None,
+            "recommended_specialty": specialty.strip().lower()[:100] if isinstance(specialty, str) and specialty.strip() else None,
+        }
+    return results
+
+
+class ExtractionPipeline:
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        *,
+        workers: int = SETTINGS.EXTRACTION_WORKERS,
+        batch_size: int = SETTINGS.EXTRACTION_BATCH_SIZE,
+        batch_wait_ms: int = SETTINGS.EXTRACTION_BATCH_WAIT_MS,
+        queue_max: int = SETTINGS.EXTRACTION_QUEUE_MAX,
+        max_attempts: int = SETTINGS.EXTRACTION_MAX_ATTEMPTS,
+        max_failures: int = SETTINGS.EXTRACTION_MAX_FAILURES,
+    ):
+        self._session_factory = session_factory
+        self.workers = workers
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait_ms / 1000
+        self.max_attempts = max_attempts
+        self.max_failures = max_failures
+
+        self._queue: "queue.Queue[uuid.UUID]" = queue.Queue(maxsize=queue_max)
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    # ---- Lifecycle ----
+
+    @property
+    def running(self) -> bool:
+        return any(t.is_alive() for t in self._threads)
+
+    def start(self) -> None:
+        """Starts the worker threads (idempotent)."""
+        if self.running or self.workers < 1:
+            return
+        self._stopping.clear()
+        self._threads = [
+            threading.Thread(target=self._run, name=f"extraction-{i}", daemon=True) for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """
+        Stops the workers. Queued replies are not drained (that would hold up
+        shutdown on provider calls); they stay pending for the backfill.
+        """
+        self._stopping.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    # ---- Producer ----
+
+    def submit(self, message_id: uuid.UUID) -> bool:
+        """Queues an AI reply for extraction; False if it was left for the backfill instead."""
+        if not self.running:
+            return False
+        try:
+            self._queue.put_nowait(message_id)
+        except queue.Full:
+            metrics.EXTRACTION_DROPPED.inc()
+            return False
+        metrics.EXTRACTION_QUEUED.set(self._queue.qsize())
+        return True
+
+    # ---- Workers ----
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            batch = self._next_batch()
+            metrics.EXTRACTION_QUEUED.set(self._queue.qsize())
+            if batch:
+                try:
+                    self.process(batch)
+                except Exception:
+                    # The rows stay pending for the backfill.
+                    metrics.ERRORS.labels("extraction").inc()
+                    logger.exception("Extraction of %d replies failed", len(batch))
+
+    def _next_batch(self) -> List[uuid.UUID]:
+        try:
+            batch = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stopping.is_set():
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    # ---- Extraction ----
+
+    def process(self, message_ids: List[uuid.UUID]) -> int:
+        """
+        Extracts and stores results for the given AI replies, retrying the
+        provider call with exponential backoff. Returns the number of rows updated.
+        Replies without a result (the batch failed, or the model left them out)
+        have their `extraction_failures` incremented.
+        """
+        db = self._session_factory()
+        try:
+            rows = db.execute(
+                select(AIAnalysis.id, Message.content)
+                .join(Message, Message.id == AIAnalysis.message_id)
+                .where(AIAnalysis.message_id.in_(message_ids))
+            ).all()
+        finally:
+            db.close()
+        if not rows:
+            return 0
+
+        prompt = build_prompt([(i, row.content) for i, row in enumerate(rows)])
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                results = parse_results(ai_manager.generate_json(prompt), len(rows))
+                break
+            except Exception:
+                if attempt == self.max_attempts:
+                    metrics.EXTRACTION_BATCHES.labels("failed").inc()
+                    self._count_failures([row.id for row in rows])
+                    raise
+                metrics.EXTRACTION_BATCHES.labels("retried").inc()
+                # 1s, 2s, 4s, ...; cut short on shutdown (not counted as a failure).
+                if self._stopping.wait(2 ** (attempt - 1)):
+                    raise
+
+        now = datetime.now(timezone.utc)
+        params = [
+            {"b_id": rows[i].id, "b_extracted_at": now, **{f"b_{k}": v for k, v in values.items()}}
+            for i, values in results.items()
+        ]
+        if params:
+            table = AIAnalysis.__table__
+            db = self._session_factory()
+            try:
+                db.execute(
+                    update(table)
+                    .where(table.c.id == bindparam("b_id"))
+                    .values(
+                        potential_conditions=bindparam("b_potential_conditions"),
+                        urgency=bindparam("b_urgency"),
+                        recommended_specialty=bindparam("b_recommended_specialty"),
+                        extracted_at=bindparam("b_extracted_at"),
+                    ),
+                    params,
+                )
+                db.commit()
+            finally:
+                db.close()
+        if len(params) < len(rows):
+            logger.info("Extraction returned %d of %d replies; the rest stay pending", len(params), len(rows))
+            self._count_failures([row.id for i, row in enumerate(rows) if i not in results])
+        metrics.EXTRACTION_BATCHES.labels("ok").inc()
+        return len(params)
+
+    def _count_failures(self, analysis_ids: List[uuid.UUID]) -> None:
+        db = self._session_factory()
+        try:
+            db.execute(
+                update(AIAnalysis)
+                .where(AIAnalysis.id.in_(analysis_ids))
+                .values(extraction_failures=AIAnalysis.extraction_failures + 1)
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    # ---- Backfill ----
+
+    def pending_batches(
+        self,
+        *,
+        include_done: bool = False,
+        include_failed: bool = False,
+        since: Optional[datetime] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[List[uuid.UUID]]:
+        """
+        Message ids of AI replies to (re-)extract, in batches. Keyset-paginated,
+        so replies failing in this run are not fetched again and again; replies
+        that failed `max_failures` times before are skipped unless
+        `include_failed`. Fallback replies and emergency guidance (no provider
+        output) are skipped.
+        """
+        last_id = None
+        yielded = 0
+        while limit is None or yielded < limit:
+            size = self.batch_size if limit is None else min(self.batch_size, limit - yielded)
+            query = (
+                select(AIAnalysis.id, AIAnalysis.message_id)
+                .where(
+                    AIAnalysis.is_error.isnot(True),
+                    or_(AIAnalysis.ai_provider.is_(None), AIAnalysis.ai_provider != "triage"),
+                )
+                .order_by(AIAnalysis.id)
+                .limit(size)
+            )
+            if not include_done:
+                query = query.where(AIAnalysis.extracted_at.is_(None))
+                if not include_failed:
+                    query = query.where(AIAnalysis.extraction_failures < self.max_failures)
+            if since is not None:
+                query = query.join(Message, Message.id == AIAnalysis.message_id).where(Message.created_at >= since)
+            if last_id is not None:
+                query = query.where(AIAnalysis.id > last_id)
+            db = self._session_factory()
+            try:
+                rows = db.execute(query).all()
+            finally:
+                db.close()
+            if not rows:
+                return
+            last_id = rows[-1].id
+            yielded += len(rows)
+            yield [row.message_id for row in rows]
+
+    def backfill(self, **kwargs) -> Tuple[int, int]:
+        """
+        Processes every batch from `pending_batches(**kwargs)` in this thread.
+        Returns (replies extracted, replies whose batch failed).
+        """
+        done = failed = 0
+        for batch in self.pending_batches(**kwargs):
+            try:
+                done += self.process(batch)
+            except Exception as e:
+                failed += len(batch)
+                logger.warning("Extraction of %d replies failed: %s", len(batch), e)
+        return done, failed
+
+
+# Singleton instance, started/stopped from the app lifespan
+extraction_pipeline = ExtractionPipeline()
+
+
+# ---- CLI ----
+
+def _backfill(args) -> None:
+    since = datetime.fromisoformat(args.since).replace(tzinfo=timezone.utc) if args.since else None
+    start = time.perf_counter()
+    done, failed = extraction_pipeline.backfill(
+        include_done=args.all, include_failed=args.retry_failed, since=since, limit=args.limit
+    )
+    print(f"{done} extracted, {failed} failed in {time.perf_counter() - start:.1f}s")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m services.extraction")
+    sub = parser.add_subparsers(dest="command", required=True)
+    backfill_cmd = sub.add_parser("backfill", help="Extract replies that have no results yet")
+    backfill_cmd.add_argument("--all", action="store_true", help="Re-run replies that were already extracted too")
+    backfill_cmd.add_argument("--retry-failed", action="store_true",
+                              help=f"Include replies whose extraction already failed {SETTINGS.EXTRACTION_MAX_FAILURES} times")
+    backfill_cmd.add_argument("--since", help="Only replies created on or after this date (YYYY-MM-DD, UTC)")
+    backfill_cmd.add_argument("--limit", type=int, help="Stop after this many replies")
+    args = parser.parse_args(argv)
+
+    if args.command == "backfill":
+        _backfill(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Google sign-in plumbing shared by the auth endpoints.
+
+- One pooled `requests` session for all calls to Google (cert fetches and the
+  OAuth token exchange), so logins reuse warm TLS connections.
+- `GoogleCertCache` keeps Google's ID-token signing certs for as long as their
+  `Cache-Control: max-age` allows and refreshes them in the background shortly
+  before they expire, so verifying an ID token normally needs no network call.
+- The OAuth client configuration is built once; `build_flow` only creates the
+  small per-request `Flow` object on top of it. A `Flow` (and its
+  `OAuth2Session`) holds one login's state: the PKCE verifier and, after the
+  exchange, the user's tokens. Sharing one between concurrent logins would
+  mix those up, and building it costs about 40 µs against a token exchange
+  of tens of milliseconds, so only the connection pool underneath is shared.
+"""
+
+import logging
+import re
+import secrets
+import threading
+import time
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Dict, Mapping, Optional
+
+from config import SETTINGS
+
+if TYPE_CHECKING:
+    import requests
+    from google_auth_oauthlib.flow import Flow
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_AUTH_URI = "https://accounts.google.com/o/oauth2/auth"
+GOOGLE_TOKEN_URI = "https://oauth2.googleapis.com/token"
+GOOGLE_CERTS_URL = "https://www.googleapis.com/oauth2/v1/certs"  # {key id: PEM certificate}
+
+GOOGLE_SCOPES = [
+    "openid",
+    "https://www.googleapis.com/auth/userinfo.email",
+    "https://www.googleapis.com/auth/userinfo.profile",
+]
+
+_MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+_session_lock = threading.Lock()
+_session: Optional["requests.Session"] = None
+_adapter = None
+
+
+def http_session() -> "requests.Session":
+    """The process-wide pooled session for Google endpoints (created on first use)."""
+    global _session, _adapter
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                _adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=2)
+                session = requests.Session()
+                session.mount("https://", _adapter)
+                _session = session
+    return _session
+
+
+class GoogleCertCache:
+    def __init__(
+        self,
+        url: str = GOOGLE_CERTS_URL,
+        *,
+        refresh_margin_seconds: int = 300,
+        default_max_age_seconds: int = 3600,
+    ):
+        self.url = url
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self.default_max_age_seconds = default_max_age_seconds
+        self._certs: Dict[str, str] = {}
+        self._expires_at = 0.0  # time.monotonic()
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def _max_age(self, headers: Mapping[str, str]) -> int:
+        match = _MAX_AGE_RE.search(headers.get("Cache-Control", ""))
+        max_age = int(match.group(1)) if match else self.default_max_age_seconds
+        # A cached response (e.g. from a proxy) has already used part of its lifetime.
+        age = headers.get("Age", "0")
+        return max(0, max_age - (int(age) if age.isdigit() else 0))
+
+    def refresh(self) -> Dict[str, str]:
+        """Fetches the certs now, replacing the cached set."""
+        import google.auth.exceptions as google_exceptions
+
+        try:
+            response = http_session().get(self.url, timeout=10)
+            response.raise_for_status()
+            certs = response.json()
+        except Exception as e:
+            raise google_exceptions.TransportError(f"Could not fetch Google certificates: {e}") from e
+        with self._lock:
+            self._certs = certs
+            self._expires_at = time.monotonic() + self._max_age(response.headers)
+        return certs
+
+    def _refresh_in_background(self) -> None:
+        try:
+            self.refresh()
+        except Exception:
+            logger.exception("Background refresh of Google certificates failed")
+        finally:
+            self._refreshing = False
+
+    def get(self, *, force_refresh: bool = False) -> Dict[str, str]:
+        """Returns the current certs, fetching synchronously only if none are valid."""
+        now = time.monotonic()
+        if force_refresh or not self._certs or now >= self._expires_at:
+            return self.refresh()
+        if now >= self._expires_at - self.refresh_margin_seconds:
+            with self._lock:
+                start = not self._refreshing
+                self._refreshing = True
+            if start:
+                threading.Thread(target=self._refresh_in_background, name="google-certs-refresh", daemon=True).start()
+        return self._certs
+
+
+google_certs = GoogleCertCache()
+
+
+def verify_id_token(id_token_str: str, audience: str) -> Mapping[str, Any]:
+    """
+    Verifies a Google ID token's signature, expiry and audience against the
+    cached certs. Raises ValueError / GoogleAuthError like
+    `google.oauth2.id_token.verify_oauth2_token`.
+    """
+    from google.auth import jwt as google_jwt
+
+    certs = google_certs.get()
+    key_id = google_jwt.decode_header(id_token_str).get("kid")
+    if key_id not in certs:
+        # Google rotated its keys before our copy expired.
+        certs = google_certs.get(force_refresh=True)
+    return google_jwt.decode(id_token_str, certs=certs, audience=audience, clock_skew_in_seconds=10)
+
+
+@lru_cache(maxsize=1)
+def client_config() -> Dict[str, Any]:
+    return {
+        "web": {
+            "client_id": SETTINGS.GOOGLE_CLIENT_ID,
+            "client_secret": SETTINGS.GOOGLE_CLIENT_SECRET,
+            "auth_uri": GOOGLE_AUTH_URI,
+            "token_uri": GOOGLE_TOKEN_URI,
+        }
+    }
+
+
+def new_code_verifier() -> str:
+    """A PKCE code verifier (RFC 7636: 43-128 unreserved characters)."""
+    return secrets.token_urlsafe(64)
+
+
+def build_flow(*, code_verifier: Optional[str] = None, redirect_uri: Optional[str] = None) -> "Flow":
+    """
+    Creates a Flow for one login step. The same `code_verifier` must be used for
+    the authorization URL and the token exchange, so it is kept with the OAuth state.
+    Each call returns a new Flow (it holds per-login state) on the shared pool.
+    """
+    from google_auth_oauthlib.flow import Flow
+
+    flow = Flow.from_client_config(
+        client_config=client_config(),
+        scopes=GOOGLE_SCOPES,
+        redirect_uri=redirect_uri or SETTINGS.GOOGLE_REDIRECT_URI,
+        code_verifier=code_verifier,
+    )
+    # Token exchange over the shared connection pool.
+    http_session()
+    flow.oauth2session.mount("https://", _adapter)
+    return flow
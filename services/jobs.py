@@ -0,0 +1,409 @@
+"""
+Durable background jobs.
+
+Jobs are rows in the `jobs` table, so they survive restarts and any worker
+process can run them. Each process runs `JOBS_WORKERS` threads (started from
+the app lifespan) that claim due jobs one at a time:
+
+- ``enqueue(name, payload, delay_seconds=..., key=...)`` adds a one-off job.
+  A `key` keeps at most one queued/running job per key (e.g. one title job
+  per conversation); enqueueing a duplicate is a no-op.
+- Periodic jobs come from `JOBS_PERIODIC`: one row per job, re-queued
+  `interval` after each run, whichever process runs it.
+- A failed attempt is retried after `JOBS_RETRY_BASE_SECONDS`, doubling
+  each time, up to `max_attempts`; the job is then kept as ``failed``.
+
+Claiming is a single conditional UPDATE (``FOR UPDATE SKIP LOCKED`` on
+PostgreSQL), so exactly one worker gets each job. While a handler runs, its
+worker renews the job's lease every third of `JOBS_LEASE_SECONDS`. A job
+whose worker died mid-run stops being renewed and is not started again: once
+the lease expires it is marked failed ("lease expired"), or for a periodic
+job re-queued, so every job runs at most once per attempt. Handlers are
+registered with `@job_runner.task(name)` (see services/tasks.py).
+
+    python -m services.jobs list                  # counts by status and recent failures
+    python -m services.jobs retry JOB_ID|--failed # queue failed jobs again
+"""
+
+import argparse
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from opentelemetry.trace import SpanKind
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from config import SETTINGS
+from db.session import engine
+from db.model.job import Job
+from services import metrics, tracing
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, FAILED = "queued", "running", "failed"
+
+MAX_RETRY_DELAY_SECONDS = 3600
+
+
+@dataclass
+class ClaimedJob:
+    id: uuid.UUID
+    name: str
+    payload: Dict[str, Any]
+    attempts: int  # including this one
+    max_attempts: int
+    interval_seconds: Optional[int]
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class JobRunner:
+    SWEEP_INTERVAL_SECONDS = 60
+
+    def __init__(
+        self,
+        bind=engine,
+        *,
+        workers: int = SETTINGS.JOBS_WORKERS,
+        poll_interval_ms: int = SETTINGS.JOBS_POLL_INTERVAL_MS,
+        max_attempts: int = SETTINGS.JOBS_MAX_ATTEMPTS,
+        retry_base_seconds: int = SETTINGS.JOBS_RETRY_BASE_SECONDS,
+        lease_seconds: int = SETTINGS.JOBS_LEASE_SECONDS,
+        periodic: Dict[str, int] = SETTINGS.JOBS_PERIODIC,
+    ):
+        self._engine = bind
+        self._table = Job.__table__
+        self.workers = workers
+        self.poll_interval = poll_interval_ms / 1000
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.lease_seconds = lease_seconds
+        self.periodic = periodic
+
+        self._handlers: Dict[str, Callable[[Dict[str, Any]], None]] = {}
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._next_sweep = 0.0
+
+    # ---- Registration ----
+
+    def task(self, name: str):
+        """Decorator registering `func(payload)` as the handler for jobs named `name`."""
+        def register(func: Callable[[Dict[str, Any]], None]):
+            self._handlers[name] = func
+            return func
+        return register
+
+    # ---- Lifecycle ----
+
+    @property
+    def running(self) -> bool:
+        return any(t.is_alive() for t in self._threads)
+
+    def start(self) -> None:
+        """Schedules the periodic jobs and starts the worker threads (idempotent)."""
+        if self.running or self.workers < 1:
+            return
+        self._schedule_periodic()
+        self._stopping.clear()
+        self._threads = [
+            threading.Thread(target=self._run, name=f"jobs-{i}", daemon=True) for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """
+        Stops claiming new jobs and waits up to `timeout` for running ones.
+        A job still running after that is recovered by the lease sweep.
+        """
+        self._stopping.set()
+        self._wakeup.set()
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(deadline - time.monotonic(), 0))
+        self._threads = []
+
+    def _schedule_periodic(self) -> None:
+        c = self._table.c
+        for name, minutes in self.periodic.items():
+            key = f"periodic:{name}"
+            with self._engine.begin() as conn:
+                if minutes <= 0:
+                    conn.execute(delete(self._table).where(c.key == key, c.status != RUNNING))
+                    continue
+                # Every process does this at start-up; the row and its schedule are shared.
+                updated = conn.execute(update(self._table).where(c.key == key).values(interval_seconds=minutes * 60))
+            if updated.rowcount == 0:
+                self.enqueue(name, key=key, interval_seconds=minutes * 60)
+
+    # ---- Producers ----
+
+    def enqueue(
+        self,
+        name: str,
+        payload: Optional[Dict[str, Any]] = None,
+        *,
+        delay_seconds: float = 0,
+        key: Optional[str] = None,
+        max_attempts: Optional[int] = None,
+        interval_seconds: Optional[int] = None,
+    ) -> Optional[uuid.UUID]:
+        """Adds a job; returns its id, or None if a job with the same `key` is already pending."""
+        job_id = uuid.uuid4()
+        try:
+            with self._engine.begin() as conn:
+                conn.execute(insert(self._table).values(
+                    id=job_id,
+                    name=name,
+                    payload=payload or {},
+                    key=key,
+                    status=QUEUED,
+                    run_at=_now() + timedelta(seconds=delay_seconds),
+                    interval_seconds=interval_seconds,
+                    attempts=0,
+                    max_attempts=max_attempts or self.max_attempts,
+                ))
+        except IntegrityError:
+            return None
+        if delay_seconds <= 0:
+            self._wakeup.set()
+        return job_id
+
+    # ---- Workers ----
+
+    @property
+    def worker_id(self) -> str:
+        return f"{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}"
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                self._maybe_sweep()
+                job = self.claim()
+            except Exception:
+                metrics.ERRORS.labels("jobs").inc()
+                logger.exception("Claiming a job failed")
+                job = None
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            try:
+                self.execute(job)
+            except Exception:
+                # Recording the outcome failed; the lease sweep settles the job.
+                metrics.ERRORS.labels("jobs").inc()
+                logger.exception("Recording the outcome of job %s (%s) failed", job.name, job.id)
+
+    def claim(self) -> Optional[ClaimedJob]:
+        """Marks the earliest due job as running by this worker and returns it."""
+        c = self._table.c
+        now = _now()
+        due = (
+            select(c.id)
+            .where(c.status == QUEUED, c.run_at <= now)
+            .order_by(c.run_at)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        # The status check again on the outer UPDATE: of two workers that picked
+        # the same row, only the first one's UPDATE still matches it.
+        claim = (
+            update(self._table)
+            .where(c.id == due, c.status == QUEUED)
+            .values(status=RUNNING, locked_by=self.worker_id, locked_at=now, attempts=c.attempts + 1)
+            .returning(c.id, c.name, c.payload, c.attempts, c.max_attempts, c.interval_seconds)
+        )
+        with self._engine.begin() as conn:
+            row = conn.execute(claim).first()
+        if row is None:
+            return None
+        return ClaimedJob(row.id, row.name, row.payload or {}, row.attempts, row.max_attempts, row.interval_seconds)
+
+    def execute(self, job: ClaimedJob) -> None:
+        """Runs a claimed job's handler and records the outcome."""
+        handler = self._handlers.get(job.name)
+        start = time.perf_counter()
+        try:
+            if handler is None:
+                raise LookupError(f"No handler registered for job '{job.name}'")
+            with self._lease_renewed(job), \
+                    tracing.span(f"job.{job.name}", kind=SpanKind.CONSUMER, attributes={"tebnegar.job.attempt": job.attempts}):
+                handler(job.payload)
+        except Exception as e:
+            metrics.JOB_DURATION.labels(job.name).observe(time.perf_counter() - start)
+            self._failed(job, e)
+            return
+        metrics.JOB_DURATION.labels(job.name).observe(time.perf_counter() - start)
+        metrics.JOBS_RUN.labels(job.name, "ok").inc()
+        self._finish(job)
+
+    @contextmanager
+    def _lease_renewed(self, job: ClaimedJob):
+        """Keeps the job's lease fresh while it runs, so the sweep leaves long runs alone."""
+        c = self._table.c
+        worker = self.worker_id
+        done = threading.Event()
+
+        def renew():
+            while not done.wait(self.lease_seconds / 3):
+                try:
+                    with self._engine.begin() as conn:
+                        conn.execute(
+                            update(self._table)
+                            .where(c.id == job.id, c.status == RUNNING, c.locked_by == worker)
+                            .values(locked_at=_now())
+                        )
+                except Exception:
+                    metrics.ERRORS.labels("jobs").inc()
+                    logger.exception("Renewing the lease of job %s (%s) failed", job.name, job.id)
+
+        thread = threading.Thread(target=renew, name=f"{threading.current_thread().name}-lease", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            done.set()
+            thread.join()
+
+    def _finish(self, job: ClaimedJob) -> None:
+        with self._engine.begin() as conn:
+            if job.interval_seconds:
+                conn.execute(self._requeue(job.id, delay_seconds=job.interval_seconds, attempts=0, last_error=None))
+            else:
+                conn.execute(delete(self._table).where(self._table.c.id == job.id))
+
+    def _failed(self, job: ClaimedJob, error: Exception) -> None:
+        last_error = "".join(traceback.format_exception_only(type(error), error)).strip()
+        with self._engine.begin() as conn:
+            if job.attempts < job.max_attempts:
+                delay = min(self.retry_base_seconds * 2 ** (job.attempts - 1), MAX_RETRY_DELAY_SECONDS)
+                conn.execute(self._requeue(job.id, delay_seconds=delay, last_error=last_error))
+                metrics.JOBS_RUN.labels(job.name, "retried").inc()
+                logger.warning("Job %s (%s) failed, attempt %d/%d, retrying in %ds: %s",
+                               job.name, job.id, job.attempts, job.max_attempts, delay, last_error)
+                return
+            if job.interval_seconds:
+                # A periodic job keeps its schedule; the next run starts from scratch.
+                conn.execute(self._requeue(job.id, delay_seconds=job.interval_seconds, attempts=0, last_error=last_error))
+            else:
+                conn.execute(self._give_up(self._table.c.id == job.id, last_error))
+        metrics.JOBS_RUN.labels(job.name, "failed").inc()
+        metrics.ERRORS.labels("jobs").inc()
+        logger.error("Job %s (%s) failed after %d attempts: %s", job.name, job.id, job.attempts, last_error)
+
+    def _requeue(self, job_id: uuid.UUID, *, delay_seconds: float, last_error: Optional[str], **values):
+        return (
+            update(self._table)
+            .where(self._table.c.id == job_id)
+            .values(
+                status=QUEUED,
+                run_at=_now() + timedelta(seconds=delay_seconds),
+                locked_by=None,
+                locked_at=None,
+                last_error=last_error,
+                **values,
+            )
+        )
+
+    def _give_up(self, where, last_error: str):
+        # The key is released so the same work can be enqueued again.
+        return (
+            update(self._table)
+            .where(where)
+            .values(status=FAILED, key=None, locked_by=None, finished_at=_now(), last_error=last_error)
+        )
+
+    def _maybe_sweep(self) -> None:
+        """Recovers jobs whose worker died (lease expired) without running them again."""
+        now = time.time()
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + self.SWEEP_INTERVAL_SECONDS
+        c = self._table.c
+        expired = (c.status == RUNNING) & (c.locked_at < _now() - timedelta(seconds=self.lease_seconds))
+        with self._engine.begin() as conn:
+            lost = conn.execute(
+                self._give_up(expired & c.interval_seconds.is_(None), "lease expired").returning(c.name)
+            ).scalars().all()
+            lost += conn.execute(
+                update(self._table)
+                .where(expired & c.interval_seconds.isnot(None))
+                .values(status=QUEUED, run_at=_now(), attempts=0, locked_by=None, locked_at=None,
+                        last_error="lease expired")
+                .returning(c.name)
+            ).scalars().all()
+        for name in lost:
+            metrics.JOBS_RUN.labels(name, "lost").inc()
+        if lost:
+            logger.warning("Recovered %d jobs whose worker stopped responding: %s", len(lost), ", ".join(lost))
+
+    # ---- Admin ----
+
+    def status_counts(self) -> Dict[str, int]:
+        c = self._table.c
+        with self._engine.connect() as conn:
+            return dict(conn.execute(select(c.status, func.count()).group_by(c.status)).all())
+
+    def retry(self, job_id: Optional[uuid.UUID] = None) -> int:
+        """Queues a failed job (or all of them) again with fresh attempts; returns how many."""
+        c = self._table.c
+        where = c.status == FAILED
+        if job_id is not None:
+            where &= c.id == job_id
+        with self._engine.begin() as conn:
+            count = conn.execute(
+                update(self._table).where(where).values(status=QUEUED, run_at=_now(), attempts=0, finished_at=None)
+            ).rowcount
+        if count:
+            self._wakeup.set()
+        return count
+
+
+# Singleton instance, started/stopped from the app lifespan
+job_runner = JobRunner()
+
+
+# ---- CLI ----
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m services.jobs")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="Show job counts by status and the latest failures")
+    retry_cmd = sub.add_parser("retry", help="Queue failed jobs again")
+    target = retry_cmd.add_mutually_exclusive_group(required=True)
+    target.add_argument("job_id", nargs="?", type=uuid.UUID)
+    target.add_argument("--failed", action="store_true", help="Every failed job")
+    args = parser.parse_args(argv)
+
+    if args.command == "retry":
+        print(f"Queued {job_runner.retry(args.job_id)} jobs again.")
+        return
+    for status, count in sorted(job_runner.status_counts().items()):
+        print(f"{status:<8} {count}")
+    c = Job.__table__.c
+    with engine.connect() as conn:
+        failed = conn.execute(
+            select(c.id, c.name, c.attempts, c.finished_at, c.last_error)
+            .where(c.status == FAILED).order_by(c.finished_at.desc()).limit(20)
+        ).all()
+    for row in failed:
+        print(f"{row.id}  {row.name}  attempts={row.attempts}  {row.finished_at}  {row.last_error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Prometheus metrics for the API, exposed at the admin-protected `/metrics`.
+
+Metrics are plain `prometheus_client` objects updated inline on the hot
+paths (an observation is a few microseconds). Under gunicorn every worker
+writes to `PROMETHEUS_MULTIPROC_DIR` (set in gunicorn.conf.py) and a scrape
+aggregates all workers; without it the registry is per process.
+
+Instrumented here: HTTP requests (ASGI middleware), SQLAlchemy queries and
+pool checkouts (engine events). Elsewhere: AI provider calls
+(`SessionManager`), token counts (`GeminiClient`), the session write buffer,
+response compression and errors of background components.
+"""
+
+import os
+import time
+from typing import Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    REGISTRY,
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+PREFIX = "tebnegar"
+
+# Latency buckets (seconds): HTTP/DB are mostly fast, AI calls take seconds.
+_FAST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+_AI_BUCKETS = (0.25, 0.5, 1, 2, 3, 5, 7.5, 10, 15, 20, 30, 45, 60, 90, 120)
+
+# ---- HTTP ----
+HTTP_REQUESTS = Counter(f"{PREFIX}_http_requests_total", "HTTP requests", ["method", "route", "status"])
+HTTP_REQUEST_DURATION = Histogram(
+    f"{PREFIX}_http_request_duration_seconds", "HTTP request latency", ["method", "route"], buckets=_FAST_BUCKETS
+)
+HTTP_IN_PROGRESS = Gauge(f"{PREFIX}_http_requests_in_progress", "HTTP requests being served", multiprocess_mode="livesum")
+
+# ---- Database ----
+DB_QUERIES = Counter(f"{PREFIX}_db_queries_total", "SQL statements executed", ["operation"])
+DB_QUERY_DURATION = Histogram(
+    f"{PREFIX}_db_query_duration_seconds", "SQL statement latency", ["operation"], buckets=_FAST_BUCKETS
+)
+DB_SLOW_QUERIES = Counter(f"{PREFIX}_db_slow_queries_total", "SQL statements slower than SLOW_QUERY_THRESHOLD_MS")
+DB_POOL_CHECKED_OUT = Gauge(f"{PREFIX}_db_pool_checked_out", "DB connections in use", multiprocess_mode="livesum")
+DB_POOL_SIZE = Gauge(f"{PREFIX}_db_pool_size", "DB connections held by the pool", multiprocess_mode="livesum")
+
+# ---- AI provider ----
+AI_REQUEST_DURATION = Histogram(
+    f"{PREFIX}_ai_request_duration_seconds", "AI provider call latency", ["provider", "model", "outcome"],
+    buckets=_AI_BUCKETS,
+)
+AI_TIME_TO_FIRST_TOKEN = Histogram(
+    f"{PREFIX}_ai_time_to_first_token_seconds",
+    "Time until the provider's first output arrives (the whole reply for non-streaming calls)",
+    ["provider", "model"], buckets=_AI_BUCKETS,
+)
+AI_TOKENS = Counter(f"{PREFIX}_ai_tokens_total", "Tokens used", ["provider", "model", "kind"])
+TRIAGE_RED_FLAGS = Counter(f"{PREFIX}_triage_red_flags_total", "User messages matching a red-flag category", ["category"])
+CHAT_HISTORY_LOOKUPS = Counter(
+    f"{PREFIX}_chat_history_lookups_total", "Chat history lookups in the state store", ["result"]
+)
+CHAT_HISTORIES = Gauge(
+    f"{PREFIX}_chat_histories", "Chat histories held in the state store", multiprocess_mode="mostrecent"
+)
+
+# ---- Queues / background components ----
+SESSION_BUFFER_PENDING = Gauge(
+    f"{PREFIX}_session_buffer_pending_rows", "Rows waiting in the session write buffer", multiprocess_mode="livesum"
+)
+SESSION_BUFFER_DEAD_LETTERS = Counter(
+    f"{PREFIX}_session_buffer_dead_letters_total", "Buffered rows the database rejected, set aside in the dead-letter file"
+)
+OAUTH_STATES_OUTSTANDING = Gauge(
+    f"{PREFIX}_oauth_states_outstanding", "OAuth login states issued and not yet used", multiprocess_mode="mostrecent"
+)
+EXTRACTION_QUEUED = Gauge(
+    f"{PREFIX}_extraction_queued", "AI replies waiting for background extraction", multiprocess_mode="livesum"
+)
+EXTRACTION_DROPPED = Counter(
+    f"{PREFIX}_extraction_dropped_total", "AI replies not queued for extraction because the queue was full"
+)
+EXTRACTION_BATCHES = Counter(f"{PREFIX}_extraction_batches_total", "Extraction batches by outcome", ["outcome"])
+JOBS_RUN = Counter(f"{PREFIX}_jobs_total", "Background job runs by outcome", ["job", "outcome"])
+JOB_DURATION = Histogram(f"{PREFIX}_job_duration_seconds", "Background job run time", ["job"], buckets=_AI_BUCKETS)
+ERRORS = Counter(f"{PREFIX}_errors_total", "Handled errors by component", ["component"])
+RATE_LIMITED = Counter(f"{PREFIX}_rate_limited_total", "Requests rejected by a rate limit", ["rule"])
+
+# ---- Response compression ----
+COMPRESSION_BYTES = Counter(
+    f"{PREFIX}_compression_bytes_total", "Response bytes before (in) and after (out) compression", ["encoding", "stage"]
+)
+COMPRESSION_SECONDS = Counter(
+    f"{PREFIX}_compression_seconds_total", "CPU time spent compressing responses", ["encoding"]
+)
+
+
+# ---- HTTP middleware ----
+
+def route_template(scope) -> str:
+    """
+    The matched route as a template, e.g. /api/v1/messages/{conversation_id}, so
+    labels stay bounded. The router only records the innermost route (whose path
+    lacks the include prefixes), so the template is rebuilt from the request path.
+    """
+    if scope.get("route") is None:
+        return "<unmatched>"
+    path = scope["path"]
+    params = scope.get("path_params") or {}
+    if not params:
+        return path
+    by_value = {str(value): name for name, value in params.items()}
+    return "/".join("{%s}" % by_value[seg] if seg in by_value else seg for seg in path.split("/"))
+
+class MetricsMiddleware:
+    """Pure ASGI middleware (no per-request task/stream wrapping like BaseHTTPMiddleware)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_IN_PROGRESS.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_PROGRESS.dec()
+            route = route_template(scope)
+            method = scope["method"]
+            HTTP_REQUEST_DURATION.labels(method, route).observe(time.perf_counter() - start)
+            HTTP_REQUESTS.labels(method, route, str(status_code)).inc()
+
+
+# ---- SQLAlchemy ----
+
+def _operation(statement: str) -> str:
+    verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    return verb if verb in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH") else "OTHER"
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Counts and times every statement, and tracks pool checkouts."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("metrics_query_start")
+        if not starts:
+            return
+        operation = _operation(statement)
+        DB_QUERIES.labels(operation).inc()
+        DB_QUERY_DURATION.labels(operation).observe(time.perf_counter() - starts.pop())
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("metrics_query_start"):
+            conn.info["metrics_query_start"].pop()
+        ERRORS.labels("db").inc()
+
+    @event.listens_for(engine, "checkout")
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        DB_POOL_CHECKED_OUT.inc()
+
+    @event.listens_for(engine, "checkin")
+    def _checkin(dbapi_connection, connection_record):
+        DB_POOL_CHECKED_OUT.dec()
+
+    @event.listens_for(engine, "connect")
+    def _connect(dbapi_connection, connection_record):
+        DB_POOL_SIZE.inc()
+
+    @event.listens_for(engine, "close")
+    def _close(dbapi_connection, connection_record):
+        DB_POOL_SIZE.dec()
+
+
+# ---- AI provider ----
+
+def observe_ai_call(provider: str, model: Optional[str], seconds: float, *, error: bool) -> None:
+    model = model or "unknown"
+    AI_REQUEST_DURATION.labels(provider, model, "error" if error else "ok").observe(seconds)
+    if error:
+        ERRORS.labels("ai_provider").inc()
+    else:
+        AI_TIME_TO_FIRST_TOKEN.labels(provider, model).observe(seconds)
+
+
+# ---- Response compression ----
+
+def observe_compression(encoding: str, bytes_in: int, bytes_out: int, seconds: float) -> None:
+    COMPRESSION_BYTES.labels(encoding, "in").inc(bytes_in)
+    COMPRESSION_BYTES.labels(encoding, "out").inc(bytes_out)
+    COMPRESSION_SECONDS.labels(encoding).inc(seconds)
+
+
+# ---- Exposition ----
+
+def _refresh_scrape_gauges() -> None:
+    """Gauges that are cheaper to read at scrape time than to maintain on every write."""
+    from services.oauth_state import oauth_states
+    from services.ai.session_manager import SessionManager
+    from services.state_store import state_store
+
+    OAUTH_STATES_OUTSTANDING.set(oauth_states.store.count(oauth_states.NAMESPACE))
+    CHAT_HISTORIES.set(state_store.count(SessionManager.NAMESPACE))
+
+
+def render() -> bytes:
+    """The current metrics in the Prometheus text format."""
+    try:
+        _refresh_scrape_gauges()
+    except Exception:
+        ERRORS.labels("metrics").inc()
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
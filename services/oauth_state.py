@@ -0,0 +1,73 @@
+"""
+One-time OAuth `state` values for the Google login flow.
+
+`GET /auth/url` issues a state bound to the caller's session id and the
+callback consumes it. States live in the shared state store, so any worker
+can validate them, and are bounded three ways: they expire after
+`OAUTH_STATE_TTL_SECONDS`, expired ones are swept periodically by the store,
+and at most `OAUTH_STATE_MAX_OUTSTANDING` are kept (oldest evicted first),
+so abandoned logins and bots can't grow it without limit.
+"""
+
+import secrets
+import threading
+from typing import Any, Dict, Optional
+
+from config import SETTINGS
+from services.state_store import StateStore, state_store
+
+
+class OAuthStateStore:
+    NAMESPACE = "oauth_state"
+
+    def __init__(
+        self,
+        store: StateStore = state_store,
+        *,
+        ttl_seconds: int = SETTINGS.OAUTH_STATE_TTL_SECONDS,
+        max_outstanding: int = SETTINGS.OAUTH_STATE_MAX_OUTSTANDING,
+    ):
+        self.store = store
+        self.ttl_seconds = ttl_seconds
+        self.max_outstanding = max_outstanding
+
+        # Counters since this process started
+        self._lock = threading.Lock()
+        self._counters = {"issued": 0, "consumed": 0, "rejected": 0, "evicted": 0}
+
+    def _incr(self, name: str, by: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += by
+
+    def issue(self, session_id: str, *, code_verifier: Optional[str] = None) -> str:
+        """Creates a new state bound to `session_id` (and the login's PKCE verifier)."""
+        outstanding = self.store.count(self.NAMESPACE)
+        if outstanding >= self.max_outstanding:
+            self._incr("evicted", self.store.evict_oldest(self.NAMESPACE, outstanding - self.max_outstanding + 1))
+
+        state = secrets.token_urlsafe(16)
+        login = {"session_id": session_id, "code_verifier": code_verifier}
+        self.store.set(self.NAMESPACE, state, login, ttl_seconds=self.ttl_seconds)
+        self._incr("issued")
+        return state
+
+    def consume(self, state: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns `{"session_id", "code_verifier"}` and invalidates the state;
+        None if it is unknown, used or expired.
+        """
+        login = self.store.pop(self.NAMESPACE, state)
+        self._incr("consumed" if login is not None else "rejected")
+        if isinstance(login, str):
+            login = {"session_id": login, "code_verifier": None}  # issued before verifiers were stored
+        return login
+
+    def metrics(self) -> Dict[str, int]:
+        """Outstanding states (all workers) plus this process's issue/consume/reject/evict counts."""
+        with self._lock:
+            counters = dict(self._counters)
+        return {"outstanding": self.store.count(self.NAMESPACE), **counters}
+
+
+# Global instance
+oauth_states = OAuthStateStore()
@@ -0,0 +1,344 @@
+"""
+On-demand sampling profiler for live requests.
+
+An admin arms the profiler for the next N requests matching a route and/or
+for a time window. The arm lives in the shared state store, so every worker
+process picks it up: a background thread re-reads it every `POLL_SECONDS`,
+and requests only check the in-memory copy, so while disarmed nothing but
+that poll touches the store. While a matching request is in flight a daemon
+thread samples the stacks of all threads with `sys._current_frames()` every
+`interval_ms`. Counts are written per worker to `PROFILE_DIR` in the
+collapsed-stack format (`frame;frame;frame count`, as used by flamegraph.pl
+and speedscope) and can be downloaded as-is or as speedscope JSON.
+
+The request budget is shared: each worker claims one-time tokens from the
+state store, so at most N requests are profiled across all workers.
+"""
+
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from config import SETTINGS
+from services.state_store import StateStore, state_store
+
+logger = logging.getLogger(__name__)
+
+PROFILE_NAME_RE = re.compile(r"^profile-[0-9a-f]{12}-\d+\.collapsed$")
+
+# Frames in these modules only mean "thread is idle" (waiting for work or I/O readiness).
+_IDLE_MODULES = ("threading.py", "selectors.py", "queue.py")
+
+
+@dataclass
+class ProfileInfo:
+    name: str
+    size_bytes: int
+    created_at: datetime
+
+
+def route_pattern(route: str) -> re.Pattern:
+    """'/api/v1/messages/{conversation_id}' -> regex matching concrete request paths."""
+    parts = re.split(r"(\{[^/{}]+\})", route)
+    return re.compile("^" + "".join("[^/]+" if p.startswith("{") else re.escape(p) for p in parts) + "$")
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    filename = code.co_filename
+    for prefix in sys.path:
+        if prefix and filename.startswith(prefix + os.sep):
+            filename = filename[len(prefix) + 1:]
+            break
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+class _Sampler(threading.Thread):
+    def __init__(self, counts: Counter, lock: threading.Lock, interval_seconds: float):
+        super().__init__(name="profiler-sampler", daemon=True)
+        self.counts = counts
+        self.lock = lock
+        self.interval_seconds = interval_seconds
+        self.stopping = threading.Event()
+
+    def run(self) -> None:
+        own = threading.get_ident()
+        while not self.stopping.wait(self.interval_seconds):
+            stacks = []
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own or frame.f_code.co_filename.endswith(_IDLE_MODULES):
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame))
+                    frame = frame.f_back
+                stacks.append(";".join(reversed(labels)))
+            with self.lock:
+                self.counts.update(stacks)
+
+
+class Profiler:
+    NAMESPACE = "profiler"
+    ARM_KEY = "arm"
+    POLL_SECONDS = 2.0
+
+    def __init__(
+        self,
+        store: StateStore = state_store,
+        profile_dir: str = SETTINGS.PROFILE_DIR,
+        keep: int = SETTINGS.PROFILE_KEEP,
+    ):
+        self.store = store
+        self.profile_dir = profile_dir
+        self.keep = keep
+
+        self._arm: Optional[Dict[str, Any]] = None
+        self._pattern: Optional[re.Pattern] = None
+        self._poller: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+        # Per-worker capture of the current arm
+        self._lock = threading.Lock()
+        self._capture_id: Optional[str] = None
+        self._counts: Counter = Counter()
+        self._next_token = 0
+        self._tokens_exhausted = False
+        self._in_flight = 0
+        self._sampler: Optional[_Sampler] = None
+
+    # ---- Arming (admin API) ----
+
+    def arm(
+        self, *, route: Optional[str], requests: Optional[int], seconds: Optional[int], interval_ms: int
+    ) -> Dict[str, Any]:
+        """Arms every worker. Ends after `requests` profiled requests or `seconds`, whichever comes first."""
+        seconds = min(seconds or SETTINGS.PROFILER_MAX_SECONDS, SETTINGS.PROFILER_MAX_SECONDS)
+        arm = {
+            "id": uuid.uuid4().hex[:12],
+            "route": route,
+            "requests": requests,
+            "interval_ms": interval_ms,
+            "armed_at": time.time(),
+            "expires_at": time.time() + seconds,
+        }
+        for i in range(requests or 0):
+            self.store.set(self.NAMESPACE, f"{arm['id']}:{i}", True, ttl_seconds=seconds)
+        self.store.set(self.NAMESPACE, self.ARM_KEY, arm, ttl_seconds=seconds)
+        self._set_arm(arm)
+        return arm
+
+    def disarm(self) -> None:
+        self.store.delete(self.NAMESPACE, self.ARM_KEY)
+        self._set_arm(None)
+
+    def refresh(self) -> None:
+        """Re-reads the arm from the shared store (blocking)."""
+        try:
+            arm = self.store.get(self.NAMESPACE, self.ARM_KEY)
+        except Exception:
+            logger.exception("Could not read profiler arm state")
+            arm = None
+        self._set_arm(arm)
+
+    def current_arm(self) -> Optional[Dict[str, Any]]:
+        """The active arm as of the last poll; never touches the store."""
+        arm = self._arm
+        if arm is not None and time.time() >= arm["expires_at"]:
+            return None
+        return arm
+
+    # ---- Polling ----
+
+    def start(self) -> None:
+        """Starts polling the shared arm state every POLL_SECONDS (idempotent)."""
+        if self._poller is not None and self._poller.is_alive():
+            return
+        self._stopping.clear()
+        self._poller = threading.Thread(target=self._poll, name="profiler-poll", daemon=True)
+        self._poller.start()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        if self._poller is not None:
+            self._poller.join()
+            self._poller = None
+
+    def _poll(self) -> None:
+        while True:
+            self.refresh()
+            if self._stopping.wait(self.POLL_SECONDS):
+                return
+
+    def _set_arm(self, arm: Optional[Dict[str, Any]]) -> None:
+        if arm is not None and (self._arm is None or arm["id"] != self._arm["id"]):
+            self._pattern = route_pattern(arm["route"]) if arm["route"] else None
+        self._arm = arm
+
+    # ---- Capturing (middleware) ----
+
+    def should_profile(self, arm: Dict[str, Any], path: str) -> bool:
+        if self._pattern is not None and not self._pattern.match(path):
+            return False
+        if arm["requests"] is None:
+            return True
+        return self._claim_token(arm)
+
+    def _claim_token(self, arm: Dict[str, Any]) -> bool:
+        with self._lock:
+            self._reset_capture_if_new(arm)
+            if self._tokens_exhausted:
+                return False
+            # Tokens are one-time keys; other workers may have taken some already.
+            while self._next_token < arm["requests"]:
+                i = self._next_token
+                self._next_token += 1
+                if self.store.pop(self.NAMESPACE, f"{arm['id']}:{i}") is not None:
+                    return True
+            self._tokens_exhausted = True
+            return False
+
+    def _reset_capture_if_new(self, arm: Dict[str, Any]) -> None:
+        if self._capture_id != arm["id"]:
+            self._capture_id = arm["id"]
+            self._counts = Counter()
+            self._next_token = 0
+            self._tokens_exhausted = False
+
+    def begin(self, arm: Dict[str, Any]) -> None:
+        with self._lock:
+            self._reset_capture_if_new(arm)
+            self._in_flight += 1
+            if self._sampler is None:
+                self._sampler = _Sampler(self._counts, self._lock, arm["interval_ms"] / 1000)
+                self._sampler.start()
+
+    def end(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            if self._in_flight:
+                return
+            sampler, self._sampler = self._sampler, None
+            capture_id, counts = self._capture_id, dict(self._counts)
+        if sampler is not None:
+            sampler.stopping.set()
+            sampler.join()
+        try:
+            self._write(capture_id, counts)  # type: ignore
+        except Exception:
+            logger.exception("Could not write profile")
+
+    # ---- Storage ----
+
+    def _write(self, capture_id: str, counts: Dict[str, int]) -> None:
+        if not counts:
+            return
+        os.makedirs(self.profile_dir, exist_ok=True)
+        # One file per arm and worker, rewritten with the running totals.
+        path = os.path.join(self.profile_dir, f"profile-{capture_id}-{os.getpid()}.collapsed")
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            for stack, count in sorted(counts.items()):
+                f.write(f"{stack} {count}\n")
+        os.replace(tmp, path)
+        self._prune()
+
+    def _prune(self) -> None:
+        for info in self.list_profiles()[self.keep:]:
+            try:
+                os.remove(os.path.join(self.profile_dir, info.name))
+            except FileNotFoundError:
+                pass
+
+    def list_profiles(self) -> List[ProfileInfo]:
+        """Stored profiles, newest first."""
+        if not os.path.isdir(self.profile_dir):
+            return []
+        profiles = []
+        for name in os.listdir(self.profile_dir):
+            if PROFILE_NAME_RE.match(name):
+                stat = os.stat(os.path.join(self.profile_dir, name))
+                profiles.append(ProfileInfo(
+                    name=name,
+                    size_bytes=stat.st_size,
+                    created_at=datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc),
+                ))
+        return sorted(profiles, key=lambda p: p.created_at, reverse=True)
+
+    def profile_path(self, name: str) -> Optional[str]:
+        """Path of a stored profile, or None for unknown or unsafe names."""
+        if not PROFILE_NAME_RE.match(name):
+            return None
+        path = os.path.join(self.profile_dir, name)
+        return path if os.path.isfile(path) else None
+
+
+def to_speedscope(collapsed: str, name: str) -> Dict[str, Any]:
+    """Converts collapsed stacks to a speedscope 'sampled' profile (weights are sample counts)."""
+    frames: List[Dict[str, Any]] = []
+    index: Dict[str, int] = {}
+    samples, weights = [], []
+    for line in collapsed.splitlines():
+        stack, _, count = line.rpartition(" ")
+        if not stack:
+            continue
+        sample = []
+        for label in stack.split(";"):
+            if label not in index:
+                func, _, location = label.partition(" (")
+                file, _, line_no = location.rstrip(")").rpartition(":")
+                index[label] = len(frames)
+                frames.append({"name": func, "file": file, "line": int(line_no) if line_no.isdigit() else None})
+            sample.append(index[label])
+        samples.append(sample)
+        weights.append(int(count))
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": name,
+            "unit": "none",
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": samples,
+            "weights": weights,
+        }],
+        "name": name,
+        "exporter": "tebnegar",
+    }
+
+
+# Global instance
+profiler = Profiler()
+
+
+class ProfilerMiddleware:
+    """Pure ASGI middleware; while disarmed it only reads the polled arm state."""
+
+    def __init__(self, app, profiler: Profiler = profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        arm = self.profiler.current_arm() if scope["type"] == "http" else None
+        # Claiming a request token and writing the profile touch the store / disk.
+        if arm is None or not await run_in_threadpool(self.profiler.should_profile, arm, scope["path"]):
+            await self.app(scope, receive, send)
+            return
+        self.profiler.begin(arm)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            await run_in_threadpool(self.profiler.end)
+
+
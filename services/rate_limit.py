@@ -0,0 +1,347 @@
+"""
+Token-bucket rate limiting.
+
+Each rule in `RATE_LIMITS` is `"<route>:<scope>": "<N>/<period>"`: a bucket
+of N tokens per scope value that refills continuously at N per period.
+Scopes are `ip` (the client address, as stored in `Session.ip_address`;
+behind a proxy listed in `FORWARDED_ALLOW_IPS` it comes from X-Forwarded-For),
+`session` and `user`. A request spends one token from every bucket of its
+route and is rejected with 429 when any of them is empty; a rejected request
+spends nothing (tokens already taken from the other buckets are refunded).
+
+A bucket is two numbers (tokens left, time of the last update), so state is
+O(1) per key. The refill is computed lazily on the next hit, and a bucket
+that would have refilled completely is the same as no bucket, so every
+backend lets it expire at that point. `RATE_LIMIT_BACKEND` picks where
+buckets live:
+
+- ``memory``: in this process (limits apply per worker).
+- ``database``: the `rate_limit_buckets` table; one UPDATE per hit.
+- ``redis``: one Lua script call per hit at `REDIS_URL`.
+
+`RATE_LIMIT_ROUTE_BACKENDS` puts single routes in another backend: the
+`sessions` buckets stay in memory so `POST /sessions` never opens a database
+transaction (with N workers an address gets up to N times its limit there).
+"""
+
+import math
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import case, delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from config import SETTINGS
+from db.session import engine
+from db.model.rate_limit import RateLimitBucket
+
+SCOPES = ("ip", "session", "user")
+
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+_RULE_RE = re.compile(r"^\s*(\d+)\s*/\s*(\d*)\s*(second|minute|hour|day)s?\s*$")
+
+
+@dataclass(frozen=True)
+class Rule:
+    name: str  # "<route>:<scope>"
+    capacity: int
+    period_seconds: int
+
+    @property
+    def rate(self) -> float:
+        """Tokens refilled per second."""
+        return self.capacity / self.period_seconds
+
+    @property
+    def route(self) -> str:
+        return self.name.rsplit(":", 1)[0]
+
+    @property
+    def scope(self) -> str:
+        return self.name.rsplit(":", 1)[1]
+
+
+def parse_rule(name: str, spec: str) -> Rule:
+    """`parse_rule("messages:ip", "30/minute")`; the period can have a count, e.g. "100/10minutes"."""
+    if name.rsplit(":", 1)[-1] not in SCOPES:
+        raise ValueError(f"Rate limit '{name}': scope must be one of {', '.join(SCOPES)}.")
+    match = _RULE_RE.match(spec)
+    if not match or int(match.group(1)) < 1:
+        raise ValueError(f"Rate limit '{name}': expected '<N>/<period>', got '{spec}'.")
+    count, multiplier, unit = match.groups()
+    return Rule(name, int(count), int(multiplier or 1) * _PERIODS[unit])
+
+
+@dataclass
+class Decision:
+    allowed: bool
+    rule: Rule
+    remaining: int
+    reset_seconds: int  # until the bucket is full again
+    retry_after_seconds: int  # 0 when allowed
+
+
+def _decide(rule: Rule, allowed: bool, tokens: float, cost: float) -> Decision:
+    return Decision(
+        allowed=allowed,
+        rule=rule,
+        remaining=max(int(tokens), 0),
+        reset_seconds=math.ceil((rule.capacity - tokens) / rule.rate),
+        retry_after_seconds=0 if allowed else math.ceil((cost - tokens) / rule.rate),
+    )
+
+
+class BucketStore(ABC):
+    @abstractmethod
+    def hit(self, rule: Rule, key: str, cost: float = 1.0) -> Decision:
+        """Refills the bucket for `key`, then takes `cost` tokens from it if it has them."""
+
+    @abstractmethod
+    def refund(self, rule: Rule, key: str, cost: float = 1.0) -> None:
+        """Gives back `cost` tokens taken by `hit` (never beyond the capacity)."""
+
+
+class MemoryBucketStore(BucketStore):
+    def __init__(self):
+        # rule name -> key -> (tokens, updated_at). A hit moves the key to the end, and
+        # every bucket of a rule is full `period` after its last hit, so the
+        # expired ones are always at the front.
+        self._buckets: Dict[str, OrderedDict[str, Tuple[float, float]]] = {}
+        self._lock = threading.Lock()
+
+    def hit(self, rule: Rule, key: str, cost: float = 1.0) -> Decision:
+        now = time.monotonic()
+        with self._lock:
+            buckets = self._buckets.setdefault(rule.name, OrderedDict())
+            while buckets:
+                oldest, (_, updated_at) = next(iter(buckets.items()))
+                if updated_at + rule.period_seconds > now:
+                    break
+                del buckets[oldest]
+
+            tokens, updated_at = buckets.pop(key, (rule.capacity, now))
+            tokens = min(rule.capacity, tokens + (now - updated_at) * rule.rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            buckets[key] = (tokens, now)
+        return _decide(rule, allowed, tokens, cost)
+
+    def refund(self, rule: Rule, key: str, cost: float = 1.0) -> None:
+        with self._lock:
+            buckets = self._buckets.get(rule.name)
+            if buckets is not None and key in buckets:
+                tokens, updated_at = buckets[key]
+                buckets[key] = (min(rule.capacity, tokens + cost), updated_at)
+
+
+class DatabaseBucketStore(BucketStore):
+    SWEEP_INTERVAL_SECONDS = 60
+
+    def __init__(self, bind=engine):
+        self._engine = bind
+        self._table = RateLimitBucket.__table__
+        self._next_sweep = 0.0
+
+    def hit(self, rule: Rule, key: str, cost: float = 1.0) -> Decision:
+        now = time.time()
+        c = self._table.c
+        refilled = c.tokens + (now - c.updated_at) * rule.rate
+        refilled = case((refilled > rule.capacity, rule.capacity), else_=refilled)
+        # Refill and take in one statement, so concurrent workers can't both spend the last token.
+        take = (
+            update(self._table)
+            .where(c.key == key, refilled >= cost)
+            .values(
+                tokens=refilled - cost,
+                updated_at=now,
+                expires_at=now + (rule.capacity - (refilled - cost)) / rule.rate,
+            )
+            .returning(c.tokens)
+        )
+        with self._engine.begin() as conn:
+            tokens = conn.scalar(take)
+            row = None if tokens is not None else conn.execute(select(c.tokens, c.updated_at).where(c.key == key)).first()
+
+        if tokens is not None:
+            decision = _decide(rule, True, tokens, cost)
+        elif row is not None:
+            decision = _decide(rule, False, min(rule.capacity, row.tokens + (now - row.updated_at) * rule.rate), cost)
+        else:
+            tokens = rule.capacity - cost
+            try:
+                with self._engine.begin() as conn:
+                    conn.execute(insert(self._table).values(
+                        key=key, tokens=tokens, updated_at=now, expires_at=now + cost / rule.rate
+                    ))
+            except IntegrityError:
+                # Another worker created the bucket first; take from that one.
+                return self.hit(rule, key, cost)
+            decision = _decide(rule, True, tokens, cost)
+        self._maybe_sweep(now)
+        return decision
+
+    def refund(self, rule: Rule, key: str, cost: float = 1.0) -> None:
+        c = self._table.c
+        with self._engine.begin() as conn:
+            conn.execute(
+                update(self._table)
+                .where(c.key == key)
+                .values(tokens=case((c.tokens + cost > rule.capacity, rule.capacity), else_=c.tokens + cost))
+            )
+
+    def _maybe_sweep(self, now: float) -> None:
+        if now >= self._next_sweep:
+            self._next_sweep = now + self.SWEEP_INTERVAL_SECONDS
+            with self._engine.begin() as conn:
+                conn.execute(delete(self._table).where(self._table.c.expires_at <= now))
+
+
+class RedisBucketStore(BucketStore):
+    # KEYS[1] = bucket; ARGV = capacity, rate, now, cost. Returns {allowed, tokens}.
+    SCRIPT = """
+local capacity, rate, now, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(state[1]) or capacity
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(now - updated_at, 0) * rate)
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate * 1000) + 1)
+return {allowed, tostring(tokens)}
+"""
+    # KEYS[1] = bucket; ARGV = capacity, cost.
+    REFUND_SCRIPT = """
+local tokens = tonumber(redis.call('HGET', KEYS[1], 'tokens'))
+if tokens then
+    redis.call('HSET', KEYS[1], 'tokens', tostring(math.min(tonumber(ARGV[1]), tokens + tonumber(ARGV[2]))))
+end
+return 0
+"""
+
+    def __init__(self, url: str = SETTINGS.REDIS_URL, prefix: str = "tebnegar:ratelimit:"):
+        self.url = url
+        self.prefix = prefix
+        self._script = None
+        self._refund_script = None
+
+    def _register(self, source: str):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis requires the 'redis' package.")
+        return redis.Redis.from_url(self.url).register_script(source)
+
+    @property
+    def script(self):
+        # Created on first use, i.e. after gunicorn has forked the workers.
+        if self._script is None:
+            self._script = self._register(self.SCRIPT)
+        return self._script
+
+    @property
+    def refund_script(self):
+        if self._refund_script is None:
+            self._refund_script = self._register(self.REFUND_SCRIPT)
+        return self._refund_script
+
+    def hit(self, rule: Rule, key: str, cost: float = 1.0) -> Decision:
+        allowed, tokens = self.script(keys=[self.prefix + key], args=[rule.capacity, rule.rate, time.time(), cost])
+        return _decide(rule, bool(allowed), float(tokens), cost)
+
+    def refund(self, rule: Rule, key: str, cost: float = 1.0) -> None:
+        self.refund_script(keys=[self.prefix + key], args=[rule.capacity, cost])
+
+
+def create_bucket_store(backend: str = SETTINGS.RATE_LIMIT_BACKEND) -> BucketStore:
+    """Factory for the configured backend."""
+    if backend == "memory":
+        return MemoryBucketStore()
+    if backend == "database":
+        return DatabaseBucketStore()
+    if backend == "redis":
+        return RedisBucketStore()
+    raise ValueError(f"Rate limit backend '{backend}' not supported.")
+
+
+class RateLimiter:
+    def __init__(
+        self,
+        store: BucketStore,
+        rules: Dict[str, str] = SETTINGS.RATE_LIMITS,
+        route_stores: Optional[Dict[str, BucketStore]] = None,
+    ):
+        self.store = store
+        self.route_stores = route_stores or {}  # route -> store, overriding `store`
+        self.rules: Dict[str, List[Rule]] = {}  # route -> its rules
+        for name, spec in rules.items():
+            rule = parse_rule(name, spec)
+            self.rules.setdefault(rule.route, []).append(rule)
+
+    def scopes(self, route: str) -> List[str]:
+        """The scopes `route` has rules for."""
+        return [rule.scope for rule in self.rules.get(route, ())]
+
+    def check(self, route: str, keys: Dict[str, Optional[str]]) -> Optional[Decision]:
+        """
+        Spends a token from each of `route`'s buckets whose scope has a key
+        (scopes mapped to None are skipped). Returns the first rejection, or
+        else the decision with the fewest tokens left; None if nothing applies.
+        On rejection the tokens already taken from the other buckets are given
+        back, so a rejected request costs nothing.
+        """
+        store = self.route_stores.get(route, self.store)
+        tightest: Optional[Decision] = None
+        spent: List[Tuple[Rule, str]] = []
+        for rule in self.rules.get(route, ()):
+            value = keys.get(rule.scope)
+            if value is None:
+                continue
+            key = f"{rule.name}:{value}"
+            decision = store.hit(rule, key)
+            if not decision.allowed:
+                for spent_rule, spent_key in spent:
+                    store.refund(spent_rule, spent_key)
+                return decision
+            spent.append((rule, key))
+            if tightest is None or decision.remaining < tightest.remaining:
+                tightest = decision
+        return tightest
+
+
+def headers(decision: Decision) -> Dict[str, str]:
+    """`RateLimit-*` response headers (IETF httpapi draft), plus Retry-After on rejection."""
+    rule = decision.rule
+    result = {
+        "RateLimit-Limit": str(rule.capacity),
+        "RateLimit-Remaining": str(decision.remaining),
+        "RateLimit-Reset": str(decision.reset_seconds),
+        "RateLimit-Policy": f"{rule.capacity};w={rule.period_seconds}",
+    }
+    if not decision.allowed:
+        result["Retry-After"] = str(decision.retry_after_seconds)
+    return result
+
+
+def _create_rate_limiter() -> RateLimiter:
+    stores = {SETTINGS.RATE_LIMIT_BACKEND: create_bucket_store(SETTINGS.RATE_LIMIT_BACKEND)}
+    for backend in SETTINGS.RATE_LIMIT_ROUTE_BACKENDS.values():
+        if backend not in stores:
+            stores[backend] = create_bucket_store(backend)
+    return RateLimiter(
+        stores[SETTINGS.RATE_LIMIT_BACKEND],
+        route_stores={route: stores[backend] for route, backend in SETTINGS.RATE_LIMIT_ROUTE_BACKENDS.items()},
+    )
+
+
+# Global instance
+rate_limiter = _create_rate_limiter()
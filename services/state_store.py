@@ -0,0 +1,308 @@
+"""
+Shared key/value state for everything that used to live in per-process dicts
+(OAuth `state` values, chat histories).
+
+With several worker processes a request can land on any of them, so this
+state has to live outside the process. `STATE_STORE_BACKEND` picks one of:
+
+- ``memory``: a dict in this process. Single worker / local development only.
+- ``database``: the `shared_state` table, shared by every worker on the same DB.
+- ``redis``: any Redis-compatible server at `REDIS_URL` (needs the `redis` package).
+
+Values are JSON-serializable objects, grouped by namespace, with an optional
+TTL in seconds. `pop` is atomic, so a one-time value is consumed at most once.
+Expired entries are never returned and are swept out periodically; callers
+that need a size bound use `count` / `evict_oldest`.
+"""
+
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import delete, func, select
+
+from config import SETTINGS
+from db.session import engine
+from db.upsert import upsert_replace
+from db.model.shared_state import SharedState
+
+
+class StateStore(ABC):
+    """Namespaced key/value store with TTLs and atomic pop."""
+
+    # Expired entries are swept at most this often, piggybacking on `set`.
+    SWEEP_INTERVAL_SECONDS = 60
+
+    def __init__(self):
+        self._next_sweep = 0.0
+
+    @abstractmethod
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        """Returns the value, or None if it is missing or expired."""
+
+    @abstractmethod
+    def set(self, namespace: str, key: str, value: Any, ttl_seconds: Optional[int] = None) -> None:
+        """Stores `value`, replacing any previous one. No TTL means it never expires."""
+
+    @abstractmethod
+    def pop(self, namespace: str, key: str) -> Optional[Any]:
+        """Atomically removes and returns the value (None if missing or expired)."""
+
+    @abstractmethod
+    def delete(self, namespace: str, key: str) -> None:
+        pass
+
+    @abstractmethod
+    def count(self, namespace: str) -> int:
+        """Number of unexpired entries in `namespace`."""
+
+    @abstractmethod
+    def evict_oldest(self, namespace: str, n: int) -> int:
+        """Removes the `n` entries of `namespace` closest to expiry. Returns how many were removed."""
+
+    @abstractmethod
+    def purge_expired(self) -> int:
+        """Removes every expired entry. Returns how many were removed."""
+
+    def _maybe_sweep(self) -> None:
+        now = time.monotonic()
+        if now >= self._next_sweep:
+            self._next_sweep = now + self.SWEEP_INTERVAL_SECONDS
+            self.purge_expired()
+
+
+class MemoryStateStore(StateStore):
+    def __init__(self):
+        super().__init__()
+        # namespace -> key -> (json, expires_at). Writes move a key to the end, so
+        # with one TTL per namespace each OrderedDict is sorted by expiry.
+        self._data: Dict[str, OrderedDict[str, Tuple[str, Optional[float]]]] = defaultdict(OrderedDict)
+        self._lock = threading.Lock()
+
+    def _live(self, item, now: float) -> bool:
+        return item is not None and (item[1] is None or item[1] > now)
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        with self._lock:
+            entries = self._data[namespace]
+            item = entries.get(key)
+            if not self._live(item, time.monotonic()):
+                entries.pop(key, None)
+                return None
+        return json.loads(item[0])  # type: ignore
+
+    def set(self, namespace: str, key: str, value: Any, ttl_seconds: Optional[int] = None) -> None:
+        expires_at = time.monotonic() + ttl_seconds if ttl_seconds else None
+        encoded = json.dumps(value)
+        with self._lock:
+            entries = self._data[namespace]
+            entries[key] = (encoded, expires_at)
+            entries.move_to_end(key)
+        self._maybe_sweep()
+
+    def pop(self, namespace: str, key: str) -> Optional[Any]:
+        with self._lock:
+            item = self._data[namespace].pop(key, None)
+        if not self._live(item, time.monotonic()):
+            return None
+        return json.loads(item[0])  # type: ignore
+
+    def delete(self, namespace: str, key: str) -> None:
+        with self._lock:
+            self._data[namespace].pop(key, None)
+
+    def count(self, namespace: str) -> int:
+        self.purge_expired()  # cheap: only touches entries that have expired
+        with self._lock:
+            return len(self._data[namespace])
+
+    def evict_oldest(self, namespace: str, n: int) -> int:
+        with self._lock:
+            entries = self._data[namespace]
+            evicted = min(n, len(entries))
+            for _ in range(evicted):
+                entries.popitem(last=False)
+        return evicted
+
+    def purge_expired(self) -> int:
+        now = time.monotonic()
+        removed = 0
+        with self._lock:
+            for entries in self._data.values():
+                # Expired entries sit at the front; stop at the first live one.
+                while entries:
+                    key, item = next(iter(entries.items()))
+                    if self._live(item, now):
+                        break
+                    del entries[key]
+                    removed += 1
+        return removed
+
+
+class DatabaseStateStore(StateStore):
+    def __init__(self, bind=engine):
+        super().__init__()
+        self._engine = bind
+        self._table = SharedState.__table__
+
+    def _not_expired(self, now: datetime):
+        c = self._table.c
+        return (c.expires_at.is_(None)) | (c.expires_at > now)
+
+    def _where_key(self, namespace: str, key: str):
+        return (self._table.c.namespace == namespace, self._table.c.key == key)
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        now = datetime.now(timezone.utc)
+        with self._engine.connect() as conn:
+            value = conn.scalar(
+                select(self._table.c.value).where(*self._where_key(namespace, key), self._not_expired(now))
+            )
+        return json.loads(value) if value is not None else None
+
+    def set(self, namespace: str, key: str, value: Any, ttl_seconds: Optional[int] = None) -> None:
+        now = datetime.now(timezone.utc)
+        expires_at = now + timedelta(seconds=ttl_seconds) if ttl_seconds else None
+        with self._engine.begin() as conn:
+            upsert_replace(
+                conn, self._table,
+                {"namespace": namespace, "key": key},
+                {"value": json.dumps(value), "expires_at": expires_at},
+            )
+        self._maybe_sweep()
+
+    def pop(self, namespace: str, key: str) -> Optional[Any]:
+        # DELETE ... RETURNING (SQLite >= 3.35, PostgreSQL) makes this a single atomic statement.
+        now = datetime.now(timezone.utc)
+        with self._engine.begin() as conn:
+            row = conn.execute(
+                delete(self._table)
+                .where(*self._where_key(namespace, key))
+                .returning(self._table.c.value, self._table.c.expires_at)
+            ).first()
+        if row is None:
+            return None
+        expires_at = row.expires_at
+        if expires_at is not None:
+            if expires_at.tzinfo is None:  # SQLite returns naive UTC
+                expires_at = expires_at.replace(tzinfo=timezone.utc)
+            if expires_at <= now:
+                return None
+        return json.loads(row.value)
+
+    def delete(self, namespace: str, key: str) -> None:
+        with self._engine.begin() as conn:
+            conn.execute(delete(self._table).where(*self._where_key(namespace, key)))
+
+    def count(self, namespace: str) -> int:
+        now = datetime.now(timezone.utc)
+        with self._engine.connect() as conn:
+            return conn.scalar(
+                select(func.count()).select_from(self._table)
+                .where(self._table.c.namespace == namespace, self._not_expired(now))
+            ) or 0
+
+    def evict_oldest(self, namespace: str, n: int) -> int:
+        c = self._table.c
+        oldest = (
+            select(c.key).where(c.namespace == namespace)
+            .order_by(c.expires_at.is_(None), c.expires_at).limit(n)
+        )
+        with self._engine.begin() as conn:
+            result = conn.execute(delete(self._table).where(c.namespace == namespace, c.key.in_(oldest)))
+        return result.rowcount
+
+    def purge_expired(self) -> int:
+        with self._engine.begin() as conn:
+            result = conn.execute(delete(self._table).where(self._table.c.expires_at <= datetime.now(timezone.utc)))
+        return result.rowcount
+
+
+class RedisStateStore(StateStore):
+    """
+    Values are plain keys with a Redis TTL. Each namespace also has a sorted set
+    of its keys scored by expiry time, for `count` and `evict_oldest`.
+    """
+
+    def __init__(self, url: str = SETTINGS.REDIS_URL, prefix: str = "tebnegar:"):
+        super().__init__()
+        self.url = url
+        self.prefix = prefix
+        self._client = None
+        self._namespaces: set = set()  # namespaces written by this process, for the sweep
+
+    @property
+    def client(self):
+        # Created on first use, i.e. after gunicorn has forked the workers.
+        if self._client is None:
+            try:
+                import redis
+            except ImportError:
+                raise RuntimeError("STATE_STORE_BACKEND=redis requires the 'redis' package.")
+            self._client = redis.Redis.from_url(self.url)
+        return self._client
+
+    def _key(self, namespace: str, key: str) -> str:
+        return f"{self.prefix}{namespace}:{key}"
+
+    def _index(self, namespace: str) -> str:
+        return f"{self.prefix}{namespace}:__index__"
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        value = self.client.get(self._key(namespace, key))
+        return json.loads(value) if value is not None else None
+
+    def set(self, namespace: str, key: str, value: Any, ttl_seconds: Optional[int] = None) -> None:
+        expires_at = time.time() + ttl_seconds if ttl_seconds else float("inf")
+        pipe = self.client.pipeline()
+        pipe.set(self._key(namespace, key), json.dumps(value), ex=ttl_seconds or None)
+        pipe.zadd(self._index(namespace), {key: expires_at})
+        pipe.execute()
+        self._namespaces.add(namespace)
+        self._maybe_sweep()
+
+    def pop(self, namespace: str, key: str) -> Optional[Any]:
+        pipe = self.client.pipeline()
+        pipe.getdel(self._key(namespace, key))  # GETDEL: Redis >= 6.2
+        pipe.zrem(self._index(namespace), key)
+        value = pipe.execute()[0]
+        return json.loads(value) if value is not None else None
+
+    def delete(self, namespace: str, key: str) -> None:
+        pipe = self.client.pipeline()
+        pipe.delete(self._key(namespace, key))
+        pipe.zrem(self._index(namespace), key)
+        pipe.execute()
+
+    def count(self, namespace: str) -> int:
+        return self.client.zcount(self._index(namespace), f"({time.time()}", "+inf")
+
+    def evict_oldest(self, namespace: str, n: int) -> int:
+        popped = self.client.zpopmin(self._index(namespace), n)
+        if popped:
+            self.client.delete(*(self._key(namespace, k.decode()) for k, _ in popped))
+        return len(popped)
+
+    def purge_expired(self) -> int:
+        # The values expire on their own; only the indexes need trimming.
+        now = time.time()
+        return sum(self.client.zremrangebyscore(self._index(ns), "-inf", now) for ns in list(self._namespaces))
+
+
+def create_state_store(backend: str = SETTINGS.STATE_STORE_BACKEND) -> StateStore:
+    """Factory for the configured backend."""
+    if backend == "memory":
+        return MemoryStateStore()
+    if backend == "database":
+        return DatabaseStateStore()
+    if backend == "redis":
+        return RedisStateStore()
+    raise ValueError(f"State store backend '{backend}' not supported.")
+
+
+# Global instance
+state_store = create_state_store()
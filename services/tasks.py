@@ -0,0 +1,51 @@
+"""
+Handlers for the background jobs in `services.jobs`.
+
+Imported by the app (main.py) so the workers know them. Each handler gets
+the job's JSON payload and raises to have the attempt retried.
+"""
+
+import logging
+import uuid
+from typing import Any, Dict
+
+from config import SETTINGS
+from db.session import SessionLocal
+from repository import conversation as conversation_repo
+from services.ai.ai_manager import ai_manager
+from services.archive import conversation_archive
+from services.extraction import extraction_pipeline
+from services.jobs import job_runner
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_title(conversation_id: uuid.UUID) -> None:
+    """Queues title generation for a conversation, unless it is already queued or running."""
+    job_runner.enqueue("conversation_title", {"conversation_id": str(conversation_id)}, key=f"title:{conversation_id}")
+
+
+@job_runner.task("conversation_title")
+def conversation_title(payload: Dict[str, Any]) -> None:
+    conversation_id = uuid.UUID(payload["conversation_id"])
+    # Provider errors propagate, so the attempt is retried.
+    title = ai_manager.generate_title(patient_id=str(conversation_id), raise_errors=True)
+    if title == ai_manager.FALLBACK_TITLE:
+        # No history yet; keep the default.
+        return
+    with SessionLocal() as db:
+        conversation_repo.set_generated_title(db, id=conversation_id, title=title)
+
+
+@job_runner.task("extraction_backfill")
+def extraction_backfill(payload: Dict[str, Any]) -> None:
+    done, failed = extraction_pipeline.backfill(limit=SETTINGS.EXTRACTION_BACKFILL_LIMIT)
+    if done or failed:
+        logger.info("Extraction backfill: %d extracted, %d failed", done, failed)
+
+
+@job_runner.task("archive_idle")
+def archive_idle(payload: Dict[str, Any]) -> None:
+    with SessionLocal() as db:
+        count = conversation_archive.archive_idle(db)
+    logger.info("Archived %d idle conversations", count)
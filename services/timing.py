@@ -0,0 +1,208 @@
+"""
+Per-request phase timing.
+
+`ServerTimingMiddleware` starts a `RequestTimer` for every HTTP request and
+makes it the current one (a context variable, so it follows the request into
+FastAPI's threadpool). Code anywhere on the request path records named phases
+into it:
+
+    with timing.phase("ai_provider"):
+        reply = provider.send_message(...)
+
+    timing.mark("validation")  # time since the previous phase ended
+
+Outside a request both are no-ops, so repositories and services can be
+instrumented unconditionally. Phases with the same name add up.
+
+When the response starts, the phases (plus `total`) are sent in a
+`Server-Timing` header, which browser dev tools show next to the request.
+Optionally one JSON log line per request is written, and requests slower than
+`SLOW_REQUEST_THRESHOLD_MS` are sampled into the `slow_requests` table.
+"""
+
+import asyncio
+import json
+import logging
+import random
+import sys
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+from config import SETTINGS
+from services.metrics import route_template
+
+logger = logging.getLogger(__name__)
+
+# Per-request JSON lines go to their own logger so they can be routed separately.
+request_log = logging.getLogger("tebnegar.request_timing")
+if SETTINGS.REQUEST_TIMING_LOG and not request_log.handlers:
+    request_log.addHandler(logging.StreamHandler(sys.stderr))
+    request_log.setLevel(logging.INFO)
+    request_log.propagate = False
+
+
+class RequestTimer:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self._last = self.start  # end of the previous phase
+        self.phases: Dict[str, float] = {}  # name -> seconds, in first-recorded order
+        # SQL statements run for this request (db/query_log.py); they overlap the phases.
+        self.queries = 0
+        self.query_seconds = 0.0
+
+    def record(self, name: str, seconds: float) -> None:
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._last = time.perf_counter()
+            self.record(name, self._last - start)
+
+    def count_query(self, seconds: float) -> None:
+        self.queries += 1
+        self.query_seconds += seconds
+
+    def mark(self, name: str) -> None:
+        """Records the time since the previous phase ended (or the request started) as `name`."""
+        now = time.perf_counter()
+        self.record(name, now - self._last)
+        self._last = now
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    def server_timing(self, total: float) -> str:
+        parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.phases.items()]
+        if self.queries:
+            parts.append(f'db;dur={self.query_seconds * 1000:.1f};desc="{self.queries} queries"')
+        parts.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(parts)
+
+    def phases_ms(self) -> Dict[str, float]:
+        return {name: round(seconds * 1000, 1) for name, seconds in self.phases.items()}
+
+
+_current: ContextVar[Optional[RequestTimer]] = ContextVar("request_timer", default=None)
+
+
+def current() -> Optional[RequestTimer]:
+    """The timer of the request being handled, if any."""
+    return _current.get()
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Times the block as phase `name` of the current request (no-op outside a request)."""
+    timer = _current.get()
+    if timer is None:
+        yield
+        return
+    with timer.phase(name):
+        yield
+
+
+def mark(name: str) -> None:
+    """Records the time since the previous phase of the current request as `name`."""
+    timer = _current.get()
+    if timer is not None:
+        timer.mark(name)
+
+
+# ---- Slow-request sampling ----
+
+def _record_slow_request(sample: dict) -> None:
+    from db.session import SessionLocal
+    from repository.slow_request import slow_request
+
+    try:
+        with SessionLocal() as db:
+            slow_request.record(db, **sample)
+    except Exception:
+        logger.exception("Could not store slow request sample")
+
+
+# ---- Middleware ----
+
+class ServerTimingMiddleware:
+    """Pure ASGI middleware that owns the request timer and reports it."""
+
+    def __init__(
+        self,
+        app,
+        *,
+        header: bool = SETTINGS.SERVER_TIMING_ENABLED,
+        log: bool = SETTINGS.REQUEST_TIMING_LOG,
+        slow_threshold_ms: int = SETTINGS.SLOW_REQUEST_THRESHOLD_MS,
+        slow_sample_rate: float = SETTINGS.SLOW_REQUEST_SAMPLE_RATE,
+        query_count_warn_threshold: int = SETTINGS.QUERY_COUNT_WARN_THRESHOLD,
+    ):
+        self.app = app
+        self.header = header
+        self.log = log
+        self.slow_threshold = slow_threshold_ms / 1000 if slow_threshold_ms > 0 else None
+        self.slow_sample_rate = slow_sample_rate
+        self.query_count_warn_threshold = query_count_warn_threshold
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timer = RequestTimer()
+        token = _current.set(timer)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                # Whatever ran after the last phase (response validation and serialization).
+                if timer.phases:
+                    timer.mark("serialize")
+                if self.header:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", timer.server_timing(timer.elapsed()).encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            self._report(scope, timer, status_code)
+
+    def _report(self, scope, timer: RequestTimer, status_code: int) -> None:
+        total = timer.elapsed()
+        if 0 < self.query_count_warn_threshold < timer.queries:
+            logger.warning(
+                "%s %s ran %d queries (more than %d); look for lazy loads in a loop",
+                scope["method"], route_template(scope), timer.queries, self.query_count_warn_threshold,
+            )
+        sampled = self._is_sampled(total)
+        if not (self.log or sampled):
+            return
+        sample = {
+            "method": scope["method"],
+            "route": route_template(scope),
+            "status_code": status_code,
+            "duration_ms": round(total * 1000, 1),
+            "db_queries": timer.queries,
+            "db_ms": round(timer.query_seconds * 1000, 1),
+            "phases": timer.phases_ms(),
+        }
+        if self.log:
+            request_log.info(json.dumps(sample))
+        if sampled:
+            # Off the event loop and off the request: the response has already been sent.
+            asyncio.get_running_loop().run_in_executor(None, _record_slow_request, sample)
+
+    def _is_sampled(self, total: float) -> bool:
+        return self.slow_threshold is not None and total >= self.slow_threshold and (
+            self.slow_sample_rate >= 1 or random.random() < self.slow_sample_rate
+        )
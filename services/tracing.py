@@ -0,0 +1,167 @@
+"""
+OpenTelemetry tracing: one trace per request with spans for the route, every
+repository call, every SQL statement and the AI provider call.
+
+The request span (and dependency / endpoint / serialization spans) come from
+FastAPI's built-in telemetry, which continues an incoming `traceparent`; this
+module adds the rest. Instrumentation only uses the OpenTelemetry API. `setup()` installs the SDK
+tracer provider in each worker when `TRACING_EXPORTER` is set:
+
+- ``none`` (default): no provider; every helper here returns immediately.
+- ``file``: spans as JSON lines in `TRACING_FILE_DIR/traces-<pid>.jsonl`.
+- ``otlp``: OTLP/HTTP to a local collector at `TRACING_OTLP_ENDPOINT`
+  (needs `opentelemetry-exporter-otlp-proto-http`).
+
+Sampling is parent-based with `TRACING_SAMPLE_RATIO` for new traces, so an
+incoming `traceparent` header decides for requests that are part of a larger
+trace. The trace id of each AI reply is stored on its `AIAnalysis` row.
+"""
+
+import functools
+import inspect
+import os
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from opentelemetry import trace
+from opentelemetry.trace import SpanKind, Status, StatusCode
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from config import SETTINGS
+
+tracer = trace.get_tracer("tebnegar")
+
+_provider = None  # the SDK TracerProvider once set up
+
+
+def _exporter(kind: str):
+    if kind == "file":
+        from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+
+        os.makedirs(SETTINGS.TRACING_FILE_DIR, exist_ok=True)
+        # One file per worker process so concurrent writers never interleave lines.
+        out = open(os.path.join(SETTINGS.TRACING_FILE_DIR, f"traces-{os.getpid()}.jsonl"), "a")
+        return ConsoleSpanExporter(out=out, formatter=lambda span: span.to_json(indent=None) + "\n")
+    if kind == "otlp":
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        except ImportError:
+            raise RuntimeError("TRACING_EXPORTER=otlp requires the 'opentelemetry-exporter-otlp-proto-http' package.")
+        return OTLPSpanExporter(endpoint=SETTINGS.TRACING_OTLP_ENDPOINT)
+    raise ValueError(f"Tracing exporter '{kind}' not supported.")
+
+
+def setup(kind: str = SETTINGS.TRACING_EXPORTER, sample_ratio: float = SETTINGS.TRACING_SAMPLE_RATIO) -> None:
+    """Installs the tracer provider for this process (call once per worker, after fork)."""
+    global _provider
+    if kind == "none" or _provider is not None:
+        return
+    try:
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+    except ImportError:
+        raise RuntimeError("TRACING_EXPORTER requires the 'opentelemetry-sdk' package.")
+
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": "tebnegar-api"}),
+        sampler=ParentBased(TraceIdRatioBased(sample_ratio)),
+    )
+    provider.add_span_processor(BatchSpanProcessor(_exporter(kind)))
+    trace.set_tracer_provider(provider)
+    _provider = provider
+
+
+def shutdown() -> None:
+    """Flushes buffered spans."""
+    if _provider is not None:
+        _provider.shutdown()
+
+
+# ---- Helpers ----
+
+@contextmanager
+def span(name: str, *, kind: SpanKind = SpanKind.INTERNAL, attributes: Optional[Dict[str, Any]] = None) -> Iterator[None]:
+    """A child span of the current one (no-op when tracing is off)."""
+    if _provider is None:
+        yield
+        return
+    with tracer.start_as_current_span(name, kind=kind, attributes=attributes):
+        yield
+
+
+def set_attributes(attributes: Dict[str, Any]) -> None:
+    """Adds attributes to the current span, if it is being recorded."""
+    if _provider is None:
+        return
+    current = trace.get_current_span()
+    if current.is_recording():
+        current.set_attributes(attributes)
+
+
+def current_trace_id() -> Optional[str]:
+    """Hex trace id of the current span if it is sampled, else None."""
+    if _provider is None:
+        return None
+    context = trace.get_current_span().get_span_context()
+    if not (context.is_valid and context.trace_flags.sampled):
+        return None
+    return trace.format_trace_id(context.trace_id)
+
+
+def traced_methods(cls):
+    """
+    Class decorator for repositories: each public method runs in a span named
+    `<Class>.<method>` (the runtime class, so inherited CRUDBase methods show
+    which repository called them).
+    """
+    for name, member in list(vars(cls).items()):
+        if name.startswith("_") or not inspect.isfunction(member):
+            continue
+        setattr(cls, name, _traced(member))
+    return cls
+
+
+def _traced(method):
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if _provider is None:
+            return method(self, *args, **kwargs)
+        with tracer.start_as_current_span(f"{type(self).__name__}.{method.__name__}"):
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+# ---- SQL statements ----
+
+def instrument_engine(engine: Engine) -> None:
+    """One CLIENT span per SQL statement, as a child of whatever span issued it."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if _provider is None:
+            return
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "SQL"
+        conn.info.setdefault("tracing_spans", []).append(tracer.start_span(
+            operation,
+            kind=SpanKind.CLIENT,
+            attributes={"db.system": conn.dialect.name, "db.operation.name": operation, "db.query.text": statement},
+        ))
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        spans = conn.info.get("tracing_spans")
+        if spans:
+            spans.pop().end()
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        conn = exception_context.connection
+        spans = conn.info.get("tracing_spans") if conn is not None else None
+        if spans:
+            failed = spans.pop()
+            failed.record_exception(exception_context.original_exception)
+            failed.set_status(Status(StatusCode.ERROR))
+            failed.end()
@@ -0,0 +1,58 @@
+"""
+Red-flag symptom phrases for `services.triage`, by category.
+
+Phrases are written naturally; the matcher normalizes them the same way as
+the messages (letter variants, zero-width joiners, punctuation, case), and
+prefixes and suffixes written apart are joined ("می خواهم" is "می‌خواهم"), so
+one spelling of those is enough. Compounds that are also written as two words
+("خونریزی" / "خون ریزی") need both. Persian phrases match at the start of a
+word and may run into a suffix ("سینه درد" matches "سینه دردم"), English ones
+must match whole words.
+"""
+
+RED_FLAGS = {
+    "chest_pain": [
+        "درد قفسه سینه", "درد سینه", "سینه درد", "فشار روی سینه", "فشار در قفسه سینه", "سنگینی قفسه سینه",
+        "درد قلب", "حمله قلبی", "سکته قلبی", "درد سینه که به دست چپ", "سینه‌ام درد", "سینم درد", "قلبم درد",
+        "chest pain", "chest tightness", "crushing chest", "pressure in my chest", "heart attack",
+    ],
+    "breathing": [
+        "تنگی نفس شدید", "نمی‌توانم نفس بکشم", "نمیتونم نفس بکشم", "نفسم بالا نمیاد", "نفسم بند آمده",
+        "نفسم بند اومده", "خفگی", "کبود شدن لب", "لب‌هایم کبود",
+        "can't breathe", "cannot breathe", "unable to breathe", "difficulty breathing", "struggling to breathe",
+        "severe shortness of breath", "choking", "blue lips",
+    ],
+    "stroke": [
+        "سکته مغزی", "بی‌حسی یک طرف", "بی حسی نیمه", "فلج شدن", "فلج یک طرف", "کج شدن صورت", "افتادگی صورت",
+        "اختلال تکلم", "زبانم سنگین شده", "ناگهان نمی‌توانم حرف بزنم",
+        "stroke", "face drooping", "facial droop", "slurred speech", "numbness on one side", "weakness on one side",
+        "sudden confusion",
+    ],
+    "consciousness": [
+        "بیهوش", "از هوش رفت", "از هوش رفتم", "غش کرد", "تشنج", "هوشیاری ندارد",
+        "unconscious", "unresponsive", "passed out", "fainted", "seizure", "convulsion",
+    ],
+    "bleeding": [
+        "خونریزی شدید", "خونریزی بند نمیاد", "خونریزی قطع نمی‌شود", "استفراغ خونی", "استفراغ خون", "سرفه خونی",
+        "خون بالا آوردن", "مدفوع سیاه", "خونریزی در بارداری",
+        "خون ریزی شدید", "خون ریزی بند نمیاد", "خون ریزی قطع نمی‌شود", "خون ریزی در بارداری",
+        "severe bleeding", "bleeding heavily", "won't stop bleeding", "vomiting blood", "coughing up blood",
+        "black stool", "bleeding during pregnancy",
+    ],
+    "self_harm": [
+        "خودکشی", "می‌خواهم بمیرم", "میخوام بمیرم", "خودمو بکشم", "خودم را بکشم", "به خودم آسیب",
+        "suicide", "suicidal", "kill myself", "want to die", "end my life", "self harm", "hurt myself",
+    ],
+    "anaphylaxis": [
+        "تورم گلو", "ورم گلو", "تورم زبان", "ورم زبان", "تورم صورت و لب", "شوک آنافیلاکسی",
+        "throat swelling", "throat is closing", "swollen tongue", "anaphylaxis", "anaphylactic",
+    ],
+    "poisoning": [
+        "مسمومیت شدید", "اوردوز", "قرص زیادی خوردم", "سم خوردم", "سم خورده",
+        "overdose", "overdosed", "swallowed poison", "took too many pills",
+    ],
+    "severe_headache": [
+        "بدترین سردرد عمرم", "سردرد ناگهانی و شدید", "سردرد شدید با گردن خشک",
+        "worst headache of my life", "thunderclap headache", "sudden severe headache", "stiff neck and fever",
+    ],
+}
@@ -0,0 +1,123 @@
+"""
+Shared test setup.
+
+Settings are read when `config` is first imported, so the environment is
+fixed here before any app module is: a throwaway SQLite database and
+directories, and none of the background components (extraction, jobs,
+rate limits) unless a test starts them itself. The AI provider is a local
+fake; nothing talks to the network.
+"""
+
+import os
+import tempfile
+import uuid
+
+TMP_DIR = tempfile.mkdtemp(prefix="tebnegar-tests-")
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TMP_DIR, 'test.db')}"
+for _name, _value in {
+    "GEMINI_API_KEY": "test-key",
+    "GEMINI_MODEL": "test-model",
+    "ADMIN_API_KEY": "test-admin-key",
+    "DEVELOPMENT": "false",
+    "GOOGLE_CLIENT_ID": "test-client-id",
+    "GOOGLE_CLIENT_SECRET": "test-client-secret",
+    "GOOGLE_REDIRECT_URI": "http://testserver/api/v1/auth/google/callback",
+    "SECRET_KEY": "test-secret-key",
+}.items():
+    os.environ.setdefault(_name, _value)
+os.environ.update({
+    "BACKUP_DIR": os.path.join(TMP_DIR, "backups"),
+    "ARCHIVE_DIR": os.path.join(TMP_DIR, "archive"),
+    "PROFILE_DIR": os.path.join(TMP_DIR, "profiles"),
+    "SESSION_BUFFER_DEAD_LETTER_PATH": os.path.join(TMP_DIR, "dead_letters", "session_buffer.jsonl"),
+    "EXTRACTION_ENABLED": "false",
+    "JOBS_ENABLED": "false",
+    "RATE_LIMIT_ENABLED": "false",
+})
+
+from typing import Any, Dict, List, Optional  # noqa: E402
+
+import pytest  # noqa: E402
+
+from services.ai.base import AIProvider  # noqa: E402
+
+class FakeChat:
+    def __init__(self, history: Optional[List[Dict[str, Any]]] = None):
+        self.history = list(history or [])
+
+    def send_message(self, text: str):
+        reply = FakeProvider.reply_to(text)
+        self.history += [{"role": "user", "parts": [text]}, {"role": "model", "parts": [reply]}]
+        return type("Response", (), {"text": reply})()
+
+
+class FakeProvider(AIProvider):
+    """Answers instantly and deterministically; `json_results` is what `generate_json` returns."""
+
+    model_name = "fake-model"
+
+    def __init__(self):
+        self.json_results: Any = []
+
+    @staticmethod
+    def reply_to(text: str) -> str:
+        return f"reply to: {text}"
+
+    def start_session(self, history=None):
+        return FakeChat(history)
+
+    def dump_history(self, session) -> List[Dict[str, Any]]:
+        return list(session.history)
+
+    def send_message(self, session, message: str) -> str:
+        return session.send_message(message).text
+
+    def generate_json(self, prompt: str) -> Any:
+        return self.json_results
+
+
+@pytest.fixture(scope="session")
+def provider() -> FakeProvider:
+    from services.ai.ai_manager import ai_manager
+    from services.ai.session_manager import SessionManager
+
+    fake = FakeProvider()
+    ai_manager._provider_instance = fake
+    ai_manager._sessions = SessionManager(fake)
+    return fake
+
+
+@pytest.fixture(scope="session")
+def client(provider):
+    """The app with its lifespan run (migrations, write buffer), shared by all tests."""
+    from fastapi.testclient import TestClient
+
+    import main
+
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def admin_headers():
+    return {"X-API-KEY": os.environ["ADMIN_API_KEY"]}
+
+
+@pytest.fixture
+def db(client):
+    from db.session import SessionLocal
+
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def conversation_id(client) -> uuid.UUID:
+    """A new anonymous session's first conversation."""
+    response = client.post("/api/v1/sessions/", json={})
+    assert response.status_code == 201, response.text
+    return uuid.UUID(response.json()["conversation_id"])
@@ -0,0 +1,91 @@
+-- Schema of a database created by the app before migrations existed (the
+-- import-time `Base.metadata.create_all` of the baseline release, SQLite).
+
+CREATE TABLE users (
+	id UUID NOT NULL, 
+	google_id VARCHAR NOT NULL, 
+	email VARCHAR NOT NULL, 
+	full_name VARCHAR, 
+	picture_url VARCHAR, 
+	created_at DATETIME, 
+	updated_at DATETIME, 
+	PRIMARY KEY (id)
+);
+
+CREATE UNIQUE INDEX ix_users_email ON users (email);
+
+CREATE UNIQUE INDEX ix_users_google_id ON users (google_id);
+
+CREATE TABLE sessions (
+	id UUID NOT NULL, 
+	ip_address VARCHAR(45), 
+	user_agent TEXT, 
+	landing_page_url TEXT, 
+	referrer_url TEXT, 
+	utm_source VARCHAR(255), 
+	utm_medium VARCHAR(255), 
+	utm_campaign VARCHAR(255), 
+	utm_term VARCHAR(255), 
+	utm_content VARCHAR(255), 
+	client_metadata JSON, 
+	started_at DATETIME DEFAULT CURRENT_TIMESTAMP, 
+	ended_at DATETIME, 
+	user_id UUID, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(user_id) REFERENCES users (id)
+);
+
+CREATE INDEX ix_sessions_user_id ON sessions (user_id);
+
+CREATE INDEX ix_sessions_utm_source ON sessions (utm_source);
+
+CREATE INDEX ix_sessions_utm_campaign ON sessions (utm_campaign);
+
+CREATE INDEX ix_sessions_utm_medium ON sessions (utm_medium);
+
+CREATE TABLE conversations (
+	id UUID NOT NULL, 
+	session_id UUID NOT NULL, 
+	title VARCHAR(255), 
+	created_at DATETIME DEFAULT CURRENT_TIMESTAMP, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(session_id) REFERENCES sessions (id)
+);
+
+CREATE INDEX ix_conversations_session_id ON conversations (session_id);
+
+CREATE TABLE messages (
+	id UUID NOT NULL, 
+	conversation_id UUID NOT NULL, 
+	sender_type VARCHAR(4) NOT NULL, 
+	content TEXT NOT NULL, 
+	created_at DATETIME DEFAULT CURRENT_TIMESTAMP, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(conversation_id) REFERENCES conversations (id)
+);
+
+CREATE INDEX ix_messages_conversation_id ON messages (conversation_id);
+
+CREATE TABLE response_feedback (
+	id UUID NOT NULL, 
+	message_id UUID NOT NULL, 
+	feedback_type VARCHAR(7) NOT NULL, 
+	comment TEXT, 
+	created_at DATETIME DEFAULT CURRENT_TIMESTAMP, 
+	PRIMARY KEY (id), 
+	UNIQUE (message_id), 
+	FOREIGN KEY(message_id) REFERENCES messages (id)
+);
+
+CREATE TABLE ai_analyses (
+	id UUID NOT NULL, 
+	message_id UUID NOT NULL, 
+	potential_conditions JSON, 
+	criticality_flag BOOLEAN, 
+	processing_time_ms INTEGER, 
+	ai_provider VARCHAR(100), 
+	token_usage JSON, 
+	PRIMARY KEY (id), 
+	UNIQUE (message_id), 
+	FOREIGN KEY(message_id) REFERENCES messages (id)
+);
@@ -0,0 +1,111 @@
+import json
+import multiprocessing
+from datetime import datetime, timezone
+
+from sqlalchemy import select
+
+from db.model.archived_conversation import ArchivedConversation
+from db.model.attribution import AttributionCube
+from db.model.conversation import Conversation
+from db.model.message import Message, SenderType
+from db.session import SessionLocal
+from services.archive import ConversationArchive, conversation_archive
+
+
+def _send(client, conversation_id, text):
+    response = client.post(f"/api/v1/messages/{conversation_id}", json={"content": text})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def _archive(db, conversation_id):
+    return conversation_archive.archive_conversation(db, db.get(Conversation, conversation_id))
+
+
+def test_message_written_during_archival_stays_hot(client, db, conversation_id, monkeypatch):
+    _send(client, conversation_id, "first question")
+    append_frame = conversation_archive._append_frame
+
+    def append_then_race(document):
+        # Another request adds a message after the snapshot was taken.
+        with SessionLocal() as other:
+            other.add(Message(conversation_id=conversation_id, sender_type=SenderType.USER, content="late message"))
+            other.commit()
+        return append_frame(document)
+
+    monkeypatch.setattr(conversation_archive, "_append_frame", append_then_race)
+    entry = _archive(db, conversation_id)
+
+    assert entry.message_count == 2
+    hot = db.scalars(select(Message.content).where(Message.conversation_id == conversation_id)).all()
+    assert hot == ["late message"]
+
+    monkeypatch.undo()
+    entry = _archive(db, conversation_id)
+    assert [m["content"] for m in conversation_archive.read_frame(entry)["messages"]] == [
+        "first question", "reply to: first question", "late message",
+    ]
+
+
+def _append_many(archive_dir, worker, count):
+    archive = ConversationArchive(archive_dir=archive_dir)
+    return [
+        archive._append_frame({"worker": worker, "n": n, "padding": "x" * (n * 37 % 500)})
+        for n in range(count)
+    ]
+
+
+def test_concurrent_appenders_get_their_own_offsets(tmp_path):
+    with multiprocessing.get_context("fork").Pool(4) as pool:
+        results = pool.starmap(_append_many, [(str(tmp_path), worker, 50) for worker in range(4)])
+
+    archive = ConversationArchive(archive_dir=str(tmp_path))
+    seen = set()
+    for worker, frames in enumerate(results):
+        for n, (segment, offset, length) in enumerate(frames):
+            entry = ArchivedConversation(segment=segment, frame_offset=offset, frame_length=length)
+            document = archive.read_frame(entry)
+            assert (document["worker"], document["n"]) == (worker, n)
+            seen.add(offset)
+    assert len(seen) == 200
+
+
+def test_export_includes_archived_messages(client, db, conversation_id, admin_headers):
+    _send(client, conversation_id, "archived question")
+    _archive(db, conversation_id)
+    _send(client, conversation_id, "hot question")
+
+    response = client.get("/api/v1/admin/export/conversations", headers=admin_headers)
+    assert response.status_code == 200, response.text
+    exported = [json.loads(line) for line in response.text.splitlines()]
+    mine = [c for c in exported if c["conversation_id"] == str(conversation_id)]
+    assert len(mine) == 1
+    assert [m["content"] for m in mine[0]["messages"]] == [
+        "archived question", "reply to: archived question", "hot question", "reply to: hot question",
+    ]
+    assert mine[0]["messages"][1]["ai_provider"] == "FakeProvider"
+
+    response = client.get(
+        "/api/v1/admin/export/conversations", params={"ai_provider": "FakeProvider"}, headers=admin_headers,
+    )
+    assert str(conversation_id) in response.text
+    response = client.get(
+        "/api/v1/admin/export/conversations", params={"ai_provider": "OtherProvider"}, headers=admin_headers,
+    )
+    assert str(conversation_id) not in response.text
+
+
+def test_attribution_backfill_counts_archived_messages(client, db, conversation_id, admin_headers):
+    _send(client, conversation_id, "question")
+
+    def messages_today():
+        return sum(db.scalars(select(AttributionCube.messages).where(AttributionCube.day == datetime.now(timezone.utc).date())).all())
+
+    response = client.post("/api/v1/admin/attribution/backfill", headers=admin_headers)
+    assert response.status_code == 200, response.text
+    before = messages_today()
+
+    _archive(db, conversation_id)
+    client.post("/api/v1/admin/attribution/backfill", headers=admin_headers)
+    db.expire_all()
+    assert messages_today() == before
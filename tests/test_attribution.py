@@ -0,0 +1,35 @@
+"""Attribution cubes: live maintenance and the backfill agree on where logins count."""
+
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+
+from db.model.attribution import AttributionCube
+from db.model.session import Session as SessionModel
+from db.model.user import User
+
+
+def _logins(db, day, source):
+    db.expire_all()
+    return sum(db.scalars(
+        select(AttributionCube.logins).where(AttributionCube.day == day, AttributionCube.utm_source == source)
+    ).all())
+
+
+def test_login_counts_on_the_day_the_session_started(client, db, admin_headers):
+    source = uuid.uuid4().hex
+    started = datetime.now(timezone.utc) - timedelta(days=3)
+    session = SessionModel(utm_source=source, started_at=started)
+    user = User(google_id=uuid.uuid4().hex, email=f"{uuid.uuid4().hex}@example.com")
+    db.add_all([session, user])
+    db.commit()
+
+    session.user_id = user.id  # signed in three days after landing
+    db.commit()
+    assert _logins(db, started.date(), source) == 1
+    assert _logins(db, datetime.now(timezone.utc).date(), source) == 0
+
+    response = client.post("/api/v1/admin/attribution/backfill", headers=admin_headers)
+    assert response.status_code == 200, response.text
+    assert _logins(db, started.date(), source) == 1
@@ -0,0 +1,114 @@
+import gzip
+import os
+import sqlite3
+import threading
+import uuid
+
+import pytest
+
+from db.model.session import Session as SessionModel
+from db.session import engine
+from services.backup import BackupManager
+
+
+@pytest.fixture
+def sqlite_only():
+    if engine.dialect.name != "sqlite":
+        pytest.skip("the SQLite snapshot path")
+
+
+def _writer(stop: threading.Event):
+    conn = sqlite3.connect(engine.url.database, timeout=30)
+    conn.execute("CREATE TABLE IF NOT EXISTS backup_churn (n INTEGER)")
+    conn.commit()
+    n = 0
+    while not stop.is_set():
+        conn.execute("INSERT INTO backup_churn VALUES (?)", (n,))
+        conn.commit()
+        n += 1
+    conn.close()
+
+
+def test_snapshot_completes_under_constant_writes(sqlite_only, client, tmp_path):
+    stop = threading.Event()
+    writer = threading.Thread(target=_writer, args=(stop,))
+    writer.start()
+    try:
+        info = BackupManager(backup_dir=str(tmp_path), timeout_seconds=60).take_snapshot()
+    finally:
+        stop.set()
+        writer.join()
+
+    restored = tmp_path / "restored.db"
+    with gzip.open(tmp_path / info.name) as src:
+        restored.write_bytes(src.read())
+    conn = sqlite3.connect(restored)
+    try:
+        assert conn.execute("PRAGMA integrity_check").fetchone() == ("ok",)
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        assert {"users", "messages", "alembic_version"} <= tables
+    finally:
+        conn.close()
+
+
+def test_snapshot_is_aborted_after_the_timeout(sqlite_only, client, tmp_path, monkeypatch):
+    monkeypatch.setattr("services.backup.SQLITE_PROGRESS_INTERVAL", 1)  # the test database is tiny
+    manager = BackupManager(backup_dir=str(tmp_path), timeout_seconds=0)
+    with pytest.raises(TimeoutError):
+        manager.take_snapshot()
+    assert manager.last_error.startswith("TimeoutError")
+    assert os.listdir(tmp_path) == []
+
+
+def _restore(tmp_path, body):
+    restored = tmp_path / "restored.db"
+    restored.write_bytes(gzip.decompress(body))
+    return sqlite3.connect(restored)
+
+
+def test_download_includes_writes_since_the_last_download(sqlite_only, client, db, admin_headers, tmp_path):
+    first = client.get("/api/v1/admin/backup/download-db", headers=admin_headers)
+    assert first.status_code == 200
+
+    session = SessionModel(id=uuid.uuid4())
+    db.add(session)
+    db.commit()
+    second = client.get("/api/v1/admin/backup/download-db", headers=admin_headers)
+    assert second.status_code == 200
+    conn = _restore(tmp_path, second.content)
+    try:
+        assert conn.execute("SELECT count(*) FROM sessions WHERE id = ?", (session.id.hex,)).fetchone() == (1,)
+    finally:
+        conn.close()
+
+
+def test_download_reuses_a_snapshot_younger_than_the_max_age(sqlite_only, client, tmp_path, monkeypatch):
+    manager = BackupManager(backup_dir=str(tmp_path), download_max_age_seconds=600)
+    taken = []
+    take_snapshot = manager.take_snapshot
+    monkeypatch.setattr(manager, "take_snapshot", lambda: taken.append(1) or take_snapshot())
+
+    first = manager.recent_snapshot()
+    assert manager.recent_snapshot() == first
+    assert len(taken) == 1
+    manager.download_max_age_seconds = 0
+    manager.recent_snapshot()
+    assert len(taken) == 2
+
+
+def test_writers_are_not_blocked_by_an_open_read(sqlite_only, client, db):
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+
+    # What a snapshot holds for its whole duration: one read transaction.
+    reader = sqlite3.connect(engine.url.database)
+    reader.execute("BEGIN")
+    reader.execute("SELECT count(*) FROM sessions").fetchone()
+    try:
+        writer = sqlite3.connect(engine.url.database, timeout=0)
+        writer.execute("INSERT INTO sessions (id) VALUES (?)", (uuid.uuid4().hex,))
+        writer.commit()
+        writer.close()
+    finally:
+        reader.rollback()
+        reader.close()
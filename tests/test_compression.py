@@ -0,0 +1,146 @@
+"""Compression middleware: negotiation, the size threshold and unbuffered streaming."""
+
+import asyncio
+import gzip
+import json
+import zlib
+
+import pytest
+import zstandard
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+from fastapi.testclient import TestClient
+
+from services import compression
+from services.compression import CompressionMiddleware, negotiate
+
+
+@pytest.mark.parametrize("accept, expected", [
+    ("gzip", "gzip"),
+    ("gzip, deflate, zstd", "zstd"),
+    ("gzip;q=1.0, zstd;q=0.5", "gzip"),
+    ("GZIP", "gzip"),
+    ("*", "zstd"),
+    ("*;q=0.5, gzip;q=0.8", "gzip"),
+    ("zstd;q=0, *", "gzip"),
+    ("zstd;q=0, gzip;q=0", None),
+    ("gzip;q=oops, zstd;q=0.1", "zstd"),
+    ("identity", None),
+    ("deflate", None),
+    (" , ", None),
+])
+def test_negotiate(accept, expected):
+    assert negotiate(accept) == expected
+
+
+def test_negotiate_br_only_when_available():
+    assert negotiate("br") == ("br" if compression.brotli is not None else None)
+
+
+BIG = {"messages": ["سلام، از دیروز سرم درد می‌کند و تب دارم " * 3 + str(i) for i in range(100)]}
+
+
+@pytest.fixture(scope="module")
+def app_client():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, enabled=True, min_bytes=1024)
+
+    @app.get("/small")
+    def small():
+        return {"ok": True}
+
+    @app.get("/big")
+    def big():
+        return JSONResponse(BIG, headers={"ETag": '"v1"'})
+
+    @app.get("/binary")
+    def binary():
+        return Response(b"\0" * 4096, media_type="application/octet-stream")
+
+    @app.get("/text")
+    def text():
+        return PlainTextResponse("x" * 4096)
+
+    return TestClient(app)
+
+
+def test_small_response_is_sent_as_is(app_client):
+    response = app_client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.json() == {"ok": True}
+
+
+def test_large_response_is_compressed(app_client):
+    response = app_client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["etag"] == 'W/"v1"'
+    assert response.json() == BIG  # decoded by the client
+
+    response = app_client.get("/big", headers={"Accept-Encoding": "zstd"})
+    assert response.headers["content-encoding"] == "zstd"
+    assert int(response.headers["content-length"]) < len(json.dumps(BIG, ensure_ascii=False).encode()) / 3
+
+
+def test_identity_and_binary_pass_through(app_client):
+    response = app_client.get("/big", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert "vary" not in response.headers
+
+    response = app_client.get("/binary", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert response.content == b"\0" * 4096
+
+    response = app_client.get("/text", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+
+
+@pytest.mark.parametrize("encoding, decompressor", [
+    ("gzip", lambda: zlib.decompressobj(16 + zlib.MAX_WBITS)),
+    ("zstd", lambda: zstandard.ZstdDecompressor().decompressobj()),
+])
+def test_streamed_chunks_are_flushed_as_they_come(encoding, decompressor):
+    chunks = [b'{"event": "first"}\n', b'{"event": "second"}\n', b'{"event": "third"}\n']
+    sent = []
+    decoder = decompressor()
+    received = []
+
+    async def downstream(message):
+        sent.append(message)
+        if message["type"] == "http.response.body":
+            received.append(decoder.decompress(message["body"]))
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/x-ndjson")]})
+        for i, chunk in enumerate(chunks):
+            await send({"type": "http.response.body", "body": chunk, "more_body": i < len(chunks) - 1})
+            # Already on the wire, decodable, before the endpoint produces the next chunk.
+            assert b"".join(received) == b"".join(chunks[:i + 1])
+
+    scope = {"type": "http", "headers": [(b"accept-encoding", encoding.encode())]}
+    middleware = CompressionMiddleware(app, enabled=True, min_bytes=1024)
+    asyncio.run(middleware(scope, None, downstream))
+
+    start = sent[0]
+    assert (b"content-encoding", encoding.encode()) in start["headers"]
+    assert not any(key == b"content-length" for key, _ in start["headers"])
+    assert [m.get("more_body", False) for m in sent[1:]] == [True, True, False]
+
+
+def test_streamed_gzip_is_a_valid_file():
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/event-stream")]})
+        for i in range(5):
+            await send({"type": "http.response.body", "body": f"data: {i}\n\n".encode(), "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+    body = []
+
+    async def downstream(message):
+        if message["type"] == "http.response.body":
+            body.append(message["body"])
+
+    scope = {"type": "http", "headers": [(b"accept-encoding", b"gzip")]}
+    asyncio.run(CompressionMiddleware(app, enabled=True)(scope, None, downstream))
+    assert gzip.decompress(b"".join(body)) == b"".join(f"data: {i}\n\n".encode() for i in range(5))
@@ -0,0 +1,127 @@
+"""Batch fetch, rename and delete of conversations, through the repository and the `/batch` routes."""
+
+import uuid
+
+import pytest
+from sqlalchemy import func, select
+
+from db import counters
+from db.model.ai_analysis import AIAnalysis
+from db.model.archived_conversation import ArchivedConversation
+from db.model.conversation import Conversation
+from db.model.message import Message
+from db.model.response_feedback import ResponseFeedback
+from db.model.stats import DailyStatsRollup, StatsCounter
+from services.archive import conversation_archive
+
+
+def _new_conversation(client) -> str:
+    response = client.post("/api/v1/sessions/", json={})
+    assert response.status_code == 201, response.text
+    return response.json()["conversation_id"]
+
+
+def _reply(client, conversation_id, text) -> str:
+    response = client.post(f"/api/v1/messages/{conversation_id}", json={"content": text})
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def _feedback(client, message_id, feedback_type):
+    response = client.post(f"/api/v1/response-feedback/{message_id}", json={"feedback_type": feedback_type})
+    assert response.status_code == 200, response.text
+
+
+def _counters(db):
+    db.expire_all()
+    return (
+        {row.name: row.value for row in db.query(StatsCounter)},
+        {(row.day, row.metric): row.value for row in db.query(DailyStatsRollup) if row.value},
+    )
+
+
+@pytest.fixture
+def conversations(client, db):
+    """Three conversations with messages and feedback; the last one is archived (and asked again after)."""
+    ids = [_new_conversation(client) for _ in range(3)]
+    for i, conversation_id in enumerate(ids):
+        first = _reply(client, conversation_id, f"question {i}")
+        second = _reply(client, conversation_id, f"follow-up {i}")
+        _feedback(client, first, "like")
+        _feedback(client, second, "dislike")
+    conversation_archive.archive_conversation(db, db.get(Conversation, uuid.UUID(ids[2])))
+    _reply(client, ids[2], "asked after archiving")
+    # Exact counters to start from, whatever earlier tests did. Archiving leaves
+    # the daily rollups as they were, while `rebuild` counts archived rows in the
+    # totals only.
+    counters.rebuild(db)
+    return ids
+
+
+def _count(db, model, column, ids):
+    return db.scalar(select(func.count()).select_from(model).where(column.in_([uuid.UUID(i) for i in ids])))
+
+
+def test_batch_delete_keeps_counters_exact(client, db, conversations):
+    doomed, kept = conversations[1:], conversations[0]
+    response = client.post("/api/v1/conversations/batch/delete", json={"ids": doomed + [str(uuid.uuid4())]})
+    assert response.status_code == 200, response.text
+    assert sorted(response.json()["deleted"]) == sorted(doomed)
+
+    after_delete = _counters(db)
+    counters.rebuild(db)
+    assert after_delete == _counters(db)
+
+    message_ids = select(Message.id).where(Message.conversation_id.in_([uuid.UUID(i) for i in doomed]))
+    assert _count(db, Conversation, Conversation.id, doomed) == 0
+    assert _count(db, Message, Message.conversation_id, doomed) == 0
+    assert _count(db, ArchivedConversation, ArchivedConversation.conversation_id, doomed) == 0
+    assert db.scalar(select(func.count()).select_from(AIAnalysis).where(AIAnalysis.message_id.in_(message_ids))) == 0
+    assert db.scalar(select(func.count()).select_from(ResponseFeedback).where(ResponseFeedback.message_id.in_(message_ids))) == 0
+    assert _count(db, Message, Message.conversation_id, [kept]) == 4
+
+
+def test_batch_delete_of_unknown_ids(client):
+    response = client.post("/api/v1/conversations/batch/delete", json={"ids": [str(uuid.uuid4())]})
+    assert response.status_code == 200, response.text
+    assert response.json() == {"deleted": []}
+
+
+def test_batch_get_keeps_request_order_and_skips_unknown_ids(client, conversations):
+    first, second, archived = conversations
+    unknown = str(uuid.uuid4())
+    response = client.post(
+        "/api/v1/conversations/batch/get", json={"ids": [archived, unknown, first, second, first]},
+    )
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert [c["id"] for c in body] == [archived, first, second]
+    assert [len(c["messages"]) for c in body] == [6, 4, 4]
+    assert body[0]["messages"][-2]["content"] == "asked after archiving"
+
+
+def test_batch_get_rejects_oversized_batches(client):
+    response = client.post("/api/v1/conversations/batch/get", json={"ids": [str(uuid.uuid4()) for _ in range(101)]})
+    assert response.status_code == 422
+
+
+def test_batch_rename(client, db, conversations):
+    first, second, archived = conversations
+    unknown = str(uuid.uuid4())
+    response = client.patch("/api/v1/conversations/batch", json={"items": [
+        {"id": first, "title": "Headache"},
+        {"id": archived, "title": "Chest pain"},
+        {"id": unknown, "title": "Nobody"},
+    ]})
+    assert response.status_code == 200, response.text
+    assert {c["id"]: c["title"] for c in response.json()} == {first: "Headache", archived: "Chest pain"}
+
+    db.expire_all()
+    assert db.get(Conversation, uuid.UUID(first)).title == "Headache"
+    assert db.get(Conversation, uuid.UUID(archived)).title == "Chest pain"
+    assert db.get(Conversation, uuid.UUID(second)).title != "Headache"
+
+
+def test_batch_rename_validates_titles(client, conversations):
+    response = client.patch("/api/v1/conversations/batch", json={"items": [{"id": conversations[0], "title": ""}]})
+    assert response.status_code == 422
@@ -0,0 +1,150 @@
+"""
+The conversation read paths build their responses with `model_construct`
+from column tuples. Each test compares an endpoint's JSON with what the
+ORM objects validated through the same response model give.
+"""
+
+import uuid
+from datetime import timedelta
+
+import pytest
+
+from db.model.conversation import Conversation
+from db.model.message import Message
+from db.model.session import Session as SessionModel
+from db.model.user import User
+from dependency.dependencies import get_current_user_optional
+from schema.admin.conversation import ConversationAdminView
+from schema.conversation import ConversationHistory, ConversationInDB
+from schema.message import AIResponseMessage
+from services.archive import conversation_archive
+
+
+def _send(client, conversation_id, text):
+    response = client.post(f"/api/v1/messages/{conversation_id}", json={"content": text})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def _from_orm(db, conversation_id):
+    """The conversation as the endpoint returned it before: ORM object, archived messages first."""
+    db.expire_all()
+    conv = db.get(Conversation, conversation_id)
+    messages = conversation_archive.get_messages(db, conv.id) if conv.archive else []
+    return ConversationInDB(
+        id=conv.id, session_id=conv.session_id, title=conv.title, created_at=conv.created_at,
+        messages=messages + list(conv.messages),
+    ).model_dump(mode="json")
+
+
+@pytest.fixture
+def chat(client, db, conversation_id):
+    """A session with two conversations (distinct creation times) holding a few messages each."""
+    _send(client, conversation_id, "سلام، سرم درد می‌کند")
+    _send(client, conversation_id, "since yesterday")
+    session_id = db.get(Conversation, conversation_id).session_id
+    second = Conversation(session_id=session_id, title="Second", created_at=db.get(Conversation, conversation_id).created_at + timedelta(seconds=1))
+    db.add(second)
+    db.commit()
+    _send(client, second.id, "another question")
+    return session_id, conversation_id, second.id
+
+
+@pytest.fixture
+def as_user(client):
+    """Serves requests as the given user (None: anonymous)."""
+    overrides = client.app.dependency_overrides
+
+    def use(user):
+        overrides[get_current_user_optional] = lambda: user
+
+    yield use
+    overrides.pop(get_current_user_optional, None)
+
+
+def _history(db, query):
+    db.expire_all()
+    return [ConversationHistory.model_validate(c).model_dump(mode="json") for c in query.order_by(Conversation.created_at.desc())]
+
+
+def test_list_for_session(client, db, chat, as_user):
+    session_id, first, second = chat
+    as_user(None)
+    response = client.get("/api/v1/conversations/", params={"session_id": str(session_id)})
+    assert response.status_code == 200, response.text
+    assert response.json() == _history(db, db.query(Conversation).filter(Conversation.session_id == session_id))
+    assert [c["id"] for c in response.json()] == [str(second), str(first)]
+
+
+def test_list_for_user(client, db, chat, as_user):
+    session_id, _, _ = chat
+    user = User(google_id=uuid.uuid4().hex, email=f"{uuid.uuid4().hex}@example.com")
+    db.add(user)
+    db.flush()
+    db.get(SessionModel, session_id).user_id = user.id
+    db.commit()
+    as_user(user)
+    response = client.get("/api/v1/conversations/")
+    assert response.status_code == 200, response.text
+    expected = _history(
+        db, db.query(Conversation).join(SessionModel, SessionModel.id == Conversation.session_id).filter(SessionModel.user_id == user.id)
+    )
+    assert response.json() == expected
+    assert len(expected) == 2
+
+
+def test_conversation_messages(client, db, chat):
+    _, first, _ = chat
+    response = client.get(f"/api/v1/conversations/{first}/messages")
+    assert response.status_code == 200, response.text
+    assert response.json() == _from_orm(db, first)
+    assert len(response.json()["messages"]) == 4
+
+
+def test_conversation_messages_with_archive(client, db, chat):
+    _, first, _ = chat
+    before = client.get(f"/api/v1/conversations/{first}/messages").json()
+    conversation_archive.archive_conversation(db, db.get(Conversation, first))
+    assert client.get(f"/api/v1/conversations/{first}/messages").json() == before
+
+    _send(client, first, "after archiving")
+    response = client.get(f"/api/v1/conversations/{first}/messages").json()
+    assert response == _from_orm(db, first)
+    assert response["messages"][:4] == before["messages"]
+
+
+def test_batch_get(client, db, chat):
+    _, first, second = chat
+    conversation_archive.archive_conversation(db, db.get(Conversation, second))
+    response = client.post("/api/v1/conversations/batch/get", json={"ids": [str(second), str(first)]})
+    assert response.status_code == 200, response.text
+    assert response.json() == [_from_orm(db, second), _from_orm(db, first)]
+
+
+def test_message_reply(client, db, conversation_id):
+    reply = _send(client, conversation_id, "how long does a cold last?")
+    db.expire_all()
+    expected = AIResponseMessage.model_validate(db.get(Message, uuid.UUID(reply["id"])))
+    expected.elapsed_time_ms = reply["elapsed_time_ms"]
+    assert reply == expected.model_dump(mode="json")
+
+
+def test_admin_search(client, db, chat, admin_headers):
+    _, first, second = chat
+    keyword = uuid.uuid4().hex
+    _send(client, first, f"hot {keyword}")
+    _send(client, second, f"archived {keyword}")
+    conversation_archive.archive_conversation(db, db.get(Conversation, second))
+    _send(client, second, "asked after archiving")
+
+    response = client.get("/api/v1/admin/conversations/", params={"keyword": keyword}, headers=admin_headers)
+    assert response.status_code == 200, response.text
+    db.expire_all()
+    expected = []
+    for conv in sorted((db.get(Conversation, second), db.get(Conversation, first)), key=lambda c: c.created_at, reverse=True):
+        expected.append(ConversationAdminView(
+            id=conv.id, session_id=conv.session_id, title=conv.title, created_at=conv.created_at,
+            message_count=len(conv.messages) + (conv.archive.message_count if conv.archive else 0),
+        ).model_dump(mode="json"))
+    assert response.json() == expected
+    assert [c["message_count"] for c in expected] == [6, 6]
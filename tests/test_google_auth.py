@@ -0,0 +1,152 @@
+"""Google sign-in: the signing-cert cache (max-age, background refresh, key rotation) and OAuth flows."""
+
+import threading
+import time
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from google.auth import crypt, jwt
+
+from services import google_auth
+
+AUDIENCE = "test-client-id"
+
+
+class FakeResponse:
+    def __init__(self, certs, headers):
+        self._certs = dict(certs)
+        self.headers = dict(headers)
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._certs
+
+
+class FakeGoogle:
+    """Stands in for the pooled session; serves `certs` with `headers`, optionally held back."""
+
+    def __init__(self):
+        self.certs = {}
+        self.headers = {"Cache-Control": "public, max-age=3600"}
+        self.fetches = 0
+        self.release = threading.Event()
+        self.release.set()
+
+    def get(self, url, timeout=None):
+        self.release.wait(5)
+        self.fetches += 1
+        return FakeResponse(self.certs, self.headers)
+
+
+@pytest.fixture
+def google(monkeypatch):
+    fake = FakeGoogle()
+    monkeypatch.setattr(google_auth, "http_session", lambda: fake)
+    return fake
+
+
+def _key(kid):
+    """(signer, public key PEM) for a new RSA key."""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption(),
+    )
+    public_pem = key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo,
+    )
+    return crypt.RSASigner.from_string(private_pem, key_id=kid), public_pem.decode()
+
+
+def _id_token(signer):
+    now = int(time.time())
+    return jwt.encode(signer, {
+        "iss": "https://accounts.google.com", "aud": AUDIENCE, "sub": "1",
+        "email": "user@example.com", "iat": now, "exp": now + 600,
+    }).decode()
+
+
+def _wait_for_refresh():
+    for thread in threading.enumerate():
+        if thread.name == "google-certs-refresh":
+            thread.join(5)
+
+
+def test_certs_are_cached_for_their_remaining_max_age(google):
+    google.certs = {"a": "cert-a"}
+    google.headers = {"Cache-Control": "public, max-age=100", "Age": "40"}
+    cache = google_auth.GoogleCertCache("https://certs.test", refresh_margin_seconds=0)
+
+    assert cache.get() == {"a": "cert-a"}
+    assert cache.get() == {"a": "cert-a"}
+    assert google.fetches == 1
+    assert 55 < cache._expires_at - time.monotonic() <= 60
+
+    cache._expires_at = time.monotonic()
+    google.certs = {"b": "cert-b"}
+    assert cache.get() == {"b": "cert-b"}
+    assert google.fetches == 2
+
+
+def test_certs_are_refreshed_in_the_background_before_they_expire(google):
+    google.certs = {"a": "cert-a"}
+    google.headers = {"Cache-Control": "max-age=100"}
+    # Within the margin right away.
+    cache = google_auth.GoogleCertCache("https://certs.test", refresh_margin_seconds=200)
+    cache.get()
+
+    google.release.clear()
+    google.certs = {"b": "cert-b"}
+    google.headers = {"Cache-Control": "max-age=1000"}
+    # Served from the cache while a single refresh is held up.
+    assert cache.get() == {"a": "cert-a"}
+    assert cache.get() == {"a": "cert-a"}
+    assert [t.name for t in threading.enumerate()].count("google-certs-refresh") == 1
+
+    google.release.set()
+    _wait_for_refresh()
+    assert google.fetches == 2
+    assert cache.get() == {"b": "cert-b"}
+    assert google.fetches == 2
+
+
+def test_failed_background_refresh_keeps_the_cached_certs(google, monkeypatch):
+    google.certs = {"a": "cert-a"}
+    google.headers = {"Cache-Control": "max-age=100"}
+    cache = google_auth.GoogleCertCache("https://certs.test", refresh_margin_seconds=200)
+    cache.get()
+
+    monkeypatch.setattr(google, "get", lambda url, timeout=None: 1 / 0)
+    cache.get()
+    _wait_for_refresh()
+    assert cache.get() == {"a": "cert-a"}
+
+
+def test_rotated_key_is_fetched_once(google, monkeypatch):
+    old_signer, old_public = _key("old")
+    new_signer, new_public = _key("new")
+    monkeypatch.setattr(google_auth, "google_certs", google_auth.GoogleCertCache("https://certs.test"))
+
+    google.certs = {"old": old_public}
+    assert google_auth.verify_id_token(_id_token(old_signer), AUDIENCE)["sub"] == "1"
+    assert google_auth.verify_id_token(_id_token(old_signer), AUDIENCE)["sub"] == "1"
+    assert google.fetches == 1
+
+    # Google rotated its keys before our copy expired.
+    google.certs = {"old": old_public, "new": new_public}
+    assert google_auth.verify_id_token(_id_token(new_signer), AUDIENCE)["sub"] == "1"
+    assert google.fetches == 2
+    assert google_auth.verify_id_token(_id_token(new_signer), AUDIENCE)["sub"] == "1"
+    assert google.fetches == 2
+
+
+def test_flows_are_per_login_on_a_shared_pool():
+    first = google_auth.build_flow(code_verifier="a" * 64)
+    second = google_auth.build_flow(code_verifier="b" * 64)
+    assert first.oauth2session is not second.oauth2session
+    assert (first.code_verifier, second.code_verifier) == ("a" * 64, "b" * 64)
+    adapter = google_auth.http_session().get_adapter("https://oauth2.googleapis.com/token")
+    assert first.oauth2session.get_adapter("https://oauth2.googleapis.com/token") is adapter
+    assert second.oauth2session.get_adapter("https://oauth2.googleapis.com/token") is adapter
@@ -0,0 +1,51 @@
+"""
+Importing the app must stay cheap: the provider SDK, the Google OAuth
+libraries, python-jose and NumPy are only imported when first used, and the
+whole import stays within a cold-start budget.
+"""
+
+import json
+import re
+import subprocess
+import sys
+
+DEFERRED = (
+    "google.generativeai",
+    "google_auth_oauthlib",
+    "google.oauth2",
+    "jose",
+    "jwt",
+    "numpy",
+)
+
+# Cumulative `-X importtime` of `main`: about 1 s on a laptop, half of it FastAPI.
+IMPORT_BUDGET_SECONDS = 2.5
+
+
+def test_importing_main_defers_heavy_modules():
+    # A fresh interpreter: this test process has already imported most of them.
+    # The environment set up in conftest is inherited.
+    code = (
+        "import json, sys; import main; "
+        f"print(json.dumps([m for m in {list(DEFERRED)!r} if m in sys.modules]))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, timeout=120,
+    )
+    assert result.returncode == 0, result.stderr
+    assert json.loads(result.stdout.strip().splitlines()[-1]) == []
+
+
+def test_importing_main_stays_within_budget():
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"], capture_output=True, text=True, timeout=120,
+    )
+    assert result.returncode == 0, result.stderr
+    # "import time: self [us] | cumulative | imported package"
+    times = {}
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \| (\S.*)$", line)
+        if match:
+            times[match.group(2).strip()] = int(match.group(1)) / 1e6
+    slowest = sorted(times.items(), key=lambda item: item[1], reverse=True)[:10]
+    assert times["main"] < IMPORT_BUDGET_SECONDS, slowest
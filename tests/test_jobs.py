@@ -0,0 +1,86 @@
+import threading
+import time
+import uuid
+
+import pytest
+from sqlalchemy import delete, select
+
+from db.model.ai_analysis import AIAnalysis
+from db.model.job import Job
+from db.model.message import Message
+from services import tasks
+from services.extraction import ExtractionPipeline
+from services.jobs import RUNNING, JobRunner
+
+
+def _status(db, job_id):
+    db.expire_all()
+    job = db.get(Job, job_id)
+    return None if job is None else job.status
+
+
+def test_long_running_job_keeps_its_lease(client, db):
+    db.execute(delete(Job))  # title jobs queued by other tests
+    db.commit()
+    runner = JobRunner(workers=0, lease_seconds=0.3, periodic={})
+    started, release = threading.Event(), threading.Event()
+
+    @runner.task("slow")
+    def slow(payload):
+        started.set()
+        release.wait(5)
+
+    job_id = runner.enqueue("slow")
+    # Claimed and run by the same thread, as in `JobRunner._run`.
+    worker = threading.Thread(target=lambda: runner.execute(runner.claim()))
+    worker.start()
+    try:
+        assert started.wait(5)
+        time.sleep(0.6)  # twice the lease
+        runner._next_sweep = 0
+        runner._maybe_sweep()
+        assert _status(db, job_id) == RUNNING
+    finally:
+        release.set()
+        worker.join(5)
+    assert _status(db, job_id) is None  # finished and removed
+
+
+def test_title_job_raises_on_provider_errors(client, conversation_id, provider, monkeypatch):
+    client.post(f"/api/v1/messages/{conversation_id}", json={"content": "headache since yesterday"})
+
+    def fail(self, text):
+        raise ConnectionError("provider unavailable")
+
+    monkeypatch.setattr(type(provider.start_session()), "send_message", fail)
+    with pytest.raises(ConnectionError):
+        tasks.conversation_title({"conversation_id": str(conversation_id)})
+
+
+def test_replies_that_keep_failing_are_no_longer_backfilled(client, db, conversation_id, provider, monkeypatch):
+    client.post(f"/api/v1/messages/{conversation_id}", json={"content": "chest pain when walking"})
+    analysis_id = db.scalar(
+        select(AIAnalysis.id).join(Message, Message.id == AIAnalysis.message_id)
+        .where(Message.conversation_id == conversation_id)
+    )
+    monkeypatch.setattr(provider, "json_results", "not a JSON array")
+    pipeline = ExtractionPipeline(workers=0, max_attempts=1, max_failures=2)
+
+    def pending(**kwargs):
+        batches = pipeline.pending_batches(**kwargs)
+        return {i for batch in batches for i in db.scalars(select(AIAnalysis.id).where(AIAnalysis.message_id.in_(batch)))}
+
+    for _ in range(2):
+        assert analysis_id in pending()
+        pipeline.backfill()
+    db.expire_all()
+    assert db.get(AIAnalysis, analysis_id).extraction_failures == 2
+    assert analysis_id not in pending()
+    assert analysis_id in pending(include_failed=True)
+
+
+def test_backfill_run_is_capped(client, conversation_id, provider):
+    for n in range(3):
+        client.post(f"/api/v1/messages/{conversation_id}", json={"content": f"question {n}"})
+    pipeline = ExtractionPipeline(workers=0, batch_size=2)
+    assert sum(len(batch) for batch in pipeline.pending_batches(limit=3)) == 3
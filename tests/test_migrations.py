@@ -0,0 +1,138 @@
+import os
+import sqlite3
+from contextlib import contextmanager
+
+import pytest
+from alembic import command
+from sqlalchemy import create_engine, event, inspect
+
+from db import migrate
+from db.session import engine
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def _upgrade(url: str) -> None:
+    """What `alembic upgrade head` does against `url`."""
+    config = migrate._alembic_config()
+    config.set_main_option("sqlalchemy.url", url)
+    command.upgrade(config, "head")
+
+
+def _schema(url: str):
+    bind = create_engine(url)
+    try:
+        inspector = inspect(bind)
+        return {
+            table: (
+                {c["name"] for c in inspector.get_columns(table)},
+                {i["name"] for i in inspector.get_indexes(table)},
+            )
+            for table in inspector.get_table_names()
+        }
+    finally:
+        bind.dispose()
+
+
+def test_upgrade_adopts_pre_migration_database(tmp_path):
+    old = tmp_path / "old.db"
+    with sqlite3.connect(old) as conn, open(os.path.join(FIXTURES, "pre_migration_schema.sql")) as f:
+        conn.executescript(f.read())
+    fresh = tmp_path / "fresh.db"
+
+    _upgrade(f"sqlite:///{old}")
+    _upgrade(f"sqlite:///{fresh}")
+
+    adopted, expected = _schema(f"sqlite:///{old}"), _schema(f"sqlite:///{fresh}")
+    # Tables the old app never created (it imported only some models) are created too.
+    assert {"survey_responses", "symptom_logs"} <= set(adopted)
+    assert adopted == expected
+
+
+def test_upgrade_is_a_no_op_at_head(tmp_path):
+    url = f"sqlite:///{tmp_path / 'db.sqlite'}"
+    _upgrade(url)
+    before = _schema(url)
+    _upgrade(url)
+    assert _schema(url) == before
+
+
+# ---- Hot queries use their indexes (EXPLAIN-verified) ----
+
+@contextmanager
+def _captured_selects():
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+
+def _plans(statements, table: str):
+    """EXPLAIN QUERY PLAN of every captured statement that reads `table`."""
+    plans = []
+    with engine.connect() as conn:
+        cursor = conn.connection.dbapi_connection.cursor()
+        for statement, parameters in statements:
+            if f"FROM {table}" not in statement:
+                continue
+            cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+            plans.append("\n".join(str(row[-1]) for row in cursor.fetchall()))
+        cursor.close()
+    assert plans, f"no query on {table} was captured"
+    return plans
+
+
+@pytest.fixture
+def sqlite_only():
+    if engine.dialect.name != "sqlite":
+        pytest.skip("plans are checked on SQLite")
+
+
+def test_conversation_messages_use_conversation_created_at_index(sqlite_only, db, conversation_id):
+    from repository import conversation as conversation_repo
+
+    with _captured_selects() as statements:
+        conversation_repo.get_with_messages(db, id=conversation_id)
+    plans = _plans(statements, "messages")
+    assert any("USING INDEX ix_messages_conversation_id_created_at (conversation_id=?)" in p for p in plans), plans
+    assert not any("USE TEMP B-TREE FOR ORDER BY" in p for p in plans), plans
+
+
+def test_session_history_uses_session_created_at_index(sqlite_only, db, client, conversation_id):
+    from repository import conversation as conversation_repo
+
+    session_id = conversation_repo.get_session_id(db, id=conversation_id)
+    with _captured_selects() as statements:
+        conversation_repo.get_history_by_session_id(db, session_id=session_id)
+    plans = _plans(statements, "conversations")
+    assert any("USING INDEX ix_conversations_session_id_created_at (session_id=?)" in p for p in plans), plans
+    assert not any("USE TEMP B-TREE FOR ORDER BY" in p for p in plans), plans
+
+
+def test_latest_user_session_uses_user_started_at_index(sqlite_only, db):
+    import uuid
+
+    from repository import session as session_repo
+
+    with _captured_selects() as statements:
+        session_repo.get_or_create_active_session_for_user(db, user_id=uuid.uuid4())
+    plans = _plans(statements, "sessions")
+    assert any("USING INDEX ix_sessions_user_id_started_at (user_id=?)" in p for p in plans), plans
+    assert not any("USE TEMP B-TREE FOR ORDER BY" in p for p in plans), plans
+
+
+def test_feedback_by_type_uses_type_created_at_index(sqlite_only, db):
+    from db.model.response_feedback import FeedbackType
+    from repository import response_feedback as feedback_repo
+
+    with _captured_selects() as statements:
+        feedback_repo.get_multi_with_filter(db, feedback_type=FeedbackType.DISLIKE)
+    plans = _plans(statements, "response_feedback")
+    assert any("USING INDEX ix_response_feedback_feedback_type_created_at (feedback_type=?)" in p for p in plans), plans
@@ -0,0 +1,88 @@
+"""Profiler arm state: requests read the polled copy, never the shared store."""
+
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from services.profiler import Profiler, ProfilerMiddleware
+from services.state_store import MemoryStateStore
+
+
+class CountingStore(MemoryStateStore):
+    def __init__(self):
+        super().__init__()
+        self.gets = 0
+
+    def get(self, namespace, key):
+        self.gets += 1
+        return super().get(namespace, key)
+
+
+@pytest.fixture
+def store():
+    return CountingStore()
+
+
+@pytest.fixture
+def profiler(store, tmp_path):
+    profiler = Profiler(store=store, profile_dir=str(tmp_path))
+    yield profiler
+    profiler.stop()
+
+
+def _app(profiler):
+    app = FastAPI()
+    app.add_middleware(ProfilerMiddleware, profiler=profiler)
+
+    @app.get("/ping")
+    def ping():
+        return {"ok": True}
+
+    return TestClient(app)
+
+
+def test_disarmed_requests_do_not_read_the_store(store, profiler):
+    client = _app(profiler)
+    for _ in range(20):
+        assert client.get("/ping").status_code == 200
+    assert store.gets == 0
+
+
+def test_arm_from_another_worker_is_seen_after_a_poll(store, profiler):
+    other_worker = Profiler(store=store, profile_dir=profiler.profile_dir)
+    arm = other_worker.arm(route="/ping", requests=None, seconds=60, interval_ms=5)
+    assert profiler.current_arm() is None
+
+    profiler.refresh()
+    assert profiler.current_arm() == arm
+
+    other_worker.disarm()
+    profiler.refresh()
+    assert profiler.current_arm() is None
+
+
+def test_poller_picks_up_the_arm(store, profiler, monkeypatch):
+    monkeypatch.setattr(Profiler, "POLL_SECONDS", 0.01)
+    profiler.start()
+    arm = Profiler(store=store, profile_dir=profiler.profile_dir).arm(
+        route=None, requests=None, seconds=60, interval_ms=5,
+    )
+    deadline = time.monotonic() + 5
+    while profiler.current_arm() is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert profiler.current_arm() == arm
+
+    # Requests still go through the in-memory copy only.
+    gets = store.gets
+    client = _app(profiler)
+    profiler.stop()
+    assert client.get("/ping").status_code == 200
+    assert store.gets == gets
+
+
+def test_expired_arm_is_ignored_without_a_poll(profiler):
+    arm = profiler.arm(route=None, requests=None, seconds=60, interval_ms=5)
+    arm["expires_at"] = time.time() - 1
+    assert profiler.current_arm() is None
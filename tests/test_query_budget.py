@@ -0,0 +1,66 @@
+"""Query budgets of the hot endpoints; a new lazy load or per-row query fails these."""
+
+import pytest
+
+from db.model.conversation import Conversation
+from db.query_log import assert_max_queries, slow_query_log
+from db.session import engine
+
+
+@pytest.fixture
+def chat(client, db, conversation_id):
+    client.post(f"/api/v1/messages/{conversation_id}", json={"content": "first question"})
+    session_id = db.get(Conversation, conversation_id).session_id
+    return session_id, conversation_id
+
+
+def test_post_message(client, chat):
+    _, conversation_id = chat
+    # user message + its counters (5), chat history read/write (2),
+    # AI message + analysis + counters + created_at read-back (7), title check (1)
+    with assert_max_queries(15):
+        response = client.post(f"/api/v1/messages/{conversation_id}", json={"content": "second question"})
+    assert response.status_code == 200
+
+
+def test_get_conversation_messages(client, chat):
+    _, conversation_id = chat
+    with assert_max_queries(2):
+        response = client.get(f"/api/v1/conversations/{conversation_id}/messages")
+    assert response.status_code == 200
+
+
+def test_batch_get_conversations(client, chat):
+    _, first = chat
+    second = client.post("/api/v1/sessions/", json={}).json()["conversation_id"]
+    client.post(f"/api/v1/messages/{second}", json={"content": "another"})
+    with assert_max_queries(2):
+        response = client.post("/api/v1/conversations/batch/get", json={"ids": [str(first), second]})
+    assert [c["id"] for c in response.json()] == [str(first), second]
+
+
+def test_new_session_is_buffered(client):
+    with assert_max_queries(0):
+        response = client.post("/api/v1/sessions/", json={})
+    assert response.status_code == 201
+
+
+def test_slow_query_explain_leaves_the_request_transaction_alone(db, chat, monkeypatch, caplog):
+    _, conversation_id = chat
+    monkeypatch.setattr(slow_query_log, "threshold", 0.0)
+    monkeypatch.setattr(slow_query_log, "_last_explained", {})
+    raw_connections = []
+    raw_connection = engine.raw_connection
+    monkeypatch.setattr(engine, "raw_connection", lambda: raw_connections.append(1) or raw_connection())
+
+    conversation = db.get(Conversation, conversation_id)
+    conversation.title = "renamed, not committed"
+    db.flush()
+    # Explained on the statement's own connection, inside the open transaction.
+    with caplog.at_level("WARNING", logger="db.query_log"):
+        rows = db.execute(Conversation.__table__.select().where(Conversation.id == conversation_id)).all()
+    assert [row.title for row in rows] == ["renamed, not committed"]
+    assert raw_connections == []
+    assert any("Plan:" in r.message and "EXPLAIN failed" not in r.message for r in caplog.records)
+    assert db.get(Conversation, conversation_id).title == "renamed, not committed"
+    db.rollback()
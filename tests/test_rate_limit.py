@@ -0,0 +1,75 @@
+import uuid
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
+
+from config import SETTINGS
+from db.query_log import assert_max_queries
+from dependency.rate_limit import rate_limit
+from services.rate_limit import DatabaseBucketStore, MemoryBucketStore, RateLimiter, parse_rule, rate_limiter
+
+
+@pytest.fixture(params=["memory", "database"])
+def store(request, client):
+    return MemoryBucketStore() if request.param == "memory" else DatabaseBucketStore()
+
+
+def test_rejected_requests_spend_nothing(store):
+    limiter = RateLimiter(store, {"chat:ip": "3/hour", "chat:session": "1/hour"})
+    ip = str(uuid.uuid4())
+
+    first = limiter.check("chat", {"ip": ip, "session": "s1"})
+    assert first.allowed
+    for _ in range(5):
+        rejected = limiter.check("chat", {"ip": ip, "session": "s1"})
+        assert not rejected.allowed and rejected.rule.name == "chat:session"
+
+    # The rejections above did not drain the shared IP bucket.
+    assert limiter.check("chat", {"ip": ip, "session": "s2"}).allowed
+    assert limiter.check("chat", {"ip": ip, "session": "s3"}).allowed
+    fourth = limiter.check("chat", {"ip": ip, "session": "s4"})
+    assert not fourth.allowed and fourth.rule.name == "chat:ip"
+
+
+def test_ip_scope_uses_forwarded_client_behind_trusted_proxy(client, monkeypatch):
+    monkeypatch.setattr(SETTINGS, "RATE_LIMIT_ENABLED", True)
+    limiter = RateLimiter(MemoryBucketStore(), {"ping:ip": "2/hour"})
+    app = FastAPI()
+
+    @app.get("/ping", dependencies=[Depends(rate_limit("ping", limiter=limiter))])
+    def ping():
+        return {}
+
+    # How the gunicorn workers serve the app (`forwarded_allow_ips` in gunicorn.conf.py).
+    proxied = ProxyHeadersMiddleware(app, trusted_hosts=SETTINGS.FORWARDED_ALLOW_IPS)
+    router = TestClient(proxied, client=("10.1.2.3", 40000))
+
+    def ping_from(forwarded_for):
+        return router.get("/ping", headers={"X-Forwarded-For": forwarded_for}).status_code
+
+    assert [ping_from("203.0.113.5") for _ in range(3)] == [200, 200, 429]
+    # A different client behind the same router has its own bucket...
+    assert ping_from("198.51.100.7") == 200
+    # ...and a client can't pick one by prepending addresses: the router appends the real one.
+    assert ping_from("198.51.100.99, 203.0.113.5") == 429
+
+
+def test_route_store_overrides_the_default(client):
+    database, memory = DatabaseBucketStore(), MemoryBucketStore()
+    limiter = RateLimiter(database, {"fast:ip": "1/hour", "slow:ip": "1/hour"}, route_stores={"fast": memory})
+    ip = str(uuid.uuid4())
+    assert limiter.check("fast", {"ip": ip}).allowed
+    assert not limiter.check("fast", {"ip": ip}).allowed
+    # The database buckets were never touched.
+    assert database.hit(parse_rule("fast:ip", "1/hour"), f"fast:ip:{ip}").allowed
+
+
+def test_new_sessions_are_limited_without_the_database(client, monkeypatch):
+    monkeypatch.setattr(SETTINGS, "RATE_LIMIT_ENABLED", True)
+    assert isinstance(rate_limiter.route_stores["sessions"], MemoryBucketStore)
+    with assert_max_queries(0):
+        response = client.post("/api/v1/sessions/", json={})
+    assert response.status_code == 201
+    assert "RateLimit-Remaining" in response.headers
@@ -0,0 +1,67 @@
+import pytest
+
+from config import SETTINGS
+from services.ai.ai_manager import ai_manager
+from services.ai.session_manager import SessionManager
+from services.state_store import state_store
+from services.triage import EMERGENCY_REPLY, normalize, triage
+
+
+@pytest.mark.parametrize("message, category", [
+    # Joined with a ZWNJ, written together and written apart.
+    ("خون‌ریزی شدید دارم", "bleeding"),
+    ("خونریزی شدید دارم", "bleeding"),
+    ("خون ریزی شدید دارم", "bleeding"),
+    ("سینه‌ام درد میکنه", "chest_pain"),
+    ("سینه ام درد میکنه", "chest_pain"),
+    ("قفسه‌ی سینه‌ام درد میکنه", "chest_pain"),
+    ("درد قفسه‌ی سینه دارم", "chest_pain"),
+    ("درد قفسه ی سینه دارم", "chest_pain"),
+    ("نمی‌توانم نفس بکشم", "breathing"),
+    ("نمی توانم نفس بکشم", "breathing"),
+    ("لب هایم کبود شده", "breathing"),
+    ("می خواهم بمیرم", "self_harm"),
+    ("بی‌حسی نیمه چپ بدن", "stroke"),
+    # Arabic letter variants and digits.
+    ("خونريزي شديد", "bleeding"),
+    ("I think I'm having a HEART ATTACK!", "chest_pain"),
+])
+def test_red_flags_match_across_spellings(message, category):
+    assert category in triage.assess(message).categories
+
+
+@pytest.mark.parametrize("message", [
+    "سلام، از دیروز سردرد دارم و کمی تب دارم. چه کار کنم؟",
+    "سرفه‌های خشک دارم ولی حالم بد نیست، فقط خسته‌ام",
+    "I have had a mild sore throat for three days.",
+    "My chest of drawers fell over",
+])
+def test_ordinary_messages_are_not_flagged(message):
+    assert triage.assess(message).categories == []
+
+
+def test_joiners_and_split_affixes_normalize_to_one_form():
+    assert normalize("می‌خواهم") == normalize("می خواهم") == normalize("میخواهم") == "میخواهم"
+    assert normalize("سینه‌ام") == normalize("سینه ام") == "سینهام"
+    assert normalize("قفسه‌ی سینه") == normalize("قفسه ی سینه") == "قفسه سینه"
+
+
+def test_emergency_reply_is_kept_in_the_chat_history(client, conversation_id, provider, monkeypatch):
+    monkeypatch.setattr(SETTINGS, "TRIAGE_EMERGENCY_REPLY", True)
+    # The emergency path must not set up the provider.
+    monkeypatch.setattr(ai_manager, "_provider_instance", None)
+    monkeypatch.setattr(ai_manager, "_sessions", None)
+    monkeypatch.setattr(ai_manager, "_get_provider", lambda *args: pytest.fail("provider set up"))
+
+    response = client.post(f"/api/v1/messages/{conversation_id}", json={"content": "خونریزی شدید دارم"})
+    assert response.status_code == 200, response.text
+    assert response.json()["content"] == EMERGENCY_REPLY
+    monkeypatch.undo()
+
+    client.post(f"/api/v1/messages/{conversation_id}", json={"content": "what now?"})
+    assert state_store.get(SessionManager.NAMESPACE, str(conversation_id)) == [
+        {"role": "user", "parts": ["خونریزی شدید دارم"]},
+        {"role": "model", "parts": [EMERGENCY_REPLY]},
+        {"role": "user", "parts": ["what now?"]},
+        {"role": "model", "parts": [provider.reply_to("what now?")]},
+    ]
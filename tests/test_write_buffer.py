@@ -0,0 +1,101 @@
+import json
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from db.model.conversation import Conversation
+from db.model.session import Session as SessionModel
+from db.write_buffer import SessionWriteBuffer
+
+
+def _rows(session_id=None):
+    now = datetime.now(timezone.utc)
+    session_id = session_id or uuid.uuid4()
+    session_row = {column.key: None for column in SessionModel.__table__.columns}
+    session_row.update(id=session_id, started_at=now)
+    conversation_row = {"id": uuid.uuid4(), "session_id": session_id, "title": "New Conversation", "created_at": now}
+    return session_row, conversation_row
+
+
+@pytest.fixture
+def buffer(client, tmp_path):
+    # Running, but only flushed when the test says so.
+    buffer = SessionWriteBuffer(flush_interval_ms=3_600_000, max_rows=1000, dead_letter_path=str(tmp_path / "dead.jsonl"))
+    buffer.start()
+    yield buffer
+    buffer.stop()
+
+
+def test_rejected_rows_are_dead_lettered_and_the_rest_written(buffer, db):
+    existing, _ = _rows()
+    buffer.add_session(existing, _)
+    buffer.flush()
+
+    good = [_rows() for _ in range(3)]
+    duplicate = _rows(session_id=existing["id"])  # primary key violation
+    for rows in good[:2] + [duplicate] + good[2:]:
+        buffer.add_session(*rows)
+    buffer.end_session(good[0][0]["id"])
+    buffer.flush()
+
+    for session_row, conversation_row in good:
+        assert db.get(SessionModel, session_row["id"]) is not None
+        assert db.get(Conversation, conversation_row["id"]) is not None
+        assert not buffer.is_pending(session_row["id"])
+    assert db.get(SessionModel, good[0][0]["id"]).ended_at is not None
+    assert db.get(Conversation, duplicate[1]["id"]) is None
+    assert not buffer.is_pending(duplicate[1]["id"])
+
+    with open(buffer.dead_letter_path) as f:
+        dead = [json.loads(line) for line in f]
+    assert [(d["table"], d["row"]["id"]) for d in dead] == [
+        ("sessions", str(duplicate[0]["id"])), ("conversations", str(duplicate[1]["id"])),
+    ]
+    buffer.flush()  # nothing left to block the next flush
+
+
+def test_unavailable_database_requeues_everything(buffer, db, monkeypatch):
+    rows = _rows()
+    buffer.add_session(*rows)
+    write = buffer._write
+
+    def unavailable(*args):
+        raise OperationalError("INSERT", {}, Exception("database is locked"))
+
+    monkeypatch.setattr(buffer, "_write", unavailable)
+    with pytest.raises(OperationalError):
+        buffer.flush()
+    assert buffer.is_pending(rows[0]["id"])
+
+    monkeypatch.setattr(buffer, "_write", write)
+    buffer.flush()
+    assert db.get(SessionModel, rows[0]["id"]) is not None
+    assert not buffer.is_pending(rows[0]["id"])
+
+
+def test_inserts_are_written_at_once_without_buffer_inserts(buffer, db):
+    buffer.buffer_inserts = False
+    session_row, conversation_row = _rows()
+    buffer.add_session(session_row, conversation_row)
+    # Visible to any other process without a flush.
+    assert not buffer.is_pending(session_row["id"])
+    assert db.get(SessionModel, session_row["id"]) is not None
+    assert db.get(Conversation, conversation_row["id"]) is not None
+
+    buffer.end_session(session_row["id"])
+    assert db.get(SessionModel, session_row["id"]).ended_at is None
+    buffer.flush()
+    db.expire_all()
+    assert db.get(SessionModel, session_row["id"]).ended_at is not None
+
+
+def test_stop_is_registered_at_exit_once(client, tmp_path, monkeypatch):
+    registered = []
+    monkeypatch.setattr("db.write_buffer.atexit.register", registered.append)
+    buffer = SessionWriteBuffer(dead_letter_path=str(tmp_path / "dead.jsonl"))
+    for _ in range(3):
+        buffer.start()
+        buffer.stop()
+    assert registered == [buffer.stop]